@@ -0,0 +1,126 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+import requests
+
+from xero import Xero
+from xero.breaker import CircuitBreaker
+from xero.budget import DailyBudget
+from xero.constants import XERO_API_URL
+from xero.exceptions import (XeroBudgetExceeded, XeroCircuitOpen, XeroInternalError,
+        XeroNotAvailable, XeroNotImplemented, XeroRateLimitExceeded)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_states(self):
+        "The circuit opens when too many requests fail, and closes after a successful probe"
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, reset_timeout=60)
+
+        for failed in (True, False, False):
+            breaker.before('contacts')
+            breaker.record('contacts', failed)
+        self.assertEqual(breaker.state('contacts'), 'closed')
+
+        breaker.before('contacts')
+        breaker.record('contacts', True)
+        self.assertEqual(breaker.state('contacts'), 'open')
+        self.assertRaises(XeroCircuitOpen, breaker.before, 'contacts')
+
+        # Other keys aren't affected
+        breaker.before('invoices')
+        self.assertEqual(breaker.state('invoices'), 'closed')
+
+        # Once the timeout has passed, a single probe is allowed
+        breaker.circuits['contacts'].opened_at -= 60
+        self.assertEqual(breaker.state('contacts'), 'half-open')
+        breaker.before('contacts')
+        self.assertRaises(XeroCircuitOpen, breaker.before, 'contacts')
+
+        # A failed probe opens the circuit again...
+        breaker.record('contacts', True)
+        self.assertEqual(breaker.state('contacts'), 'open')
+
+        # ... and a successful one closes it.
+        breaker.circuits['contacts'].opened_at -= 60
+        breaker.before('contacts')
+        breaker.record('contacts', False)
+        self.assertEqual(breaker.state('contacts'), 'closed')
+        breaker.before('contacts')
+
+    @patch('requests.get')
+    def test_manager_requests(self, r_get):
+        "Managers stop sending requests while Xero is unavailable"
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        breaker = CircuitBreaker(failure_rate=1.0, min_calls=2, window=2)
+        xero = Xero(credentials, breaker=breaker)
+
+        # Rate limiting isn't a failure
+        r_get.return_value = Mock(status_code=503, text='oauth_problem=rate%20limit%20exceeded&oauth_problem_advice=please%20wait')
+        for i in range(2):
+            self.assertRaises(XeroRateLimitExceeded, xero.contacts.all)
+
+        r_get.return_value = Mock(status_code=503, text='The Xero API is currently offline for maintenance')
+        for i in range(2):
+            self.assertRaises(XeroNotAvailable, xero.contacts.all)
+        self.assertEqual(r_get.call_count, 4)
+
+        self.assertRaises(XeroCircuitOpen, xero.contacts.all)
+        self.assertEqual(r_get.call_count, 4)
+        # The circuit is kept per endpoint
+        self.assertRaises(XeroNotAvailable, xero.invoices.all)
+        self.assertEqual(r_get.call_count, 5)
+
+    @patch('requests.get')
+    def test_availability_errors(self, r_get):
+        "Only availability errors and timeouts count as failures"
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        breaker = CircuitBreaker(failure_rate=1.0, min_calls=2, window=2)
+        xero = Xero(credentials, breaker=breaker)
+        scope = ' '.join([xero.contacts.credential_key, 'Contacts'])
+
+        r_get.return_value = Mock(status_code=501, encoding='utf-8',
+                                  text='<ApiException><Message>The Api Method called is not implemented</Message></ApiException>')
+        for i in range(3):
+            self.assertRaises(XeroNotImplemented, xero.contacts.all)
+        r_get.side_effect = ValueError('Not a network error')
+        for i in range(3):
+            self.assertRaises(ValueError, xero.contacts.all)
+        self.assertEqual(breaker.state(scope), 'closed')
+        self.assertEqual(len(breaker.circuits[scope].results), 0)
+
+        r_get.side_effect = requests.exceptions.Timeout()
+        for i in range(2):
+            self.assertRaises(requests.exceptions.Timeout, xero.contacts.all)
+        self.assertEqual(breaker.state(scope), 'open')
+
+    @patch('requests.get')
+    def test_unsent_probe(self, r_get):
+        "A probe that isn't sent (e.g., over budget) is given back"
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        breaker = CircuitBreaker(min_calls=1)
+        budget = DailyBudget(os.path.join(tmpdir, 'budget.db'), limit=10, reserve=0, low_reserve=9)
+        xero = Xero(credentials, breaker=breaker, budget=budget)
+
+        r_get.return_value = Mock(status_code=500, text='Internal error')
+        self.assertRaises(XeroInternalError, xero.contacts.all)
+        scope = ' '.join([xero.contacts.credential_key, 'Contacts'])
+        breaker.circuits[scope].opened_at -= 30
+
+        self.assertRaises(XeroBudgetExceeded, xero.contacts.all, priority='low')
+        self.assertEqual(breaker.state(scope), 'half-open')
+
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text='<Response><Contacts /></Response>')
+        xero.contacts.all()
+        self.assertEqual(breaker.state(scope), 'closed')
+        self.assertEqual(r_get.call_count, 2)
@@ -0,0 +1,103 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.budget import DailyBudget
+from xero.constants import XERO_API_URL
+from xero.exceptions import XeroBudgetExceeded, XeroRateLimitExceeded
+
+
+class DailyBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'budget.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_priorities(self):
+        "Lower priority calls stop before the budget is used up"
+        budget = DailyBudget(self.path, limit=10, reserve=2, low_reserve=5)
+
+        for i in range(5):
+            budget.spend('org', 'low')
+        self.assertRaises(XeroBudgetExceeded, budget.spend, 'org', 'low')
+        self.assertEqual(budget.remaining('org'), 5)
+
+        for i in range(3):
+            budget.spend('org')
+        try:
+            budget.spend('org')
+            self.fail('Should raise XeroBudgetExceeded')
+        except XeroBudgetExceeded as e:
+            self.assertEqual(e.remaining, 2)
+            self.assertTrue(0 < e.retry_after <= 86400)
+
+        budget.spend('org', 'high', calls=2)
+        self.assertRaises(XeroBudgetExceeded, budget.spend, 'org', 'high')
+        self.assertEqual(budget.remaining('org'), 0)
+
+        # Budgets are kept per organisation, and shared through the file
+        self.assertEqual(DailyBudget(self.path, limit=10).used('org'), 10)
+        self.assertEqual(budget.remaining('other'), 10)
+        self.assertRaises(ValueError, budget.spend, 'other', 'urgent')
+
+    def test_exhaust(self):
+        budget = DailyBudget(self.path, limit=10)
+        budget.exhaust('org')
+        self.assertEqual(budget.remaining('org'), 0)
+
+    @patch('requests.get')
+    def test_manager_requests(self, r_get):
+        "Every request uses the organisation's budget, across managers"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text='<Response><Contacts /></Response>')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        budget = DailyBudget(self.path, limit=3, reserve=1, low_reserve=2)
+        xero = Xero(credentials, budget=budget)
+
+        xero.contacts.all(priority='low')
+        self.assertRaises(XeroBudgetExceeded, xero.invoices.all, priority='low')
+        xero.invoices.all()
+        xero.payroll.employees.all(priority='high')
+        self.assertEqual(r_get.call_count, 3)
+        self.assertRaises(XeroBudgetExceeded, xero.contacts.all, priority='high')
+        self.assertEqual(r_get.call_count, 3)
+        self.assertEqual(budget.remaining(xero.contacts.organisation_key), 0)
+
+    @patch('requests.get')
+    def test_daily_limit_response(self, r_get):
+        "When Xero reports the daily limit, every process sharing the budget stops"
+        r_get.return_value = Mock(status_code=503, headers={'X-Rate-Limit-Problem': 'Day'},
+                text='oauth_problem=rate%20limit%20exceeded&oauth_problem_advice=please%20wait%20before%20retrying%20the%20xero%20api')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials, budget=DailyBudget(self.path, limit=2000))
+
+        self.assertRaises(XeroRateLimitExceeded, xero.contacts.all)
+        self.assertEqual(r_get.call_count, 1)
+
+        # Another process, with its own view of the same budget
+        other = Xero(credentials, budget=DailyBudget(self.path, limit=2000))
+        self.assertRaises(XeroBudgetExceeded, other.invoices.all, priority='high')
+        self.assertEqual(r_get.call_count, 1)
+
+    @patch('requests.get')
+    def test_minute_limit_response(self, r_get):
+        "The per-minute limit doesn't use up the budget"
+        r_get.return_value = Mock(status_code=503, headers={'X-Rate-Limit-Problem': 'Minute'},
+                text='oauth_problem=rate%20limit%20exceeded&oauth_problem_advice=please%20wait%20before%20retrying%20the%20xero%20api')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        budget = DailyBudget(self.path, limit=2000)
+        xero = Xero(credentials, budget=budget)
+
+        self.assertRaises(XeroRateLimitExceeded, xero.contacts.all)
+        self.assertEqual(budget.remaining(xero.contacts.organisation_key), 1999)
@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.cache import DiskCache
+from xero.constants import XERO_API_URL
+
+from .columnar import INVOICES
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def response(self, text='<Response />'):
+        return Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=text)
+
+    def test_expiry_and_eviction(self):
+        "Entries expire, and the oldest entries are evicted when the cache is full"
+        cache = DiskCache(self.path, ttl=60, max_entries=2)
+        cache.set('a', self.response('A'))
+        cache.set('b', self.response('B'), ttl=-1)
+        self.assertEqual(cache.get('a').text, 'A')
+        self.assertEqual(cache.get('b'), None)
+
+        cache.set('c', self.response('C'), ttl=120)
+        cache.set('d', self.response('D'), ttl=180)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('d').text, 'D')
+
+        cache = DiskCache(self.path, max_bytes=1)
+        cache.set('e', self.response('E'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get('e').headers, {'content-type': 'text/xml; charset=utf-8'})
+
+    def test_sizes(self):
+        "Sizes are counted in UTF-8 bytes, and the totals are kept as entries change"
+        cache = DiskCache(self.path, max_bytes=10)
+        cache.set('a', self.response('\u00e9\u00e9\u00e9'))
+        self.assertEqual(cache.size, 6)
+        cache.set('a', self.response('\u00e9\u00e9'))
+        self.assertEqual((len(cache), cache.size), (1, 4))
+
+        # 4 + 8 bytes is over the limit, although it's only 10 characters
+        cache.set('b', self.response('\u00e9\u00e9\u00e9\u00e9'), ttl=600)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual((len(cache), cache.size), (1, 8))
+
+        cache.set('c', self.response('C'), scope='contacts', ttl=900)
+        cache.invalidate('contacts')
+        self.assertEqual((len(cache), cache.size), (1, 8))
+
+        # Other processes see the same totals
+        other = DiskCache(self.path)
+        self.assertEqual((len(other), other.size), (1, 8))
+        other.clear()
+        self.assertEqual((len(cache), cache.size), (0, 0))
+
+    def test_make_key(self):
+        "Keys depend on every part of the request, but not on header order"
+        cache = DiskCache(self.path)
+        self.assertEqual(
+            cache.make_key('creds', 'uri', {'A': '1', 'B': '2'}),
+            cache.make_key('creds', 'uri', {'B': '2', 'A': '1'}),
+        )
+        self.assertNotEqual(cache.make_key('creds', 'uri', None), cache.make_key('other', 'uri', None))
+
+    @patch('requests.post')
+    @patch('requests.get')
+    def test_manager_cache(self, r_get, r_post):
+        "Responses are shared between managers (and processes) through the cache"
+        r_get.return_value = self.response(INVOICES)
+        r_post.return_value = self.response(INVOICES)
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+
+        xero = Xero(credentials, cache=DiskCache(self.path))
+        first = xero.invoices.all()
+
+        # A separate client with the same credentials uses the cached response
+        xero = Xero(credentials, cache=DiskCache(self.path))
+        self.assertEqual(xero.invoices.all(), first)
+        self.assertEqual(r_get.call_count, 1)
+
+        # Different credentials (i.e., a different organisation) don't
+        other = Mock()
+        other.oauth.api_url = XERO_API_URL
+        Xero(other, cache=DiskCache(self.path)).invoices.all()
+        self.assertEqual(r_get.call_count, 2)
+
+        # Saving an invoice invalidates the cached invoices
+        xero.invoices.save({'InvoiceID': '243216c5-369e-4056-ac67-05388f86dc81', 'Status': 'VOIDED'})
+        xero.invoices.all()
+        self.assertEqual(r_get.call_count, 3)
@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.cassette import RecordingTransport, ReplayTransport, redact_uri
+from xero.constants import XERO_API_URL
+
+from .columnar import INVOICES
+
+
+class CassetteTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.credentials = Mock()
+        self.credentials.oauth.api_url = XERO_API_URL
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch('requests.put')
+    @patch('requests.get')
+    def test_record_and_replay(self, r_get, r_put):
+        "Recorded responses are served back, without contacting Xero"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text=INVOICES)
+        r_put.return_value = Mock(status_code=400, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text='<ApiException><Message>Bad</Message></ApiException>')
+
+        for path in ['invoices.ndjson', 'invoices.ndjson.gz']:
+            path = os.path.join(self.tmpdir, path)
+            with RecordingTransport(path) as transport:
+                xero = Xero(self.credentials, transport=transport)
+                recorded = xero.invoices.filter(Status='PAID')
+                xero.invoices.get('INV-1', headers={'Authorization': 'OAuth secret', 'Accept': 'text/xml'})
+                self.assertRaises(Exception, xero.contacts.put, {'Name': 'Bad'})
+            self.assertEqual(transport.interactions, 3)
+
+            r_get.reset_mock()
+            r_put.reset_mock()
+            xero = Xero(self.credentials, transport=ReplayTransport(path))
+            self.assertEqual(xero.invoices.filter(Status='PAID'), recorded)
+            self.assertEqual(xero.invoices.filter(Status='PAID'), recorded)
+            self.assertEqual(xero.invoices.get('INV-1'), recorded)
+            self.assertRaises(Exception, xero.contacts.put, {'Name': 'Bad'})
+            self.assertRaises(KeyError, xero.invoices.filter, Status='DRAFT')
+            self.assertEqual(r_get.call_count, 0)
+            self.assertEqual(r_put.call_count, 0)
+
+        # Credentials aren't recorded
+        with open(os.path.join(self.tmpdir, 'invoices.ndjson')) as f:
+            f.readline()
+            interaction = json.loads(f.readline())
+        self.assertEqual(interaction['headers'], {'Accept': 'text/xml'})
+        self.assertFalse('secret' in json.dumps(interaction))
+
+    def test_replay_order_and_latency(self):
+        "Repeated requests are answered in order, then with the last response"
+        path = os.path.join(self.tmpdir, 'contacts.ndjson')
+        with open(path, 'w') as f:
+            for name in ['First', 'Second']:
+                f.write(json.dumps({
+                    'method': 'get', 'uri': XERO_API_URL + '/Contacts', 'body': None,
+                    'headers': {}, 'status_code': 200, 'content_type': 'text/xml',
+                    'encoding': 'utf-8', 'elapsed': 0.01,
+                    'text': '<Response><Contacts><Contact><Name>%s</Name></Contact></Contacts></Response>' % name,
+                }) + '\n')
+
+        transport = ReplayTransport(path, latency=lambda interaction: interaction['elapsed'])
+        xero = Xero(self.credentials, transport=transport)
+        started = time.time()
+        names = [xero.contacts.all()['Name'] for i in range(3)]
+        self.assertEqual(names, ['First', 'Second', 'Second'])
+        self.assertTrue(time.time() - started >= 0.03)
+        self.assertEqual(transport.requests, 3)
+
+    def test_redact_uri(self):
+        self.assertEqual(
+            redact_uri('https://api.xero.com/api.xro/2.0/Contacts?oauth_token=abc&page=2'),
+            'https://api.xero.com/api.xro/2.0/Contacts?oauth_token=REDACTED&page=2')
+        uri = 'https://api.xero.com/api.xro/2.0/Contacts?where=Name%3D%3D%22A%22'
+        self.assertEqual(redact_uri(uri), uri)
@@ -0,0 +1,69 @@
+from __future__ import unicode_literals
+
+from datetime import datetime
+import unittest
+
+from mock import Mock
+
+from xero import Xero
+
+
+class CatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.xero = Xero(Mock())
+        self.xero.accounts.all = Mock(return_value=[
+            {'AccountID': 'ebd06280-af70-4bed-97c6-7451a454ad85', 'Code': '200', 'Name': 'Sales'},
+            {'AccountID': '7d05a53d-613d-4eb2-a2fc-dcb6adb80b80', 'Code': '469', 'Name': 'Rent'},
+        ])
+        self.xero.taxrates.all = Mock(return_value=[
+            {'TaxType': 'OUTPUT', 'Name': 'GST on Income'},
+            {'TaxType': 'INPUT', 'Name': 'GST on Expenses'},
+        ])
+        self.xero.currencies.all = Mock(return_value={'Code': 'AUD', 'Description': 'Australian Dollar'})
+        self.xero.trackingcategories.all = Mock(return_value=[
+            {'TrackingCategoryID': '351953c4-8672-4e9a-b8e6-4d18a0d2e9a3', 'Name': 'Region', 'Options': [
+                {'TrackingOptionID': 'ae777a87-5ef3-4fa0-a4f0-d10e1f13073a', 'Name': 'North'},
+                {'TrackingOptionID': '2b7ba73c-6b59-4bb0-8fe0-4d7c8e39a53c', 'Name': 'South'},
+            ]},
+        ])
+
+    def test_lookups(self):
+        "Reference data is loaded once, and indexed by code, ID and name"
+        catalog = self.xero.catalog
+
+        self.assertEqual(catalog.account('200')['Name'], 'Sales')
+        self.assertEqual(catalog.account('7d05a53d-613d-4eb2-a2fc-dcb6adb80b80')['Code'], '469')
+        self.assertEqual(catalog.account('rent')['Code'], '469')
+        self.assertEqual(catalog.account('999'), None)
+        self.assertEqual(catalog.tax_rate('GST on Income')['TaxType'], 'OUTPUT')
+        self.assertEqual(catalog.currency('AUD')['Description'], 'Australian Dollar')
+        self.assertEqual(catalog.tracking_category('Region')['TrackingCategoryID'], '351953c4-8672-4e9a-b8e6-4d18a0d2e9a3')
+        self.assertEqual(catalog.tracking_option('region', 'South')['TrackingOptionID'], '2b7ba73c-6b59-4bb0-8fe0-4d7c8e39a53c')
+        self.assertEqual(catalog.tracking_option('ae777a87-5ef3-4fa0-a4f0-d10e1f13073a')['Name'], 'North')
+
+        self.assertEqual(self.xero.accounts.all.call_count, 1)
+
+    def test_background_refresh(self):
+        "Stale data is refreshed in the background, using only the changes"
+        catalog = self.xero.catalog
+        catalog.account('200')
+        since = catalog.since
+
+        self.xero.accounts.filter = Mock(return_value=[
+            {'AccountID': 'ebd06280-af70-4bed-97c6-7451a454ad85', 'Code': '200', 'Name': 'Sales - Consulting'},
+        ])
+        for name in ('taxrates', 'currencies', 'trackingcategories'):
+            getattr(self.xero, name).filter = Mock(return_value=None)
+
+        catalog.max_age = 0
+        catalog.loaded_at -= 1
+        # The lookup doesn't wait for the refresh
+        self.assertNotEqual(catalog.account('200'), None)
+        catalog.thread.join()
+
+        self.assertEqual(catalog.error, None)
+        self.xero.accounts.filter.assert_called_once_with(since=since)
+        self.assertTrue(isinstance(catalog.since, datetime))
+        self.assertEqual(catalog.account('200')['Name'], 'Sales - Consulting')
+        self.assertEqual(catalog.account('sales - consulting')['Code'], '200')
+        self.assertEqual(catalog.account('469')['Name'], 'Rent')
@@ -0,0 +1,147 @@
+from __future__ import unicode_literals
+
+from array import array
+from datetime import date
+import math
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.columnar import to_columns
+
+
+INVOICES = """<Response xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Id>4f2e4b0e-3b4a-4c6d-9d51-6a0c3f1a8b7e</Id>
+  <Status>OK</Status>
+  <ProviderName>TradesCloud</ProviderName>
+  <DateTimeUTC>2013-06-30T06:07:35.3732465Z</DateTimeUTC>
+  <Invoices>
+    <Invoice>
+      <InvoiceID>243216c5-369e-4056-ac67-05388f86dc81</InvoiceID>
+      <Type>ACCREC</Type>
+      <Contact>
+        <ContactID>755f1475-d255-43a8-bedc-5ea7fd26c71f</ContactID>
+        <Name>Yarra Transport</Name>
+      </Contact>
+      <Date>2013-06-01T00:00:00</Date>
+      <Status>AUTHORISED</Status>
+      <LineItems>
+        <LineItem>
+          <LineItemID>4a3c2c3b-52c6-4f3e-8f64-8b1e1a7f2f42</LineItemID>
+          <Description>Consulting</Description>
+          <Quantity>2.0000</Quantity>
+          <UnitAmount>100.00</UnitAmount>
+          <LineAmount>200.00</LineAmount>
+        </LineItem>
+        <LineItem>
+          <LineItemID>8ffb5c9a-20f4-4b0e-9ab3-39c7c8c17f66</LineItemID>
+          <Description>Travel</Description>
+          <Quantity>1.0000</Quantity>
+          <UnitAmount>50.00</UnitAmount>
+          <LineAmount>50.00</LineAmount>
+        </LineItem>
+      </LineItems>
+      <Total>250.00</Total>
+      <AmountDue>250.00</AmountDue>
+    </Invoice>
+    <Invoice>
+      <InvoiceID>0032c5a5-2b5d-4cb5-a7e5-5d9f3c35c6d1</InvoiceID>
+      <Type>ACCREC</Type>
+      <Contact>
+        <ContactID>755f1475-d255-43a8-bedc-5ea7fd26c71f</ContactID>
+        <Name>Yarra Transport</Name>
+      </Contact>
+      <Date>2013-06-15T00:00:00</Date>
+      <Status>DRAFT</Status>
+      <LineItems>
+        <LineItem>
+          <LineItemID>1c5a1b7e-6f7d-4e8b-a4e9-20e9f36fe8e1</LineItemID>
+          <Description>Consulting</Description>
+          <Quantity>3.0000</Quantity>
+          <UnitAmount>100.00</UnitAmount>
+          <LineAmount>300.00</LineAmount>
+        </LineItem>
+      </LineItems>
+      <Total>300.00</Total>
+    </Invoice>
+  </Invoices>
+</Response>
+"""
+
+
+class ColumnarTest(unittest.TestCase):
+    def test_to_columns(self):
+        "Records are converted into columns, with nested collections in child tables"
+        records = [
+            {
+                'InvoiceID': 'a',
+                'Total': '10.00',
+                'Contact': {'Name': 'John'},
+                'LineItems': [
+                    {'LineItemID': 'a1', 'LineAmount': '10.00', 'Tracking': [{'Name': 'Region', 'Option': 'North'}]},
+                ],
+            },
+            {
+                'InvoiceID': 'b',
+                'Status': 'PAID',
+                'LineItems': [],
+            },
+        ]
+        table = to_columns(records, key='InvoiceID', numeric=('Total', 'LineAmount'))
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.column('InvoiceID'), ['a', 'b'])
+        self.assertEqual(table.column('Contact.Name'), ['John', None])
+        self.assertEqual(table.column('Status'), [None, 'PAID'])
+        self.assertTrue(isinstance(table.column('Total'), array))
+        self.assertEqual(table.column('Total')[0], 10.0)
+        self.assertTrue(math.isnan(table.column('Total')[1]))
+
+        line_items = table.children['LineItems']
+        self.assertEqual(line_items.column('InvoiceID'), ['a'])
+        self.assertEqual(list(line_items.column('LineAmount')), [10.0])
+
+        tracking = table.children['LineItems.Tracking']
+        self.assertEqual(tracking.column('InvoiceID'), ['a'])
+        self.assertEqual(tracking.column('LineItemID'), ['a1'])
+        self.assertEqual(tracking.column('Option'), ['North'])
+
+    def test_non_numeric(self):
+        "A numeric field with a value that isn't a number becomes a text column"
+        records = [
+            {'InvoiceID': 'a', 'Total': '10.00', 'AmountDue': '0.00'},
+            {'InvoiceID': 'b', 'Total': '', 'AmountDue': 'N/A'},
+            {'InvoiceID': 'c', 'Total': '5.00'},
+        ]
+        table = to_columns(records, numeric=('Total', 'AmountDue'))
+
+        self.assertTrue(isinstance(table.column('Total'), array))
+        self.assertEqual(table.column('Total')[2], 5.0)
+        self.assertEqual(table.column('AmountDue'), ['0.00', 'N/A', None])
+
+    @patch('requests.get')
+    def test_columnar_filter(self, r_get):
+        "List results can be decoded directly into columns"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=INVOICES)
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        table = xero.invoices.filter(Status='AUTHORISED', columnar=True)
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.column('Date'), [date(2013, 6, 1), date(2013, 6, 15)])
+        self.assertEqual(list(table.column('Total')), [250.0, 300.0])
+        self.assertTrue(math.isnan(table.column('AmountDue')[1]))
+
+        line_items = table.children['LineItems']
+        self.assertEqual(len(line_items), 3)
+        self.assertEqual(line_items.column('InvoiceID'), [
+            '243216c5-369e-4056-ac67-05388f86dc81',
+            '243216c5-369e-4056-ac67-05388f86dc81',
+            '0032c5a5-2b5d-4cb5-a7e5-5d9f3c35c6d1',
+        ])
+        self.assertEqual(sum(line_items.column('LineAmount')), 550.0)
@@ -0,0 +1,286 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.breaker import CircuitBreaker
+from xero.concurrency import AdaptiveLimiter, PriorityDispatcher, SingleFlight
+from xero.exceptions import XeroDeadlineExceeded, XeroInternalError, XeroRateLimitExceeded
+from xero.constants import XERO_API_URL
+
+from .columnar import INVOICES
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_are_collapsed(self):
+        "Identical concurrent calls share the result of a single call"
+        group = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func(value):
+            calls.append(value)
+            started.set()
+            release.wait()
+            return value * 2
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(group.do('key', func, 21)))
+        leader.start()
+        started.wait()
+
+        followers = [
+            threading.Thread(target=lambda: results.append(group.do('key', func, 21)))
+            for i in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        while group.calls['key'].waiters < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(calls, [21])
+        self.assertEqual(results, [42] * 5)
+
+        # Once finished, the call isn't remembered
+        self.assertEqual(group.do('key', lambda: 'again'), 'again')
+        self.assertEqual(group.calls, {})
+
+    def test_errors_are_shared(self):
+        group = SingleFlight()
+
+        def fail():
+            raise ValueError('failed')
+
+        self.assertRaises(ValueError, group.do, 'key', fail)
+        self.assertEqual(group.calls, {})
+
+    @patch('requests.get')
+    def test_manager_requests(self, r_get):
+        "Managers collapse identical concurrent GET requests"
+        release = threading.Event()
+
+        def get(*args, **kwargs):
+            release.wait()
+            return Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                        encoding='utf-8', text=INVOICES)
+        r_get.side_effect = get
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials, single_flight=SingleFlight())
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(xero.invoices.all()))
+            for i in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        call = None
+        while call is None or call.waiters < 2:
+            time.sleep(0.001)
+            call = next(iter(xero.invoices.single_flight.calls.values()), None)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(r_get.call_count, 1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[0] is results[1] is results[2])
+        self.assertEqual(results[0][0]['InvoiceID'], '243216c5-369e-4056-ac67-05388f86dc81')
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_increase_and_decrease(self):
+        "The limit grows while requests succeed, and halves when Xero is overloaded"
+        limiter = AdaptiveLimiter(initial=2, max_limit=4)
+        self.assertEqual(limiter.limit, 2)
+
+        for i in range(4):
+            limiter.release(limiter.acquire())
+        self.assertEqual(limiter.limit, 3)
+        for i in range(100):
+            limiter.release(limiter.acquire())
+        self.assertEqual(limiter.limit, 4)
+
+        # Only the first of several overloaded requests that were in
+        # flight together decreases the limit.
+        tokens = [limiter.acquire() for i in range(3)]
+        for token in tokens:
+            limiter.release(token, overloaded=True)
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.backoffs, 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+        # Other failures leave the limit alone
+        limiter.release(limiter.acquire(), succeeded=False)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_acquire_waits_for_a_slot(self):
+        limiter = AdaptiveLimiter(initial=1)
+        token = limiter.acquire()
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(limiter.acquire()))
+        thread.start()
+        time.sleep(0.01)
+        self.assertEqual(acquired, [])
+        limiter.release(token)
+        thread.join()
+        self.assertEqual(acquired, [0])
+        self.assertEqual(limiter.in_flight, 1)
+
+    @patch('requests.get')
+    def test_manager_feedback(self, r_get):
+        "Managers report rate limiting to their limiter"
+        r_get.return_value = Mock(status_code=503, text='oauth_problem=rate%20limit%20exceeded&oauth_problem_advice=please%20wait%20before%20retrying%20the%20xero%20api')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        limiter = AdaptiveLimiter(initial=8)
+        xero = Xero(credentials, limiter=limiter)
+
+        self.assertRaises(XeroRateLimitExceeded, xero.contacts.all)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+        r_get.side_effect = IOError('connection reset')
+        self.assertRaises(IOError, xero.contacts.all)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class PriorityDispatcherTest(unittest.TestCase):
+    def _wait_for(self, dispatcher, key, queued):
+        while dispatcher.queued(key) < queued:
+            time.sleep(0.001)
+
+    def test_priority_order(self):
+        "Waiting requests are admitted by priority, then in arrival order"
+        dispatcher = PriorityDispatcher(concurrency=1)
+        dispatcher.acquire('org')
+        admitted = []
+
+        def request(name, priority):
+            dispatcher.acquire('org', priority)
+            admitted.append(name)
+            dispatcher.release('org')
+
+        threads = []
+        for name, priority in [('low', 'low'), ('normal 1', 'normal'),
+                               ('normal 2', 'normal'), ('high', 'high')]:
+            thread = threading.Thread(target=request, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            self._wait_for(dispatcher, 'org', len(threads))
+
+        # Other organisations aren't held up
+        dispatcher.acquire('other', 'low')
+        dispatcher.release('other')
+
+        dispatcher.release('org')
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admitted, ['high', 'normal 1', 'normal 2', 'low'])
+        self.assertEqual(dispatcher.in_flight, {})
+        self.assertEqual(dispatcher.admitted, 6)
+
+    def test_deadlines(self):
+        "Requests that wait past their deadline are dropped"
+        dispatcher = PriorityDispatcher(concurrency=1, deadlines={'low': 0.01})
+        dispatcher.acquire('org')
+
+        try:
+            dispatcher.acquire('org', 'low')
+            self.fail('Should raise XeroDeadlineExceeded')
+        except XeroDeadlineExceeded as e:
+            self.assertEqual(e.key, 'org')
+            self.assertEqual(e.priority, 'low')
+            self.assertTrue(e.waited >= 0.01)
+        self.assertRaises(XeroDeadlineExceeded, dispatcher.acquire, 'org', 'high', 0.01)
+        self.assertEqual(dispatcher.queued('org'), 0)
+        self.assertEqual(dispatcher.dropped, 2)
+
+        self.assertRaises(ValueError, dispatcher.acquire, 'org', 'urgent')
+        dispatcher.release('org')
+        dispatcher.acquire('org', 'low')
+        self.assertEqual(dispatcher.in_flight, {'org': 1})
+
+    @patch('requests.get')
+    def test_manager_requests(self, r_get):
+        "Managers wait for the dispatcher, and release it when done"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text=INVOICES)
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        dispatcher = PriorityDispatcher(concurrency=1)
+        xero = Xero(credentials, dispatcher=dispatcher)
+
+        xero.invoices.all(priority='high')
+        self.assertEqual(dispatcher.in_flight, {})
+
+        key = xero.invoices.organisation_key
+        dispatcher.acquire(key)
+        self.assertRaises(XeroDeadlineExceeded, xero.invoices.all, priority='low', deadline=0.01)
+        self.assertEqual(r_get.call_count, 1)
+
+        r_get.side_effect = IOError('connection reset')
+        dispatcher.release(key)
+        self.assertRaises(IOError, xero.invoices.all)
+        self.assertEqual(dispatcher.in_flight, {})
+
+    @patch('requests.get')
+    def test_dropped_requests_hold_no_probe(self, r_get):
+        "A request dropped from the queue doesn't use the circuit breaker's probe"
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        breaker = CircuitBreaker(min_calls=1)
+        dispatcher = PriorityDispatcher(concurrency=1)
+        xero = Xero(credentials, breaker=breaker, dispatcher=dispatcher)
+
+        r_get.return_value = Mock(status_code=500, text='Internal error')
+        self.assertRaises(XeroInternalError, xero.invoices.all)
+        scope = ' '.join([xero.invoices.credential_key, 'Invoices'])
+        breaker.circuits[scope].opened_at -= 30
+
+        key = xero.invoices.organisation_key
+        dispatcher.acquire(key)
+        self.assertRaises(XeroDeadlineExceeded, xero.invoices.all, priority='low', deadline=0.01)
+        dispatcher.release(key)
+
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text=INVOICES)
+        xero.invoices.all()
+        self.assertEqual(breaker.state(scope), 'closed')
+
+    @patch('requests.get')
+    def test_single_flight_by_priority(self, r_get):
+        "A high priority call doesn't join a queued low priority call"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text=INVOICES)
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        dispatcher = PriorityDispatcher(concurrency=1)
+        xero = Xero(credentials, dispatcher=dispatcher, single_flight=SingleFlight())
+
+        key = xero.invoices.organisation_key
+        dispatcher.acquire(key)
+        results = []
+        threads = []
+        for priority in ['low', 'high']:
+            thread = threading.Thread(target=lambda p=priority: results.append((p, xero.invoices.all(priority=p))))
+            thread.start()
+            threads.append(thread)
+            self._wait_for(dispatcher, key, len(threads))
+
+        dispatcher.release(key)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(priority for priority, result in results), ['high', 'low'])
+        self.assertEqual(r_get.call_count, 2)
@@ -0,0 +1,94 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+from datetime import date
+from decimal import Decimal
+import unittest
+from xml.dom.minidom import parseString
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.diff import canonical, changed_fields, content_hash
+
+
+BASELINE = [
+    {'ContactID': 'a', 'Name': 'Yarra Transport', 'IsSupplier': False, 'UpdatedDateUTC': '2013-06-01'},
+    {'ContactID': 'b', 'Name': 'Bayside Club', 'EmailAddress': 'bob@bsclub.co',
+     'Phones': {'Phone': {'PhoneType': 'MOBILE', 'PhoneNumber': '555'}}},
+    {'ContactID': 'c', 'Name': 'Café Oko'},
+]
+
+
+class DiffTest(unittest.TestCase):
+    def test_canonical(self):
+        "Values that would be saved identically compare equal"
+        self.assertEqual(canonical(Decimal('850.00')), canonical('850.00'))
+        self.assertEqual(canonical(False), canonical('false'))
+        self.assertEqual(canonical(date(2013, 6, 1)), '2013-06-01')
+        self.assertEqual(
+            canonical({'Phone': {'PhoneNumber': '555'}}, collections=('Phone',)),
+            canonical([{'PhoneNumber': '555'}]),
+        )
+        self.assertEqual(content_hash({'a': 1, 'b': 2}), content_hash({'b': '2', 'a': '1'}))
+        self.assertNotEqual(content_hash({'a': 1}), content_hash({'a': 2}))
+        self.assertEqual(changed_fields({'a': 1, 'b': 2}, {'a': '1', 'b': 3, 'c': 4}), ['b'])
+
+    @patch('requests.post')
+    def test_upsert_changed(self, r_post):
+        "Only changed records are sent, trimmed to the fields that changed"
+        r_post.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8',
+                                   text='<Response><Contacts><Contact><ContactID>b</ContactID></Contact></Contacts></Response>')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        xero.contacts.upsert_changed([
+            # Unchanged; fields that aren't provided aren't compared
+            {'ContactID': 'a', 'Name': 'Yarra Transport', 'IsSupplier': 'false'},
+            # Changed email
+            {'ContactID': 'b', 'Name': 'Bayside Club', 'EmailAddress': 'secretarybob@bsclub.co',
+             'Phones': [{'PhoneType': 'MOBILE', 'PhoneNumber': '555'}]},
+            # New
+            {'Name': 'Abacus'},
+        ], BASELINE, batch_size=1)
+
+        self.assertEqual(r_post.call_count, 2)
+        sent = [parseString(call[1]['data']['xml']) for call in r_post.call_args_list]
+        contact = sent[0].getElementsByTagName('Contact')[0]
+        self.assertEqual(sorted(node.tagName for node in contact.childNodes), ['ContactID', 'EmailAddress'])
+        self.assertEqual(sent[1].getElementsByTagName('Name')[0].firstChild.data, 'Abacus')
+
+        # Nothing has changed, so nothing is sent
+        r_post.reset_mock()
+        self.assertEqual(xero.contacts.upsert_changed(BASELINE[:2], dict((c['ContactID'], c) for c in BASELINE)), [])
+        self.assertEqual(r_post.call_count, 0)
+
+    @patch('requests.post')
+    def test_upsert_changed_hashes(self, r_post):
+        "Unchanged records are skipped using the stored hashes, without reading the baseline"
+        r_post.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8',
+                                   text='<Response><Contacts><Contact><ContactID>b</ContactID></Contact></Contacts></Response>')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        records = [
+            {'ContactID': 'a', 'Name': 'Yarra Transport'},
+            {'ContactID': 'b', 'Name': 'Bayside Club', 'EmailAddress': 'secretarybob@bsclub.co'},
+        ]
+        hashes = xero.contacts.content_hashes(BASELINE, ['ContactID', 'Name'])
+        self.assertEqual(sorted(hashes), ['a', 'b', 'c'])
+        del hashes['b']
+
+        # The stored side of 'a' can't be canonicalised; only its hash is used
+        baseline = dict((c['ContactID'], c) for c in BASELINE)
+        baseline['a'] = object()
+        xero.contacts.upsert_changed(records, baseline, hashes=hashes)
+
+        self.assertEqual(r_post.call_count, 1)
+        sent = parseString(r_post.call_args[1]['data']['xml'])
+        self.assertEqual(sent.getElementsByTagName('ContactID')[0].firstChild.data, 'b')
+        # The missing hash was added, over the fields the record provides
+        self.assertEqual(hashes['b'], content_hash(BASELINE[1], list(records[1]), xero.contacts.MULTI_LINES))
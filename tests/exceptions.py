@@ -7,6 +7,7 @@ from xml.dom.minidom import parseString
 from mock import Mock, patch
 
 from xero import Xero
+from xero.constants import XERO_API_URL
 from xero.exceptions import *
 
 
@@ -97,6 +98,57 @@ class ExceptionsTest(unittest.TestCase):
         except Exception, e:
             self.fail("Should raise a XeroBadRequest, not %s" % e)
 
+    @patch('requests.post')
+    def test_bad_request_problems(self, r_post):
+        "Validation errors are reported against the object that caused them"
+        r_post.return_value = Mock(status_code=400, encoding='utf-8', text="""<ApiException xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <ErrorNumber>10</ErrorNumber>
+  <Type>ValidationException</Type>
+  <Message>A validation exception occurred</Message>
+  <Elements>
+    <DataContractBase xsi:type="Invoice">
+      <ValidationErrors />
+      <Reference>Order # 1</Reference>
+      <LineItems />
+    </DataContractBase>
+    <DataContractBase xsi:type="Invoice">
+      <ValidationErrors>
+        <ValidationError>
+          <Message>Invoice not of valid status for creation</Message>
+        </ValidationError>
+        <ValidationError>
+          <Message>A Contact must be specified for this type of transaction</Message>
+        </ValidationError>
+      </ValidationErrors>
+      <Warnings />
+      <Reference>Order # 2</Reference>
+      <Contact />
+      <Status>PAID</Status>
+    </DataContractBase>
+  </Elements>
+</ApiException>""")
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        try:
+            xero.invoices.save([{'Reference': 'Order # 1'}, {'Reference': 'Order # 2', 'Status': 'PAID'}])
+            self.fail("Should raise a XeroBadRequest.")
+
+        except XeroBadRequest, e:
+            self.assertEqual(e.message, 'A validation exception occurred')
+            self.assertEqual(e.errors, [
+                'Invoice not of valid status for creation',
+                'A Contact must be specified for this type of transaction',
+            ])
+            self.assertEqual(e.problems, [
+                (1, {'Reference': 'Order # 2', 'Status': 'PAID'}, [
+                    'Invoice not of valid status for creation',
+                    'A Contact must be specified for this type of transaction',
+                ]),
+            ])
+
     @patch('requests.get')
     def test_unauthorized_invalid(self, r_get):
         "A session with an invalid token raises an unauthorized exception"
@@ -0,0 +1,119 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import csv
+from datetime import date
+from decimal import Decimal
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.__main__ import get_managers
+from xero.constants import XERO_API_URL
+from xero.export import export, export_entity
+
+from .streams import journals_api
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        self.xero = Xero(credentials)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_ndjson(self, name):
+        with open(os.path.join(self.tmpdir, name)) as f:
+            return [json.loads(line) for line in f]
+
+    def test_ndjson(self):
+        "Every page of an entity is streamed to a file"
+        with patch('requests.get', side_effect=journals_api(5, page_size=2)):
+            self.xero.journals.PAGE_SIZE = 2
+            result = export_entity('Journals', self.xero.journals, self.tmpdir)
+
+        self.assertEqual(result.records, 5)
+        journals = self.read_ndjson('Journals.ndjson')
+        self.assertEqual([j['JournalNumber'] for j in journals], ['1', '2', '3', '4', '5'])
+        self.assertEqual(journals[0]['JournalDate'], '2013-06-01')
+        self.assertEqual(result.bytes, os.path.getsize(result.path))
+
+        # A completed export isn't repeated
+        with patch('requests.get') as r_get:
+            result = export_entity('Journals', self.xero.journals, self.tmpdir)
+        self.assertEqual(r_get.call_count, 0)
+        self.assertTrue(result.resumed)
+
+    def test_resume(self):
+        "An interrupted export resumes after the last completed page"
+        self.xero.journals.PAGE_SIZE = 2
+        api = journals_api(5, page_size=2)
+        calls = []
+
+        def interrupted(*args, **kwargs):
+            calls.append(args[0])
+            if len(calls) == 2:
+                raise IOError('connection reset')
+            return api(*args, **kwargs)
+
+        with patch('requests.get', side_effect=interrupted):
+            results = export([('Journals', self.xero.journals)], self.tmpdir)
+        self.assertTrue(isinstance(results[0].error, IOError))
+        self.assertEqual(len(self.read_ndjson('Journals.ndjson')), 2)
+
+        with patch('requests.get', side_effect=api) as r_get:
+            results = export([('Journals', self.xero.journals)], self.tmpdir)
+        self.assertTrue(results[0].resumed)
+        self.assertTrue(r_get.call_args_list[0][0][0].endswith('offset=2'))
+        self.assertEqual([j['JournalNumber'] for j in self.read_ndjson('Journals.ndjson')],
+                         ['1', '2', '3', '4', '5'])
+
+    def test_csv(self):
+        "Nested objects become dotted columns, and collections JSON"
+        manager = Mock()
+        manager.name = 'Invoices'
+        manager.pages.return_value = iter([
+            (2, [{'InvoiceID': 'a', 'Total': Decimal('10.00'), 'Date': date(2013, 6, 1),
+                  'Contact': {'Name': 'Café'}, 'LineItems': [{'LineAmount': '10.00'}]}]),
+            (3, [{'InvoiceID': 'b', 'Total': Decimal('5.00'), 'Reference': 'X'}]),
+        ])
+        export_entity('Invoices', manager, self.tmpdir, format='csv')
+
+        with open(os.path.join(self.tmpdir, 'Invoices.csv')) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['Contact.Name', 'Date', 'InvoiceID', 'LineItems', 'Total', '_extra'])
+        self.assertEqual(rows[1], [b'Caf\xc3\xa9', '2013-06-01', 'a', '[{"LineAmount": "10.00"}]', '10.00', ''])
+        self.assertEqual(rows[2], ['', '', 'b', '', '5.00', '{"Reference": "X"}'])
+
+    def test_csv_collections(self):
+        "Collections with a single item are written as lists, like longer collections"
+        manager = Mock()
+        manager.name = 'Contacts'
+        phone = {'PhoneType': 'MOBILE', 'PhoneNumber': '555'}
+        manager.pages.return_value = iter([
+            (None, [
+                {'ContactID': 'a', 'Phones': [phone, phone]},
+                {'ContactID': 'b', 'Phones': {'Phone': phone}},
+            ]),
+        ])
+        export_entity('Contacts', manager, self.tmpdir, format='csv')
+
+        with open(os.path.join(self.tmpdir, 'Contacts.csv')) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['ContactID', 'Phones', '_extra'])
+        self.assertEqual(json.loads(rows[1][1]), [phone, phone])
+        self.assertEqual(json.loads(rows[2][1]), [phone])
+
+    def test_entities(self):
+        names = [name for name, manager in get_managers(self.xero, ['invoices', 'Employees'])]
+        self.assertEqual(names, ['Invoices', 'Employees'])
+        self.assertFalse('Reports' in [name for name, manager in get_managers(self.xero, [])])
+        self.assertRaises(SystemExit, get_managers, self.xero, ['Widgets'])
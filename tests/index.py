@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+
+from mock import Mock
+
+from xero.index import ContactIndex, normalize_name
+
+
+CONTACTS = [
+    {'ContactID': '3e776c4b-ea9e-4bb1-96be-6b0c7a71a37f', 'ContactNumber': 'YT-1',
+     'Name': 'Yarra Transport', 'EmailAddress': 'rayong@yarratransport.co'},
+    {'ContactID': 'd6a384fb-f46f-41a3-8ac7-b7bc9e0b5efa', 'ContactNumber': 'BO-1',
+     'Name': 'Bayside Club', 'EmailAddress': 'secretarybob@bsclub.co'},
+    {'ContactID': '565acaa9-e7f3-4fbf-80c3-16b081ddae10',
+     'Name': 'Café Öko & Sons, Ltd.'},
+    {'ContactID': '9ce626d2-14ea-463c-9fff-6785ab5f9bfb',
+     'Name': 'Yarra Valley Wines'},
+]
+
+
+class ContactIndexTest(unittest.TestCase):
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('  Café Öko & Sons, Ltd. '), 'cafe oko sons ltd')
+        self.assertEqual(normalize_name(b'Bayside\tClub'), 'bayside club')
+
+    def test_lookups(self):
+        "Contacts can be found by ID, number, email and name"
+        index = ContactIndex(CONTACTS)
+
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.get('3e776c4b-ea9e-4bb1-96be-6b0c7a71a37f')['Name'], 'Yarra Transport')
+        self.assertEqual(index.by_number('BO-1')['Name'], 'Bayside Club')
+        self.assertEqual(index.by_email('SecretaryBob@BSClub.co')['Name'], 'Bayside Club')
+        self.assertEqual([c['ContactID'] for c in index.by_name('cafe oko sons ltd')],
+                         ['565acaa9-e7f3-4fbf-80c3-16b081ddae10'])
+        self.assertEqual(index.by_number('XX-1'), None)
+
+    def test_search(self):
+        "Names can be searched by prefix, or by any part of the name"
+        index = ContactIndex(CONTACTS)
+
+        self.assertEqual([c['Name'] for c in index.startswith('Yarra')],
+                         ['Yarra Transport', 'Yarra Valley Wines'])
+        self.assertEqual([c['Name'] for c in index.startswith('yarra', limit=1)], ['Yarra Transport'])
+        self.assertEqual(index.startswith('zebra'), [])
+
+        self.assertEqual([c['Name'] for c in index.contains('club')], ['Bayside Club'])
+        self.assertEqual([c['Name'] for c in index.contains('ra')],
+                         ['Yarra Transport', 'Yarra Valley Wines'])
+        self.assertEqual([c['Name'] for c in index.contains('oko')], ['Café Öko & Sons, Ltd.'])
+        self.assertEqual(index.contains('transport club'), [])
+        self.assertEqual([c['Name'] for c in index.contains('yarra')],
+                         ['Yarra Transport', 'Yarra Valley Wines'])
+        self.assertEqual([c['Name'] for c in index.contains('arra', limit=1)], ['Yarra Transport'])
+
+    def test_update(self):
+        "Updates only retrieve the contacts that have changed"
+        manager = Mock()
+        manager.iter.return_value = iter(CONTACTS)
+        index = ContactIndex()
+
+        self.assertEqual(index.update(manager), 4)
+        manager.iter.assert_called_once_with()
+        since = index.since
+
+        renamed = dict(CONTACTS[1], Name='Bayside Tennis Club', EmailAddress='bob@bsclub.co')
+        manager.iter.return_value = iter([renamed])
+        self.assertEqual(index.update(manager), 1)
+        manager.iter.assert_called_with(since=since)
+
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.by_email('secretarybob@bsclub.co'), None)
+        self.assertEqual(index.by_email('bob@bsclub.co')['Name'], 'Bayside Tennis Club')
+        self.assertEqual(index.by_name('Bayside Club'), [])
+        self.assertEqual([c['Name'] for c in index.contains('tennis')], ['Bayside Tennis Club'])
+        self.assertEqual(len(index.sorted_names), 4)
+
+        index.remove(renamed['ContactID'])
+        self.assertEqual(index.contains('club'), [])
+        self.assertNotIn(renamed['ContactID'], index)
@@ -0,0 +1,92 @@
+from __future__ import unicode_literals
+
+from datetime import date
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.ledger import Ledger
+
+from .streams import journals_api
+
+
+class LedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_balances(self):
+        "Journal lines are folded into per-account, per-period balances"
+        ledger = Ledger()
+        ledger.add_journal({
+            'JournalDate': date(2013, 5, 31),
+            'JournalLines': [
+                {'AccountCode': '200', 'AccountName': 'Sales', 'NetAmount': '-100.00'},
+                {'AccountCode': '610', 'NetAmount': '100.00', 'TrackingCategories': {
+                    'TrackingCategory': {'Name': 'Region', 'Option': 'North'},
+                }},
+            ],
+        })
+        ledger.add_journal({
+            'JournalDate': date(2013, 6, 1),
+            'JournalLines': [
+                {'AccountCode': '200', 'NetAmount': '-50.00'},
+                {'AccountCode': '610', 'NetAmount': '50.00'},
+            ],
+        })
+
+        self.assertEqual(ledger.periods, ['2013-05', '2013-06'])
+        self.assertEqual(ledger.balance('200'), -150.0)
+        self.assertEqual(ledger.balance('200', period='2013-06'), -50.0)
+        self.assertEqual(ledger.balance('200', through='2013-05'), -100.0)
+        self.assertEqual(ledger.balance('999'), 0.0)
+        self.assertEqual(ledger.account_names, {'200': 'Sales'})
+        self.assertEqual(ledger.tracking_balance('610', 'Region', 'North'), 100.0)
+        self.assertEqual(ledger.trial_balance(period='2013-05'), {'200': -100.0, '610': 100.0})
+
+    def test_through(self):
+        "Periods are compared as dates, whatever their format"
+        ledger = Ledger(period_format='%b %Y')
+        for day, amount in [(date(2013, 4, 30), '1.00'), (date(2013, 6, 1), '2.00'), (date(2013, 5, 15), '4.00')]:
+            ledger.add_journal({'JournalDate': day, 'JournalLines': [{'AccountCode': '200', 'NetAmount': amount}]})
+
+        self.assertEqual(ledger.periods, ['Apr 2013', 'Jun 2013', 'May 2013'])
+        self.assertEqual(ledger.balance('200', through='May 2013'), 5.0)
+        self.assertEqual(ledger.balance('200', through=date(2013, 4, 1)), 1.0)
+        self.assertRaises(ValueError, ledger.balance, '200', through='2013-05')
+
+        # Periods that aren't zero padded are compared correctly too
+        ledger = Ledger()
+        ledger.add_journal({'JournalDate': date(2013, 10, 1), 'JournalLines': [{'AccountCode': '200', 'NetAmount': '1.00'}]})
+        self.assertEqual(ledger.balance('200', through='2013-9'), 0.0)
+
+    @patch('requests.get')
+    def test_incremental_update(self, r_get):
+        "Ledgers are saved, and updated from the journals posted since"
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+        xero.journals.PAGE_SIZE = 2
+        path = os.path.join(self.tmpdir, 'ledger.json')
+
+        r_get.side_effect = journals_api(3, page_size=2)
+        ledger = Ledger(path)
+        self.assertEqual(ledger.update(xero.journals), 3)
+        self.assertEqual(ledger.trial_balance(), {'200': -6.0, '610': 6.0})
+
+        # More journals are posted; only the new ones are retrieved.
+        r_get.side_effect = journals_api(4, page_size=2)
+        r_get.reset_mock()
+        ledger = Ledger(path)
+        self.assertEqual(ledger.offset, 3)
+        self.assertEqual(ledger.update(xero.journals), 1)
+        self.assertEqual(r_get.call_count, 1)
+        self.assertTrue(r_get.call_args[0][0].endswith('/Journals?offset=3'))
+        self.assertEqual(ledger.trial_balance(through='2013-06'), {'200': -10.0, '610': 10.0})
@@ -1,13 +1,18 @@
 # coding: utf-8
 from __future__ import unicode_literals
 
-from datetime import date
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
 import unittest
 from xml.dom.minidom import parseString
 
 from mock import Mock, patch
 
 from xero import Xero
+from xero.constants import XERO_API_URL
+
+from .columnar import INVOICES
 
 
 class ManagerTest(unittest.TestCase):
@@ -57,6 +62,22 @@ class ManagerTest(unittest.TestCase):
         # Original should match reproduced version, embedded inside a parent key
         self.assertEqual(original, reproduced)
 
+    def test_serialization_escaping(self):
+        "Saved values are escaped, and empty values become empty elements"
+        xero = Xero(Mock())
+        xml = xero.contacts._prepare_data_for_save([
+            OrderedDict([
+                ('Name', 'Café <Brown> & Sons'),
+                ('Addresses', [{'AddressType': 'POBOX'}, {}]),
+                ('Phones', []),
+            ]),
+        ])
+        self.assertEqual(xml, b'<Contacts><Contact><Name>Caf&#233; &lt;Brown&gt; &amp; Sons</Name>'
+                              b'<Addresses><Address><AddressType>POBOX</AddressType></Address><Address /></Addresses>'
+                              b'<Phones /></Contact></Contacts>')
+        self.assertEqual(xero.contacts.convert_to_dict(xero.contacts.walk_dom(parseString(xml)))['Contacts']['Contact']['Name'],
+                         'Café <Brown> & Sons')
+
     @patch('requests.get')
     def test_unicode_content(self, r_get):
         "If you exceed the rate limit, an exception is raised."
@@ -126,3 +147,126 @@ class ManagerTest(unittest.TestCase):
 
         self.assertEqual(contact['FirstName'], 'John')
         self.assertEqual(contact['LastName'], 'Sürname')
+
+    def test_numeric_fields(self):
+        "Amount fields can be decoded as Decimals or floats"
+        data = {
+            'Total': '850.00',
+            'Date': date(2013, 2, 1),
+            'InvoiceNumber': '0001',
+            'LineItems': [
+                {'Quantity': '1.0000', 'UnitAmount': '850.00'},
+                {'Quantity': '2.0000', 'UnitAmount': '0.00'},
+            ],
+        }
+
+        # By default, amounts are left as strings.
+        xero = Xero(Mock())
+        xml = xero.invoices._prepare_data_for_save(data)
+        reproduced = xero.invoices.convert_to_dict(xero.invoices.walk_dom(parseString(xml)))
+        self.assertEqual(reproduced['Invoice']['Total'], '850.00')
+
+        xero = Xero(Mock(), numeric=Decimal)
+        reproduced = xero.invoices.convert_to_dict(xero.invoices.walk_dom(parseString(xml)))
+        invoice = reproduced['Invoice']
+        self.assertEqual(invoice['Total'], Decimal('850.00'))
+        self.assertEqual(invoice['LineItems'][0]['Quantity'], Decimal('1.0000'))
+        self.assertEqual(invoice['LineItems'][0]['UnitAmount'], Decimal('850.00'))
+        # Fields that aren't amounts aren't converted
+        self.assertEqual(invoice['InvoiceNumber'], '0001')
+
+        xero = Xero(Mock(), numeric=float, numeric_fields=['Total'])
+        reproduced = xero.invoices.convert_to_dict(xero.invoices.walk_dom(parseString(xml)))
+        invoice = reproduced['Invoice']
+        self.assertEqual(invoice['Total'], 850.0)
+        self.assertEqual(invoice['LineItems'][0]['UnitAmount'], '850.00')
+
+    @patch('requests.get')
+    def test_field_projection(self, r_get):
+        "Only the requested fields are decoded"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=INVOICES)
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        invoices = xero.invoices.filter(Status='AUTHORISED', fields=['InvoiceID', 'Date', 'LineItems.LineAmount', 'Contact.Name'])
+        self.assertEqual(r_get.call_args[0][0], XERO_API_URL + '/Invoices?where=Status%3D%3D%22AUTHORISED%22')
+        self.assertEqual(invoices[0], {
+            'InvoiceID': '243216c5-369e-4056-ac67-05388f86dc81',
+            'Date': date(2013, 6, 1),
+            'Contact': {'Name': 'Yarra Transport'},
+            'LineItems': [{'LineAmount': '200.00'}, {'LineAmount': '50.00'}],
+        })
+
+        # A single field is converted in the same way
+        invoices = xero.invoices.all(fields=['Date'])
+        self.assertEqual(invoices[0], {'Date': date(2013, 6, 1)})
+        xero = Xero(credentials, numeric=Decimal)
+        invoices = xero.invoices.all(fields=['AmountDue'])
+        self.assertTrue(isinstance(invoices[0]['AmountDue'], Decimal))
+        records = Xero(credentials, numeric=Decimal, records=True).invoices.all(fields=['AmountDue'])
+        self.assertEqual(records[0].AmountDue, invoices[0]['AmountDue'])
+
+        # Projection also applies in record mode
+        xero = Xero(credentials, records=True)
+        invoices = xero.invoices.all(fields=['InvoiceID', 'LineItems'])
+        self.assertEqual(invoices[1].keys(), ['InvoiceID', 'LineItems'])
+        self.assertEqual(invoices[1].LineItems['LineItem']['LineAmount'], '300.00')
+
+    @patch('requests.get')
+    def test_filter_uris(self, r_get):
+        "Equality filters produce the same URIs as they always have"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text='<Response><Invoices /></Response>')
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        for manager, kwargs, where in [
+            (xero.invoices, {'Date': date(2013, 6, 1)}, 'Date%3D%3D%222013-06-01%22'),
+            (xero.invoices, {'Date': datetime(2013, 6, 1, 9, 30)}, 'Date%3D%3D%222013-06-01%2009%3A30%3A00%22'),
+            (xero.invoices, {'UpdatedDateUTC': datetime(2013, 6, 1, 9, 30)}, 'UpdatedDateUTC%3D%3D2013-06-01T09%3A30%3A00'),
+            (xero.invoices, {'Total': 100}, 'Total%3D%3D%22100%22'),
+            (xero.invoices, {'Reference': True}, 'Reference%3D%3D%22True%22'),
+            (xero.contacts, {'Name__startswith': 'Yarra'}, 'Name.startswith%28%22Yarra%22%29'),
+            (xero.contacts, {'IsSupplier': True}, 'IsSupplier%3D%3Dtrue'),
+        ]:
+            manager.filter(**kwargs)
+            self.assertEqual(r_get.call_args[0][0], '%s/%s?where=%s' % (XERO_API_URL, manager.name, where))
+
+    @patch('requests.post')
+    def test_save_without_summarized_errors(self, r_post):
+        "Bulk saves can report validation errors per object, rather than failing"
+        r_post.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text="""<Response xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+  <Id>7e3d5f7c-ba5e-4a6f-9f1c-b7b1fa48c8a3</Id>
+  <Status>OK</Status>
+  <Invoices>
+    <Invoice status="OK">
+      <InvoiceID>243216c5-369e-4056-ac67-05388f86dc81</InvoiceID>
+      <Reference>Order # 1</Reference>
+    </Invoice>
+    <Invoice status="ERROR">
+      <Reference>Order # 2</Reference>
+      <ValidationErrors>
+        <ValidationError>
+          <Message>A Contact must be specified for this type of transaction</Message>
+        </ValidationError>
+      </ValidationErrors>
+    </Invoice>
+  </Invoices>
+</Response>""")
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        results = xero.invoices.save([{'Reference': 'Order # 1'}, {'Reference': 'Order # 2'}], summarize_errors=False)
+        self.assertEqual(r_post.call_args[0][0], XERO_API_URL + '/Invoices?summarizeErrors=false')
+        self.assertEqual(results[0], {'InvoiceID': '243216c5-369e-4056-ac67-05388f86dc81', 'Reference': 'Order # 1'})
+        self.assertEqual(results[1]['ValidationErrors'], {
+            'ValidationError': {'Message': 'A Contact must be specified for this type of transaction'}
+        })
+
+        xero.invoices.save({'Reference': 'Order # 1'})
+        self.assertEqual(r_post.call_args[0][0], XERO_API_URL + '/Invoices')
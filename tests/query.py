@@ -0,0 +1,79 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+import unittest
+import urllib
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.query import P, Q
+
+
+def where(uri):
+    return urllib.unquote(uri.split('where=')[1].split('&')[0].encode('ascii')).decode('utf-8')
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        self.xero = Xero(credentials)
+
+    def render(self, query, manager=None, **values):
+        manager = manager or self.xero.invoices
+        return urllib.unquote(query.compile(manager).render(values).encode('ascii')).decode('utf-8')
+
+    def test_conditions(self):
+        self.assertEqual(self.render(Q(Status='PAID')), 'Status=="PAID"')
+        self.assertEqual(self.render(Q(Contact_Name__contains='O\'Brien "Jr"')),
+                         'Contact.Name.contains("O\'Brien \\"Jr\\"")')
+        self.assertEqual(self.render(Q(Date__gte=date(2013, 1, 1), Date__lt=date(2013, 2, 1))),
+                         'Date>=DateTime(2013,01,01)&&Date<DateTime(2013,02,01)')
+        self.assertEqual(self.render(Q(UpdatedDateUTC__gte=datetime(2013, 1, 1))),
+                         'UpdatedDateUTC>=DateTime(2013,01,01,00,00,00)')
+        self.assertEqual(self.render(Q(UpdatedDateUTC=datetime(2013, 1, 1))),
+                         'UpdatedDateUTC==2013-01-01T00:00:00')
+        self.assertEqual(self.render(Q(Date=date(2013, 1, 1))), 'Date=="2013-01-01"')
+        self.assertEqual(self.render(Q(Date__ne=date(2013, 1, 1))), 'Date!=DateTime(2013,01,01)')
+        self.assertEqual(self.render(Q(Total__gt=100)), 'Total>100')
+        self.assertEqual(self.render(Q(InvoiceNumber=100)), 'InvoiceNumber=="100"')
+        self.assertEqual(self.render(Q(IsSupplier=1), self.xero.contacts), 'IsSupplier==true')
+        self.assertEqual(self.render(Q(Name='Café')), 'Name=="Café"')
+        self.assertRaises(ValueError, self.render, Q(Name__like='John'))
+
+    def test_combinations(self):
+        query = (Q(Status='DRAFT') | Q(Status='SUBMITTED')) & ~Q(Type='ACCPAY')
+        self.assertEqual(self.render(query), '(Status=="DRAFT"||Status=="SUBMITTED")&&!(Type=="ACCPAY")')
+
+    def test_parameters(self):
+        "Queries are compiled once, and reused with different parameters"
+        query = Q(Contact_ContactID=P('contact'), Date__gte=P('start'))
+        compiled = query.compile(self.xero.invoices)
+        self.assertTrue(query.compile(self.xero.invoices) is compiled)
+        self.assertEqual(compiled.params, ['contact', 'start'])
+
+        self.assertEqual(self.render(query, contact='a"b', start=datetime(2013, 1, 1, 9, 30)),
+                         'Contact.ContactID=="a\\"b"&&Date>=DateTime(2013,01,01,09,30,00)')
+        self.assertRaises(KeyError, compiled.render, {'contact': 'x'})
+
+    @patch('requests.get')
+    def test_filter(self, r_get):
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'},
+                                  encoding='utf-8', text='<Response><Invoices /></Response>')
+        invoices = self.xero.invoices
+
+        overdue = Q(Status='AUTHORISED') & Q(DueDate__lt=P('today'))
+        invoices.filter(overdue.bind(today=date(2013, 6, 1)), Contact_Name='Yarra', page=2)
+        uri = r_get.call_args[0][0]
+        self.assertTrue(uri.endswith('&page=2'))
+        self.assertEqual(where(uri), '(Status=="AUTHORISED"&&DueDate<DateTime(2013,06,01))&&(Contact.Name=="Yarra")')
+
+        # Keyword conditions are compiled once for each set of names
+        invoices.filter(Status='PAID', Reference='A & B')
+        self.assertEqual(where(r_get.call_args[0][0]), 'Reference=="A & B"&&Status=="PAID"')
+        invoices.filter(Status='DRAFT', Reference='C')
+        self.assertEqual(where(r_get.call_args[0][0]), 'Reference=="C"&&Status=="DRAFT"')
+        self.assertEqual(sorted(invoices._filter_queries), [('Contact_Name',), ('Reference', 'Status')])
@@ -0,0 +1,122 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+from decimal import Decimal
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.records import Record
+
+from .columnar import INVOICES
+
+
+class RecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.credentials = Mock()
+        self.credentials.oauth.api_url = XERO_API_URL
+
+    @patch('requests.get')
+    def test_record_mode(self, r_get):
+        "In record mode, results are compact records that decode fields lazily"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=INVOICES)
+
+        xero = Xero(self.credentials, records=True, numeric=Decimal)
+        invoices = xero.invoices.all()
+
+        self.assertEqual(len(invoices), 2)
+        invoice = invoices[0]
+        self.assertTrue(isinstance(invoice, Record))
+        self.assertFalse(hasattr(invoice, '__dict__'))
+
+        # Typed fields haven't been decoded yet.
+        self.assertEqual(invoice._Date, '2013-06-01T00:00:00')
+        self.assertEqual(invoice.Date, date(2013, 6, 1))
+        self.assertEqual(invoice._Date, date(2013, 6, 1))
+
+        self.assertEqual(invoice.Status, 'AUTHORISED')
+        self.assertEqual(invoice['Total'], Decimal('250.00'))
+        self.assertEqual(invoice.Contact, {
+            'ContactID': '755f1475-d255-43a8-bedc-5ea7fd26c71f',
+            'Name': 'Yarra Transport',
+        })
+        self.assertEqual(invoice.LineItems[1]['LineAmount'], Decimal('50.00'))
+
+        # Fields that weren't provided are missing, as they would be in a dict
+        self.assertFalse('AmountDue' in invoices[1])
+        self.assertEqual(invoices[1].get('AmountDue'), None)
+        self.assertRaises(KeyError, lambda: invoices[1]['AmountDue'])
+
+        # Records can be converted back into the dictionaries that would
+        # have been returned without record mode.
+        xero = Xero(self.credentials, numeric=Decimal)
+        self.assertEqual([i.to_dict() for i in invoices], xero.invoices.all())
+
+    def test_new_fields(self):
+        "Records with fields not seen before extend the record class"
+        xero = Xero(self.credentials, records=True)
+        manager = xero.contacts
+
+        first = manager._make_record([('Name', 'John'), ('UpdatedDateUTC', '2013-05-31T06:04:20.78')])
+        second = manager._make_record([('Name', 'Jane'), ('IsSupplier', 'true')])
+
+        self.assertEqual(first.keys(), ['Name', 'UpdatedDateUTC'])
+        self.assertEqual(first.UpdatedDateUTC, datetime(2013, 5, 31, 6, 4, 20, 780000))
+        self.assertEqual(second.keys(), ['Name', 'IsSupplier'])
+        self.assertEqual(second.IsSupplier, True)
+
+        # Records can be modified like dictionaries
+        second['Name'] = 'Jane Doe'
+        self.assertEqual(second.to_dict(), {'Name': 'Jane Doe', 'IsSupplier': True})
+
+    @patch('requests.get')
+    def test_save_records(self, r_get):
+        "Records can be saved in the same way as dictionaries"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=INVOICES)
+
+        xero = Xero(self.credentials, records=True)
+        invoices = xero.invoices.all(fields=['InvoiceID', 'Status'])
+        xml = xero.invoices._prepare_data_for_save(invoices[0])
+        self.assertEqual(xml, b'<Invoice><InvoiceID>243216c5-369e-4056-ac67-05388f86dc81</InvoiceID>'
+                              b'<Status>AUTHORISED</Status></Invoice>')
+        xml = xero.invoices._prepare_data_for_save(invoices)
+        self.assertTrue(xml.startswith(b'<Invoices><Invoice><InvoiceID>'))
+
+    @patch('requests.get')
+    def test_result_shape(self, r_get):
+        "Results have the same shape as in dict mode"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8',
+                                  text='<Response><Invoices><Invoice><InvoiceID>a</InvoiceID></Invoice></Invoices></Response>')
+
+        invoice = Xero(self.credentials, records=True).invoices.get('a')
+        self.assertTrue(isinstance(invoice, Record))
+        self.assertEqual(invoice, Xero(self.credentials).invoices.get('a'))
+
+        r_get.return_value.text = '<Response><Invoices /></Response>'
+        self.assertEqual(Xero(self.credentials, records=True).invoices.all(),
+                         Xero(self.credentials).invoices.all())
+
+    def test_concurrent_fields(self):
+        "Records with new fields can be made from several threads at once"
+        manager = Xero(self.credentials, records=True).contacts
+        fields = ['Field%d' % n for n in range(20)]
+        made = []
+
+        def make(n):
+            for m in range(20):
+                values = [('Name', 'Contact %d' % n), (fields[(n + m) % 20], 'x')]
+                made.append((values, manager._make_record(values)))
+
+        threads = [threading.Thread(target=make, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(made), 160)
+        for values, record in made:
+            self.assertEqual(record.to_dict(), dict(values))
+        self.assertEqual(sorted(manager.record_class._fields), sorted(['Name'] + fields))
@@ -0,0 +1,178 @@
+from __future__ import unicode_literals
+
+from array import array
+from io import BytesIO
+import math
+import unittest
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.reports import ReportReader, ReportRow, ReportTable, decode_report
+
+
+TRIAL_BALANCE = """<Response xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Id>9f3c6f7b-3bf4-4a87-9c4f-4ce6e0b9d1e0</Id>
+  <Status>OK</Status>
+  <ProviderName>TradesCloud</ProviderName>
+  <DateTimeUTC>2013-06-30T06:07:35.3732465Z</DateTimeUTC>
+  <Reports>
+    <Report>
+      <ReportID>TrialBalance</ReportID>
+      <ReportName>Trial Balance</ReportName>
+      <ReportType>TrialBalance</ReportType>
+      <ReportTitles>
+        <ReportTitle>Trial Balance</ReportTitle>
+        <ReportTitle>Demo Company (AU)</ReportTitle>
+        <ReportTitle>As at 30 June 2013</ReportTitle>
+      </ReportTitles>
+      <ReportDate>30 June 2013</ReportDate>
+      <UpdatedDateUTC>2013-06-30T06:07:35.3732465Z</UpdatedDateUTC>
+      <Rows>
+        <Row>
+          <RowType>Header</RowType>
+          <Cells>
+            <Cell><Value>Account</Value></Cell>
+            <Cell><Value>Debit</Value></Cell>
+            <Cell><Value>Credit</Value></Cell>
+          </Cells>
+        </Row>
+        <Row>
+          <RowType>Section</RowType>
+          <Title>Revenue</Title>
+          <Rows>
+            <Row>
+              <RowType>Row</RowType>
+              <Cells>
+                <Cell>
+                  <Value>Sales (200)</Value>
+                  <Attributes>
+                    <Attribute>
+                      <Value>7d05a53d-613d-4eb2-a2fc-dcb6adb80b80</Value>
+                      <Id>account</Id>
+                    </Attribute>
+                  </Attributes>
+                </Cell>
+                <Cell><Value></Value></Cell>
+                <Cell><Value>20150.00</Value></Cell>
+              </Cells>
+            </Row>
+          </Rows>
+        </Row>
+        <Row>
+          <RowType>Section</RowType>
+          <Title>Expenses</Title>
+          <Rows>
+            <Row>
+              <RowType>Row</RowType>
+              <Cells>
+                <Cell><Value>Rent (469)</Value></Cell>
+                <Cell><Value>4500.00</Value></Cell>
+                <Cell><Value></Value></Cell>
+              </Cells>
+            </Row>
+            <Row>
+              <RowType>Row</RowType>
+              <Cells>
+                <Cell><Value>Wages (477)</Value></Cell>
+                <Cell><Value>15650.00</Value></Cell>
+                <Cell><Value></Value></Cell>
+              </Cells>
+            </Row>
+          </Rows>
+        </Row>
+        <Row>
+          <RowType>Section</RowType>
+          <Title />
+          <Rows>
+            <Row>
+              <RowType>SummaryRow</RowType>
+              <Cells>
+                <Cell><Value>Total</Value></Cell>
+                <Cell><Value>20150.00</Value></Cell>
+                <Cell><Value>20150.00</Value></Cell>
+              </Cells>
+            </Row>
+          </Rows>
+        </Row>
+      </Rows>
+    </Report>
+  </Reports>
+</Response>
+"""
+
+
+class ReportsTest(unittest.TestCase):
+    def test_decode_report(self):
+        "A report is decoded into typed columns with section metadata"
+        table = decode_report(TRIAL_BALANCE.encode('utf-8'))
+
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table.header, ['Account', 'Debit', 'Credit'])
+        self.assertEqual(table.report['ReportID'], 'TrialBalance')
+        self.assertEqual(table.report['ReportTitles'][1], 'Demo Company (AU)')
+
+        # Text columns stay as strings; numeric columns are typed.
+        self.assertEqual(table.column('Account'), ['Sales (200)', 'Rent (469)', 'Wages (477)', 'Total'])
+        debit = table.column('Debit')
+        self.assertTrue(isinstance(debit, array))
+        self.assertTrue(math.isnan(debit[0]))
+        self.assertEqual(list(debit[1:]), [4500.0, 15650.0, 20150.0])
+
+        self.assertEqual(table.row_types, ['Row', 'Row', 'Row', 'SummaryRow'])
+        self.assertEqual(table.attributes[0], {'account': '7d05a53d-613d-4eb2-a2fc-dcb6adb80b80'})
+        self.assertEqual(table.section('Expenses'), (1, 3))
+        self.assertEqual(table.sections[-1], ('', 3, 4))
+
+    def test_reader_memory(self):
+        "Rows are removed from the tree once they have been read"
+        class Trickle(BytesIO):
+            # Arrives a few bytes at a time, as a slow download would
+            def read(self, size=-1):
+                return BytesIO.read(self, 32)
+
+        reader = ReportReader(Trickle(TRIAL_BALANCE.encode('utf-8')))
+        for row in reader:
+            # Only this row, its section, and the next row are in the tree
+            self.assertTrue(len(list(reader.root.iter('Row'))) <= 3)
+        self.assertEqual(list(reader.root.iter('Row')), [])
+        self.assertEqual(reader.report['ReportID'], 'TrialBalance')
+
+    def test_non_numeric_column(self):
+        "A column that stops being numeric is converted back to text"
+        table = ReportTable(['Account', 'Date'])
+        table.append(ReportRow(None, 'Row', ['Sales (200)', '20150.00'], {}))
+        table.append(ReportRow(None, 'Row', ['Rent (469)', ''], {}))
+        table.append(ReportRow(None, 'Row', ['Wages (477)', '30 Jun 2013'], {}))
+
+        self.assertEqual(table.column('Date'), ['20150.00', '', '30 Jun 2013'])
+        self.assertEqual(table.sections, [(None, 0, 3)])
+
+        # The original text of the numeric cells is kept
+        table = ReportTable(['Code'])
+        for value in ['0090', '1e3', 'Total']:
+            table.append(ReportRow(None, 'Row', [value], {}))
+        self.assertEqual(table.column('Code'), ['0090', '1e3', 'Total'])
+
+    @patch('requests.get')
+    def test_report_filter(self, r_get):
+        "Reports can be retrieved in columnar form, or as a stream of rows"
+        r_get.return_value = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=TRIAL_BALANCE)
+
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        xero = Xero(credentials)
+
+        table = xero.reports.report_filter('TrialBalance', columnar=True, date='2013-06-30')
+        self.assertEqual(r_get.call_args[0][0], XERO_API_URL + '/Reports/TrialBalance?date=2013-06-30')
+        self.assertEqual(list(table.column('Credit'))[-1], 20150.0)
+
+        r_get.return_value.raw = BytesIO(TRIAL_BALANCE.encode('utf-8'))
+        reader = xero.reports.report_filter('TrialBalance', columnar=True, stream=True)
+        self.assertTrue(r_get.call_args[1]['stream'])
+
+        rows = list(reader)
+        self.assertEqual(reader.header, ['Account', 'Debit', 'Credit'])
+        self.assertEqual([row.section for row in rows], ['Revenue', 'Expenses', 'Expenses', ''])
+        self.assertEqual(rows[-1].cells, ['Total', '20150.00', '20150.00'])
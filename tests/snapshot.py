@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+
+from datetime import date, datetime
+from decimal import Decimal
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from dateutil.tz import tzutc
+from mock import Mock
+
+from xero import Xero, snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'invoices.snap')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def invoices(self, count):
+        return [
+            {
+                'InvoiceID': '243216c5-369e-4056-ac67-%012d' % n,
+                'Status': 'PAID' if n % 2 else 'AUTHORISED',
+                'Date': date(2013, 6, 1 + n % 28),
+                'UpdatedDateUTC': datetime(2013, 6, 1, 6, 4, 20, 780000),
+                'Total': Decimal('%d.00' % n),
+                'IsDiscounted': bool(n % 3),
+                'Contact': {'ContactID': '755f1475-d255-43a8-bedc-5ea7fd26c71f', 'Name': 'Yarra Transport'},
+                'LineItems': [
+                    {'Description': 'Consulting', 'LineAmount': Decimal('%d.00' % n)},
+                ] * (n % 3),
+            }
+            for n in range(count)
+        ]
+
+    def test_round_trip(self):
+        "Records can be saved to a snapshot and loaded back"
+        invoices = self.invoices(25)
+        # Records with other shapes and value types are also supported
+        invoices.append({
+            'InvoiceID': 'odd',
+            'Reference': None,
+            'DateTimeUTC': datetime(2013, 5, 31, 6, 7, 35, tzinfo=tzutc()),
+            'Tags': ['a', 1, 2.5, ('b', date(2013, 1, 1))],
+        })
+
+        snapshot.dump(invoices, self.path, chunk_size=10)
+        self.assertEqual(snapshot.load(self.path), invoices)
+
+        # Snapshots are smaller than the pickled results
+        self.assertTrue(os.path.getsize(self.path) < len(pickle.dumps(invoices, 2)))
+
+    def test_random_access(self):
+        "Records can be read from a snapshot without loading the whole file"
+        invoices = self.invoices(25)
+        snapshot.dump(iter(invoices), self.path, chunk_size=10)
+
+        with snapshot.Snapshot(self.path) as snap:
+            self.assertEqual(len(snap), 25)
+            self.assertEqual(len(snap.chunks), 3)
+            self.assertEqual(snap[13], invoices[13])
+            self.assertEqual(snap[-1], invoices[-1])
+            self.assertRaises(IndexError, lambda: snap[25])
+
+    def test_records(self):
+        "Records from record mode are stored as dictionaries"
+        xero = Xero(Mock(), records=True)
+        record = xero.invoices._make_record([('InvoiceID', 'a'), ('Date', '2013-06-01T00:00:00')])
+
+        snapshot.dump([record], self.path)
+        self.assertEqual(snapshot.load(self.path), [{'InvoiceID': 'a', 'Date': date(2013, 6, 1)}])
+
+    def test_column(self):
+        "A single key can be read from every record, without decoding the others"
+        invoices = self.invoices(25)
+        invoices.append({'InvoiceID': 'odd'})
+        snapshot.dump(invoices, self.path, chunk_size=10)
+
+        with snapshot.Snapshot(self.path) as snap:
+            self.assertEqual(snap.column('Total'), [invoice.get('Total') for invoice in invoices])
+            # Only the Total columns of the last chunk were decoded
+            chunk = snap._cached[1]
+            self.assertEqual(len(chunk.decoded), 1)
+            self.assertEqual(snap[-2], invoices[-2])
+
+    def test_damaged(self):
+        "Truncated files, and other versions, are rejected with a clear error"
+        snapshot.dump(self.invoices(25), self.path, chunk_size=10)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        with open(self.path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaises(ValueError) as context:
+            snapshot.Snapshot(self.path)
+        self.assertIn('truncated', str(context.exception))
+
+        with open(self.path, 'wb') as f:
+            f.write(data[:3])
+        self.assertRaises(ValueError, snapshot.load, self.path)
+
+        with open(self.path, 'wb') as f:
+            f.write(snapshot.MAGIC + b'\x02' + data[5:])
+        with self.assertRaises(ValueError) as context:
+            snapshot.Snapshot(self.path)
+        self.assertIn('version 2', str(context.exception))
@@ -0,0 +1,158 @@
+from __future__ import unicode_literals
+
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from urlparse import parse_qs, urlparse
+
+from mock import Mock, patch
+
+from xero import Xero
+from xero.constants import XERO_API_URL
+from xero.streams import Checkpoint, JournalStream
+
+
+JOURNAL = """
+    <Journal>
+      <JournalID>%(number)s2a5f9d5-6f43-4c2e-9d3b-1f6c07ad5e1a</JournalID>
+      <JournalDate>2013-06-%(number)02dT00:00:00</JournalDate>
+      <JournalNumber>%(number)s</JournalNumber>
+      <CreatedDateUTC>2013-06-%(number)02dT02:05:10.583</CreatedDateUTC>
+      <JournalLines>
+        <JournalLine>
+          <JournalLineID>7be9db36-3598-4755-ba5c-c2dbc8c4a7a2</JournalLineID>
+          <AccountCode>200</AccountCode>
+          <NetAmount>-%(number)s.00</NetAmount>
+        </JournalLine>
+        <JournalLine>
+          <JournalLineID>6a0b6c46-88f1-4b4b-9f8d-15f5a5f17e67</JournalLineID>
+          <AccountCode>610</AccountCode>
+          <NetAmount>%(number)s.00</NetAmount>
+        </JournalLine>
+      </JournalLines>
+    </Journal>"""
+
+
+def journals_response(numbers):
+    return """<Response xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Id>5c0e2aa3-1b8e-4d4b-9d3c-39f6b2a3d2b1</Id>
+  <Status>OK</Status>
+  <ProviderName>TradesCloud</ProviderName>
+  <DateTimeUTC>2013-06-30T06:07:35.3732465Z</DateTimeUTC>
+  <Journals>%s
+  </Journals>
+</Response>""" % ''.join(JOURNAL % {'number': n} for n in numbers)
+
+
+def journals_api(count, page_size):
+    "A fake GET that serves `count` journals, paged by offset"
+    def get(uri, **kwargs):
+        query = parse_qs(urlparse(uri).query)
+        offset = int(query.get('offset', ['0'])[0])
+        numbers = range(offset + 1, min(offset + page_size, count) + 1)
+        return Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8', text=journals_response(numbers))
+    return get
+
+
+class StreamsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        credentials = Mock()
+        credentials.oauth.api_url = XERO_API_URL
+        self.xero = Xero(credentials)
+        self.xero.journals.PAGE_SIZE = 2
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_checkpoint(self):
+        "Checkpoints are saved to disk and can be reloaded"
+        path = os.path.join(self.tmpdir, 'offset')
+        checkpoint = Checkpoint(path)
+        self.assertEqual(checkpoint.load(0), 0)
+
+        checkpoint.save({'offset': 42})
+        self.assertEqual(Checkpoint(path).load(), {'offset': 42})
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(self.tmpdir), ['offset'])
+
+        checkpoint.clear()
+        self.assertEqual(checkpoint.load(), None)
+
+    @patch('requests.get')
+    def test_journal_stream(self, r_get):
+        "Journals are streamed across pages"
+        r_get.side_effect = journals_api(5, page_size=2)
+
+        numbers = [journal['JournalNumber'] for journal in JournalStream(self.xero.journals)]
+        self.assertEqual(numbers, ['1', '2', '3', '4', '5'])
+        self.assertEqual(r_get.call_count, 3)
+
+    @patch('requests.get')
+    def test_journal_projection(self, r_get):
+        "Journals are paged by JournalNumber, even if it wasn't asked for"
+        r_get.side_effect = journals_api(5, page_size=2)
+
+        journals = list(self.xero.journals.iter(fields=['JournalID']))
+        self.assertEqual([journal['JournalNumber'] for journal in journals], ['1', '2', '3', '4', '5'])
+        self.assertEqual(sorted(journals[0]), ['JournalID', 'JournalNumber'])
+        self.assertTrue(r_get.call_args[0][0].endswith('/Journals?offset=4'))
+
+    @patch('requests.get')
+    def test_resume(self, r_get):
+        "An interrupted stream resumes from the last completed batch"
+        r_get.side_effect = journals_api(5, page_size=2)
+        path = os.path.join(self.tmpdir, 'offset')
+
+        stream = iter(JournalStream(self.xero.journals, checkpoint=path))
+        seen = [next(stream)['JournalNumber'] for i in range(3)]
+        self.assertEqual(seen, ['1', '2', '3'])
+        # The first batch has been completely consumed
+        self.assertEqual(Checkpoint(path).load(), 2)
+
+        # Restart; journal 3 is seen again, as its batch wasn't completed.
+        numbers = [journal['JournalNumber'] for journal in JournalStream(self.xero.journals, checkpoint=path)]
+        self.assertEqual(numbers, ['3', '4', '5'])
+        self.assertEqual(Checkpoint(path).load(), 5)
+        self.assertTrue(r_get.call_args[0][0].endswith('/Journals?offset=4'))
+
+    def test_changes(self):
+        "Changes from every endpoint are merged in modification order"
+        xero = Xero(Mock())
+        since = datetime(2013, 6, 1)
+        for name in Xero.OBJECT_LIST:
+            getattr(xero, name.lower()).iter = Mock(return_value=iter([]))
+        for name in ('employees', 'timesheets', 'payitems'):
+            getattr(xero.payroll, name).iter = Mock(return_value=iter([]))
+
+        xero.contacts.iter = Mock(return_value=iter([
+            {'ContactID': 'c2', 'UpdatedDateUTC': datetime(2013, 6, 4)},
+            {'ContactID': 'c1', 'UpdatedDateUTC': datetime(2013, 6, 2)},
+        ]))
+        xero.invoices.iter = Mock(return_value=iter([
+            {'InvoiceID': 'i1', 'UpdatedDateUTC': datetime(2013, 6, 3)},
+        ]))
+        xero.payroll.employees.iter = Mock(return_value=iter([
+            {'EmployeeID': 'e1', 'UpdatedDateUTC': datetime(2013, 6, 5)},
+        ]))
+        xero.taxrates.iter = Mock(return_value=iter([{'TaxType': 'OUTPUT'}]))
+
+        events = [
+            (name, record.get(name[:-1] + 'ID', record.get('TaxType')))
+            for name, record in xero.changes(since)
+        ]
+        self.assertEqual(events, [
+            ('TaxRates', 'OUTPUT'),
+            ('Contacts', 'c1'),
+            ('Invoices', 'i1'),
+            ('Contacts', 'c2'),
+            ('Employees', 'e1'),
+        ])
+        xero.contacts.iter.assert_called_once_with(since=since)
+        self.assertEqual(xero.reports.iter.call_count, 0)
+
+        # Errors are raised once the other requests have finished
+        xero.invoices.iter = Mock(side_effect=ValueError('failed'))
+        self.assertRaises(ValueError, list, xero.changes(since, entities=['Contacts', 'Invoices']))
@@ -0,0 +1,110 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from xero.constants import XERO_API_URL
+from xero.sync import HashRing, SyncRunner, SyncStore
+
+
+def connect(tenant):
+    credentials = Mock()
+    credentials.oauth.api_url = XERO_API_URL
+    credentials.oauth.client.client_key = 'consumer'
+    credentials.oauth.client.resource_owner_key = tenant['id']
+    return credentials
+
+
+def job(xero, tenant, checkpoint):
+    xero.contacts.all()
+    if tenant.get('pages'):
+        for page in range(tenant['pages']):
+            xero.invoices.all()
+    if tenant['id'] == 'broken':
+        raise ValueError('no access')
+    position = checkpoint('journals')
+    position.save(position.load(0) + 1)
+
+
+CONTACTS = Mock(status_code=200, headers={'content-type': 'text/xml; charset=utf-8'}, encoding='utf-8',
+                text='<Response><Contacts><Contact><ContactID>a</ContactID></Contact></Contacts></Response>')
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'sync.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hash_ring(self):
+        "Keys are spread across nodes, and few move when a node is added"
+        keys = ['tenant-%d' % i for i in range(1000)]
+        ring = HashRing(range(4))
+        assigned = dict((key, ring.node(key)) for key in keys)
+        counts = [list(assigned.values()).count(node) for node in range(4)]
+        self.assertTrue(min(counts) > 150, counts)
+
+        bigger = HashRing(range(5))
+        moved = [key for key in keys if bigger.node(key) != assigned[key]]
+        self.assertTrue(len(moved) < 350, len(moved))
+        self.assertTrue(all(bigger.node(key) == 4 for key in moved))
+
+    def test_store(self):
+        store = SyncStore(self.path)
+        checkpoint = store.checkpoint('a', 'journals')
+        self.assertEqual(checkpoint.load(0), 0)
+        checkpoint.save({'offset': 10})
+        self.assertEqual(SyncStore(self.path).checkpoint('a', 'journals').load(), {'offset': 10})
+
+        store.record_failure('a', 'failed', backoff=10)
+        store.record_failure('a', 'failed again', backoff=10)
+        count, error, retry_after = store.failure('a')
+        self.assertEqual((count, error), (2, 'failed again'))
+        store.record_success('a')
+        self.assertEqual(store.failure('a'), None)
+
+    @patch('requests.get', return_value=CONTACTS)
+    def test_run(self, r_get):
+        "Tenants are synced by their worker, with failures and budgets recorded"
+        tenants = [{'id': 'tenant-%d' % i} for i in range(6)] + [{'id': 'broken'}]
+        runner = SyncRunner(connect, job, self.path, processes=2, daily_budget=2)
+
+        results = dict((result.tenant, result) for result in runner.run(tenants))
+        self.assertEqual(results['tenant-1'].status, 'ok')
+        self.assertEqual(results['tenant-1'].calls, 1)
+        self.assertEqual(results['broken'].status, 'failed')
+        self.assertTrue('no access' in results['broken'].error)
+        for tenant in tenants:
+            self.assertEqual(results[tenant['id']].worker, runner.ring.node(tenant['id']))
+
+        store = SyncStore(self.path)
+        self.assertEqual(store.checkpoint('tenant-1', 'journals').load(), 1)
+        self.assertEqual(results['broken'].calls, 1)
+
+        # The broken tenant backs off; the others are synced again
+        # until they reach their budget.
+        results = dict((result.tenant, result) for result in runner.run(tenants))
+        self.assertEqual(results['broken'].status, 'backoff')
+        self.assertEqual(results['tenant-1'].status, 'ok')
+        self.assertEqual(store.checkpoint('tenant-1', 'journals').load(), 2)
+
+        results = dict((result.tenant, result) for result in runner.run(tenants))
+        self.assertEqual(results['tenant-1'].status, 'over budget')
+
+    @patch('requests.get', return_value=CONTACTS)
+    def test_budget_per_request(self, r_get):
+        "A job that uses up its tenant's budget is stopped part way"
+        runner = SyncRunner(connect, job, self.path, processes=1, daily_budget=3)
+
+        results = runner.run([{'id': 'large', 'pages': 10}])
+        self.assertEqual(results[0].status, 'over budget')
+        self.assertEqual(results[0].calls, 3)
+        self.assertEqual(r_get.call_count, 3)
+        # It isn't treated as a failure
+        self.assertEqual(SyncStore(self.path).failure('large'), None)
@@ -0,0 +1,148 @@
+from __future__ import unicode_literals
+
+from datetime import date
+from decimal import Decimal
+import unittest
+
+from mock import Mock
+
+from xero import Xero
+from xero.exceptions import XeroBadRequest
+from xero.timesheets import TimesheetPipeline
+
+
+REJECTED = """<ApiException xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <ErrorNumber>10</ErrorNumber>
+  <Type>ValidationException</Type>
+  <Message>A validation exception occurred</Message>
+  <Elements>
+    <DataContractBase xsi:type="Timesheet">
+      <ValidationErrors>
+        <ValidationError>
+          <Message>The timesheet overlaps an existing timesheet</Message>
+        </ValidationError>
+      </ValidationErrors>
+      <EmployeeID>e1</EmployeeID>
+    </DataContractBase>
+    <DataContractBase xsi:type="Timesheet">
+      <ValidationErrors />
+      <EmployeeID>e2</EmployeeID>
+    </DataContractBase>
+  </Elements>
+</ApiException>"""
+
+
+class TimesheetPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.xero = Xero(Mock())
+        payroll = self.xero.payroll
+        payroll.employees.all = Mock(return_value=[
+            {'EmployeeID': 'e1', 'FirstName': 'Ada', 'Status': 'ACTIVE'},
+            {'EmployeeID': 'e2', 'FirstName': 'Grace', 'Status': 'ACTIVE'},
+            {'EmployeeID': 'e3', 'FirstName': 'Alan', 'Status': 'TERMINATED'},
+        ])
+        # As the PayItems response is decoded
+        payroll.payitems.all = Mock(return_value=[
+            [{'EarningsRateID': 'r1', 'Name': 'Ordinary Hours'},
+             {'EarningsRateID': 'r2', 'Name': 'Overtime Hours'}],
+            {'DeductionType': {'DeductionTypeID': 'd1'}},
+        ])
+        self.saved = []
+
+        def save(timesheets, priority='normal'):
+            self.saved.append(timesheets)
+            return [dict(timesheet, TimesheetID='t-' + timesheet['EmployeeID']) for timesheet in timesheets]
+        payroll.timesheets.save = Mock(side_effect=save)
+
+        self.pipeline = TimesheetPipeline(payroll, period_start=date(2014, 1, 6), chunk_size=2)
+
+    def test_build(self):
+        "Lines are grouped by employee and period, and summed by day"
+        groups = self.pipeline.group([
+            {'EmployeeID': 'e1', 'Date': date(2014, 1, 6), 'EarningsRate': 'Ordinary Hours', 'NumberOfUnits': 8},
+            {'EmployeeID': 'e1', 'Date': '2014-01-13', 'EarningsRateID': 'r1', 'NumberOfUnits': 4},
+            {'EmployeeID': 'e1', 'Date': date(2014, 1, 7), 'EarningsRateID': 'r1', 'NumberOfUnits': '7.5'},
+            {'EmployeeID': 'e1', 'Date': date(2014, 1, 7), 'EarningsRate': 'ordinary hours', 'NumberOfUnits': 0.5},
+            {'EmployeeID': 'e1', 'Date': date(2014, 1, 7), 'EarningsRateID': 'r2', 'NumberOfUnits': 2},
+        ])
+        self.assertEqual(list(groups), [('e1', date(2014, 1, 6)), ('e1', date(2014, 1, 13))])
+
+        timesheet, errors = self.pipeline.build('e1', date(2014, 1, 6), groups[('e1', date(2014, 1, 6))])
+        self.assertEqual(errors, [])
+        self.assertEqual(timesheet['StartDate'], '2014-01-06T00:00:00')
+        self.assertEqual(timesheet['EndDate'], '2014-01-12T00:00:00')
+        self.assertEqual([line['EarningsRateID'] for line in timesheet['TimesheetLines']], ['r1', 'r2'])
+        self.assertEqual(timesheet['TimesheetLines'][0]['NumberOfUnits'],
+                         [Decimal(8), Decimal(8), 0, 0, 0, 0, 0])
+
+        xml = self.xero.payroll.timesheets._prepare_data_for_save([timesheet])
+        self.assertTrue(b'<TimesheetLines><TimesheetLine><EarningsRateID>r1</EarningsRateID>'
+                        b'<NumberOfUnits><NumberOfUnit>8</NumberOfUnit><NumberOfUnit>8.0</NumberOfUnit>'
+                        b'<NumberOfUnit>0</NumberOfUnit>' in xml)
+
+    def test_validation(self):
+        "Invalid timesheets are reported, and not sent"
+        results = self.pipeline.submit([
+            {'EmployeeID': 'e1', 'Date': date(2014, 1, 6), 'EarningsRateID': 'r1', 'NumberOfUnits': 20},
+            {'EmployeeID': 'e1', 'Date': date(2014, 1, 6), 'EarningsRateID': 'r2', 'NumberOfUnits': 5},
+            {'EmployeeID': 'e2', 'Date': date(2014, 1, 6), 'EarningsRate': 'Holiday', 'NumberOfUnits': 8},
+            {'EmployeeID': 'e2', 'Date': date(2014, 1, 7), 'EarningsRateID': 'r1', 'NumberOfUnits': -1},
+            {'EmployeeID': 'e3', 'Date': date(2014, 1, 6), 'EarningsRateID': 'r1', 'NumberOfUnits': 8},
+            {'EmployeeID': 'e4', 'Date': date(2014, 1, 6), 'EarningsRateID': 'r1', 'NumberOfUnits': 8},
+        ])
+        self.assertEqual([result.status for result in results], ['invalid'] * 4)
+        self.assertEqual([result.errors for result in results], [
+            ['25 units on 2014-01-06 (more than 24)'],
+            ['Unknown earnings rate: Holiday', 'Negative units on 2014-01-07'],
+            ['Employee e3 has been terminated'],
+            ['Unknown employee: e4'],
+        ])
+        self.assertEqual(self.saved, [])
+
+    def test_submit(self):
+        "Valid timesheets are saved in chunks, with a result for each"
+        lines = [
+            {'EmployeeID': employee_id, 'Date': date(2014, 1, day), 'EarningsRateID': 'r1', 'NumberOfUnits': 8}
+            for employee_id in ['e1', 'e2'] for day in [6, 7, 13]
+        ] + [{'EmployeeID': 'e4', 'Date': date(2014, 1, 6), 'EarningsRateID': 'r1', 'NumberOfUnits': 8}]
+        results = self.pipeline.submit(lines)
+
+        self.assertEqual([(result.employee_id, result.start_date, result.status) for result in results], [
+            ('e1', date(2014, 1, 6), 'saved'),
+            ('e1', date(2014, 1, 13), 'saved'),
+            ('e2', date(2014, 1, 6), 'saved'),
+            ('e2', date(2014, 1, 13), 'saved'),
+            ('e4', date(2014, 1, 6), 'invalid'),
+        ])
+        self.assertEqual(results[0].timesheet['TimesheetID'], 't-e1')
+        self.assertEqual(sorted(len(chunk) for chunk in self.saved), [2, 2])
+        # The catalog was only loaded once
+        self.assertEqual(self.xero.payroll.employees.all.call_count, 1)
+
+    def test_rejected_timesheets(self):
+        "Timesheets that Xero rejects fail alone; the rest of their chunk is sent again"
+        response = Mock(status_code=400, encoding='utf-8', text=REJECTED)
+        calls = []
+
+        def save(timesheets, priority='normal'):
+            calls.append([timesheet['EmployeeID'] for timesheet in timesheets])
+            if len(calls) == 1:
+                raise XeroBadRequest(response)
+            if len(calls) == 2:
+                return [dict(timesheets[0], TimesheetID='t2')]
+            raise IOError('connection reset')
+        self.xero.payroll.timesheets.save = Mock(side_effect=save)
+
+        self.pipeline.workers = 1
+        results = self.pipeline.submit([
+            {'EmployeeID': employee_id, 'Date': date(2014, 1, day), 'EarningsRateID': 'r1', 'NumberOfUnits': 8}
+            for employee_id, day in [('e1', 6), ('e2', 6), ('e1', 13)]
+        ])
+
+        self.assertEqual(calls, [['e1', 'e2'], ['e2'], ['e1']])
+        self.assertEqual([(result.status, result.errors) for result in results], [
+            ('failed', ['The timesheet overlaps an existing timesheet']),
+            ('saved', []),
+            ('failed', ['IOError: connection reset']),
+        ])
+        self.assertEqual(results[1].timesheet['TimesheetID'], 't2')
@@ -0,0 +1,110 @@
+"""Command line tools for the Xero API.
+
+    python -m xero export --consumer-key KEY --rsa-key privatekey.pem \
+        --output export/ --format csv Contacts Invoices
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+from dateutil.parser import parse
+
+from .api import Payroll, Xero
+from .auth import PrivateCredentials, PublicCredentials
+from .export import WRITERS, export
+
+
+def get_credentials(args):
+    "Build credentials from the command line (or the environment)"
+    if args.state:
+        with open(args.state) as f:
+            return PublicCredentials(**json.load(f))
+
+    consumer_key = args.consumer_key or os.environ.get('XERO_CONSUMER_KEY')
+    rsa_key_path = args.rsa_key or os.environ.get('XERO_RSA_KEY')
+    if not consumer_key or not rsa_key_path:
+        raise SystemExit('Provide --consumer-key and --rsa-key (or --state for a public application)')
+    with open(rsa_key_path) as f:
+        return PrivateCredentials(consumer_key, f.read())
+
+
+def get_managers(xero, entities):
+    "Find the Manager for each entity name (ignoring case)"
+    accounting = [
+        (name, getattr(xero, name.lower())) for name in Xero.OBJECT_LIST
+        if name != u'Reports'
+    ]
+    payroll = [
+        (name, getattr(xero.payroll, name.lower())) for name in Payroll.OBJECT_LIST
+    ]
+    if not entities:
+        return accounting
+
+    available = accounting + payroll
+
+    by_name = dict((name.lower(), (name, manager)) for name, manager in available)
+    managers = []
+    for entity in entities:
+        if entity.lower() not in by_name:
+            raise SystemExit('Unknown entity: %s (choose from %s)' % (
+                entity, ', '.join(name for name, manager in available)))
+        managers.append(by_name[entity.lower()])
+    return managers
+
+
+def export_command(args):
+    xero = Xero(get_credentials(args))
+    managers = get_managers(xero, args.entities)
+    since = parse(args.since) if args.since else None
+
+    started = time.time()
+    results = export(managers, args.output, format=args.format, since=since, workers=args.workers)
+    elapsed = time.time() - started
+
+    failed = 0
+    total_records = total_bytes = 0
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            print >> sys.stderr, '%-20s FAILED: %s' % (result.name, result.error)
+            continue
+        total_records += result.records
+        total_bytes += result.bytes
+        print '%-20s %10d records %12d bytes%s' % (
+            result.name, result.records, result.bytes,
+            ' (resumed)' if result.resumed else '')
+
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print '%d records, %.1f MB in %.1fs (%.0f records/s); peak memory %.1f MB' % (
+        total_records, total_bytes / 1048576.0, elapsed,
+        total_records / elapsed if elapsed else 0, peak)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xero')
+    commands = parser.add_subparsers()
+
+    export_parser = commands.add_parser('export', help='Export entities to NDJSON or CSV files')
+    export_parser.add_argument('entities', nargs='*',
+        help='The entities to export (default: every entity except Reports and the payroll entities)')
+    export_parser.add_argument('--consumer-key', help='The consumer key of a private application')
+    export_parser.add_argument('--rsa-key', help='The RSA private key file of a private application')
+    export_parser.add_argument('--state', help='A JSON file holding the state of public credentials')
+    export_parser.add_argument('-o', '--output', default='.', help='The directory to write files to')
+    export_parser.add_argument('-f', '--format', default='ndjson', choices=sorted(WRITERS))
+    export_parser.add_argument('-w', '--workers', type=int, default=4,
+        help='The number of entities to export at the same time')
+    export_parser.add_argument('--since', help='Only export objects modified since this date')
+    export_parser.set_defaults(func=export_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
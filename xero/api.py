@@ -1,4 +1,6 @@
+from .catalog import Catalog, PayrollCatalog
 from .manager import Manager
+from .streams import changes
 
 
 class Xero(object):
@@ -9,22 +11,50 @@ class Xero(object):
                    u'Payments', u'Reports', u'TaxRates', 
                    u'TrackingCategories')
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, **options):
         # Iterate through the list of objects we support, for
         # each of them create an attribute on our self that is
         # the lowercase name of the object and attach it to an
-        # instance of a Manager object to operate on it
+        # instance of a Manager object to operate on it.
+        # Any options are passed on to every Manager.
         for name in self.OBJECT_LIST:
-            setattr(self, name.lower(), Manager(name, credentials.oauth, 'api'))
-
-        self.payroll = Payroll(credentials)
+            setattr(self, name.lower(), Manager(name, credentials.oauth, 'api', **options))
+
+        self.payroll = Payroll(credentials, **options)
+
+        # Reference data, loaded on first use
+        self.catalog = Catalog(self)
+
+    def changes(self, since, entities=None, workers=4):
+        """Iterate over every object modified since a time.
+
+        Every endpoint (other than Reports), including the Payroll
+        endpoints, is queried concurrently; objects are yielded as
+        (entity, object) pairs, in UpdatedDateUTC order. Pass a list of
+        entity names (e.g., ['Contacts', 'Invoices']) to only query
+        some endpoints.
+
+        Use a limiter (see xero.concurrency) to keep the requests within
+        the rate limit.
+        """
+        managers = [
+            (name, getattr(self, name.lower())) for name in self.OBJECT_LIST
+            if name != u'Reports'
+        ] + [
+            (name, getattr(self.payroll, name.lower())) for name in Payroll.OBJECT_LIST
+        ]
+        if entities is not None:
+            managers = [(name, manager) for name, manager in managers if name in entities]
+        return changes(managers, since, workers)
 
 class Payroll(object):
     """An ORM-like interface to the Xero Payroll API"""
 
     OBJECT_LIST = (u'Employees', u'Timesheets', u'PayItems')
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, **options):
         for name in self.OBJECT_LIST:
-            setattr(self, name.lower(), Manager(name, credentials.oauth, 'payroll'))
+            setattr(self, name.lower(), Manager(name, credentials.oauth, 'payroll', **options))
 
+        # Employees and earnings rates, loaded on first use
+        self.catalog = PayrollCatalog(self)
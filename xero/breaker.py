@@ -0,0 +1,109 @@
+from collections import deque
+import threading
+import time
+
+from .exceptions import XeroCircuitOpen
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class _Circuit(object):
+    def __init__(self, window):
+        self.state = CLOSED
+        self.results = deque(maxlen=window)
+        self.opened_at = None
+        self.probes = 0
+
+
+class CircuitBreaker(object):
+    """Fail fast while an endpoint is failing.
+
+    A circuit is kept for each key (a Manager uses its endpoint and the
+    credentials it uses, so each organisation is tracked separately).
+    The outcomes of the last `window` requests are kept; once at least
+    `min_calls` have been made and the proportion that failed reaches
+    `failure_rate`, the circuit opens, and requests raise
+    XeroCircuitOpen without being sent.
+
+    After `reset_timeout` seconds, the circuit is half open: up to
+    `half_open_calls` requests are sent as probes. If a probe succeeds
+    the circuit closes; if it fails, the circuit opens again.
+
+    Usage:
+
+        >>> from xero.breaker import CircuitBreaker
+        >>> xero = Xero(credentials, breaker=CircuitBreaker(failure_rate=0.5, reset_timeout=60))
+    """
+    def __init__(self, failure_rate=0.5, window=20, min_calls=5, reset_timeout=30,
+            half_open_calls=1):
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.circuits = {}
+        self.lock = threading.Lock()
+
+    def _circuit(self, key):
+        circuit = self.circuits.get(key)
+        if circuit is None:
+            circuit = self.circuits[key] = _Circuit(self.window)
+        return circuit
+
+    def state(self, key):
+        "The state of the circuit for a key: 'closed', 'open' or 'half-open'"
+        with self.lock:
+            circuit = self.circuits.get(key)
+            if circuit is None:
+                return CLOSED
+            if circuit.state == OPEN and time.time() - circuit.opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return circuit.state
+
+    def before(self, key):
+        "Check that a request can be sent, raising XeroCircuitOpen if not"
+        with self.lock:
+            circuit = self._circuit(key)
+            if circuit.state == CLOSED:
+                return
+            waited = time.time() - circuit.opened_at
+            if circuit.state == OPEN and waited >= self.reset_timeout:
+                circuit.state = HALF_OPEN
+                circuit.probes = 0
+            if circuit.state == HALF_OPEN and circuit.probes < self.half_open_calls:
+                circuit.probes += 1
+                return
+            raise XeroCircuitOpen(key, max(0, self.reset_timeout - waited))
+
+    def cancel(self, key):
+        "Return the probe given by before() to a request that wasn't sent"
+        with self.lock:
+            circuit = self.circuits.get(key)
+            if circuit is not None and circuit.state == HALF_OPEN and circuit.probes:
+                circuit.probes -= 1
+
+    def record(self, key, failed):
+        "Record the outcome of a request that was sent"
+        with self.lock:
+            circuit = self._circuit(key)
+            if circuit.state == HALF_OPEN:
+                if failed:
+                    self._open(circuit)
+                else:
+                    circuit.state = CLOSED
+                    circuit.results.clear()
+                return
+
+            circuit.results.append(failed)
+            if circuit.state == CLOSED and len(circuit.results) >= self.min_calls:
+                failures = sum(circuit.results)
+                if failures >= self.failure_rate * len(circuit.results):
+                    self._open(circuit)
+
+    def _open(self, circuit):
+        circuit.state = OPEN
+        circuit.opened_at = time.time()
+        circuit.results.clear()
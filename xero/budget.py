@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import threading
+import time
+
+from .exceptions import XeroBudgetExceeded
+
+
+PRIORITIES = ('low', 'normal', 'high')
+
+
+def _seconds_until_tomorrow():
+    now = datetime.utcnow()
+    tomorrow = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return (tomorrow - now).total_seconds()
+
+
+class DailyBudget(object):
+    """A count of the API calls made for each organisation each day.
+
+    The count is kept in an SQLite database, so every process on the
+    machine that uses the same file shares it. Each request a Manager
+    sends uses one call from its organisation's budget for the (UTC)
+    day; once `limit` calls have been made, requests raise
+    XeroBudgetExceeded instead of being sent.
+
+    Calls have a priority. High priority calls can use the whole
+    budget; normal calls can't use the last `reserve` calls, and low
+    priority calls can't use the last `low_reserve` calls, so background
+    work stops before urgent work is affected. Rather than failing
+    immediately, a call that can't be made can wait up to `max_defer`
+    seconds for the budget to reset.
+
+    Usage:
+
+        >>> from xero.budget import DailyBudget
+        >>> budget = DailyBudget('/var/lib/xero/budget.db', limit=5000)
+        >>> xero = Xero(credentials, budget=budget)
+        >>> xero.invoices.all(priority='low')
+        >>> budget.remaining(xero.invoices.organisation_key)
+        4999
+    """
+    def __init__(self, path, limit=5000, reserve=250, low_reserve=1000, max_defer=0, timeout=30):
+        self.path = path
+        self.limit = limit
+        self.reserves = {'high': 0, 'normal': reserve, 'low': low_reserve}
+        self.max_defer = max_defer
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self.connection as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS budget ('
+                ' key TEXT, day TEXT, calls INTEGER, PRIMARY KEY (key, day))'
+            )
+
+    @property
+    def connection(self):
+        # SQLite connections can't be shared between threads, or
+        # across a fork; open one per thread, per process.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def today():
+        return datetime.utcnow().date().isoformat()
+
+    def used(self, key):
+        "The number of calls made for an organisation today"
+        row = self.connection.execute(
+            'SELECT calls FROM budget WHERE key = ? AND day = ?', (key, self.today())
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def remaining(self, key):
+        "The number of calls left for an organisation today"
+        return max(0, self.limit - self.used(key))
+
+    def _try_spend(self, key, allowed, calls):
+        day = self.today()
+        with self.connection as conn:
+            conn.execute('INSERT OR IGNORE INTO budget VALUES (?, ?, 0)', (key, day))
+            # Checking and incrementing in a single statement keeps the
+            # count correct when several processes spend at once.
+            cursor = conn.execute(
+                'UPDATE budget SET calls = calls + ? WHERE key = ? AND day = ? AND calls + ? <= ?',
+                (calls, key, day, calls, allowed)
+            )
+            return cursor.rowcount == 1
+
+    def spend(self, key, priority='normal', calls=1):
+        "Use calls from an organisation's budget, or raise XeroBudgetExceeded"
+        if priority not in self.reserves:
+            raise ValueError('Unknown priority: %s (choose from %s)' % (priority, ', '.join(PRIORITIES)))
+        allowed = self.limit - self.reserves[priority]
+        if self._try_spend(key, allowed, calls):
+            return
+
+        retry_after = _seconds_until_tomorrow()
+        if retry_after <= self.max_defer:
+            time.sleep(retry_after)
+            if self._try_spend(key, allowed, calls):
+                return
+            retry_after = _seconds_until_tomorrow()
+        raise XeroBudgetExceeded(key, priority, self.remaining(key), retry_after)
+
+    def exhaust(self, key):
+        "Mark an organisation's budget as used up for today"
+        day = self.today()
+        with self.connection as conn:
+            conn.execute('INSERT OR IGNORE INTO budget VALUES (?, ?, 0)', (key, day))
+            conn.execute('UPDATE budget SET calls = MAX(calls, ?) WHERE key = ? AND day = ?',
+                    (self.limit, key, day))
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class CachedResponse(object):
+    "The parts of a response that are needed to decode it again"
+    def __init__(self, status_code, headers, encoding, text):
+        self.status_code = status_code
+        self.headers = headers
+        self.encoding = encoding
+        self.text = text
+
+
+class DiskCache(object):
+    """A response cache stored in an SQLite database.
+
+    Successful GET responses are stored on disk, so they can be shared
+    by every process (and every thread) using the same file. Entries
+    expire after `ttl` seconds; once the cache holds more than
+    `max_entries` entries (or more than `max_bytes` of UTF-8 encoded
+    content), the oldest entries are evicted. The number of entries and
+    their total size are kept up to date by triggers, so checking them
+    doesn't scan the table.
+
+    Usage:
+
+        >>> from xero.cache import DiskCache
+        >>> xero = Xero(credentials, cache=DiskCache('/var/cache/xero.db', ttl=3600))
+
+    Writes (save or put) through a Manager invalidate the cached
+    responses for that Manager's endpoint and credentials.
+    """
+    def __init__(self, path, ttl=300, max_entries=10000, max_bytes=None, timeout=30):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self.connection as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY,'
+                ' scope TEXT,'
+                ' expires REAL,'
+                ' size INTEGER,'
+                ' status_code INTEGER,'
+                ' content_type TEXT,'
+                ' encoding TEXT,'
+                ' body TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)')
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)')
+
+            # Running totals of the entries and their sizes
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS totals ('
+                ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+                ' entries INTEGER,'
+                ' bytes INTEGER)'
+            )
+            conn.execute(
+                'INSERT OR IGNORE INTO totals'
+                ' SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN'
+                ' UPDATE totals SET entries = entries + 1, bytes = bytes + new.size;'
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN'
+                ' UPDATE totals SET entries = entries - 1, bytes = bytes - old.size;'
+                ' END'
+            )
+
+    @property
+    def connection(self):
+        # SQLite connections can't be shared between threads, or
+        # across a fork; open one per thread, per process.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def make_key(self, *parts):
+        "Build a cache key from a set of request details"
+        key = repr([
+            sorted(part.items()) if isinstance(part, dict) else part
+            for part in parts
+        ])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        "Return the cached response for a key, or None"
+        row = self.connection.execute(
+            'SELECT expires, status_code, content_type, encoding, body'
+            ' FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        expires, status_code, content_type, encoding, body = row
+        if expires < time.time():
+            with self.connection as conn:
+                conn.execute('DELETE FROM responses WHERE key = ? AND expires = ?', (key, expires))
+            return None
+        return CachedResponse(status_code, {'content-type': content_type}, encoding, body)
+
+    def set(self, key, response, scope=None, ttl=None):
+        "Store a response"
+        ttl = self.ttl if ttl is None else ttl
+        body = response.text
+        size = len(body.encode('utf-8') if isinstance(body, unicode) else body)
+        with self.connection as conn:
+            # Replace the entry with a delete and an insert, as REPLACE
+            # doesn't fire the delete trigger.
+            conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            conn.execute(
+                'INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, scope, time.time() + ttl, size, response.status_code,
+                 response.headers.get('content-type'), response.encoding, body)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        conn.execute('DELETE FROM responses WHERE expires < ?', (time.time(),))
+        entries, total = conn.execute('SELECT entries, bytes FROM totals').fetchone()
+        if self.max_entries is not None and entries > self.max_entries:
+            conn.execute(
+                'DELETE FROM responses WHERE key IN ('
+                ' SELECT key FROM responses ORDER BY expires LIMIT ?)',
+                (entries - self.max_entries,)
+            )
+            total = conn.execute('SELECT bytes FROM totals').fetchone()[0]
+        if self.max_bytes is not None and total > self.max_bytes:
+            for key, size in conn.execute('SELECT key, size FROM responses ORDER BY expires'):
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                total -= size
+
+    def invalidate(self, scope):
+        "Remove every response stored under a scope"
+        with self.connection as conn:
+            conn.execute('DELETE FROM responses WHERE scope = ?', (scope,))
+
+    def clear(self):
+        "Remove every response"
+        with self.connection as conn:
+            conn.execute('DELETE FROM responses')
+
+    @property
+    def size(self):
+        "The total size of the stored responses, in bytes"
+        return self.connection.execute('SELECT bytes FROM totals').fetchone()[0]
+
+    def __len__(self):
+        return self.connection.execute('SELECT entries FROM totals').fetchone()[0]
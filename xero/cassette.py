@@ -0,0 +1,183 @@
+from collections import deque
+import gzip
+from io import BytesIO
+import json
+import threading
+import time
+import urllib
+from urlparse import parse_qsl, urlsplit, urlunsplit
+
+import requests
+
+from .cache import CachedResponse
+
+
+# Request headers that carry credentials, and are never recorded
+SENSITIVE_HEADERS = frozenset(['authorization', 'cookie', 'proxy-authorization'])
+
+REDACTED = u'REDACTED'
+
+
+def redact_uri(uri):
+    "Replace the values of any OAuth parameters in a URI's query string"
+    parts = urlsplit(uri)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if not any(name.startswith('oauth_') for name, value in query):
+        return uri
+    query = [
+        (name, REDACTED if name.startswith('oauth_') else value)
+        for name, value in query
+    ]
+    return urlunsplit(parts[:3] + (urllib.urlencode(query),) + parts[4:])
+
+
+def redact_headers(headers):
+    "The headers of a request, without any that carry credentials"
+    return dict(
+        (name, value) for name, value in (headers or {}).items()
+        if name.lower() not in SENSITIVE_HEADERS
+    )
+
+
+def _open(path, mode):
+    # Cassettes ending in .gz are compressed
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def encode_body(data):
+    "The body of a request, as it is recorded (and matched)"
+    if not data:
+        return None
+    if isinstance(data, dict):
+        data = urllib.urlencode(sorted(data.items()))
+    if isinstance(data, str):
+        data = data.decode('utf-8')
+    return data
+
+
+def _match_key(method, uri, body):
+    return (method, redact_uri(uri), encode_body(body))
+
+
+class ReplayedResponse(CachedResponse):
+    "A recorded response, which can also be read as a stream"
+    @property
+    def raw(self):
+        return BytesIO(self.text.encode(self.encoding or 'utf-8'))
+
+
+class RecordingTransport(object):
+    """Send requests to Xero, recording each request and its response.
+
+    Interactions are written to the cassette at `path` as they happen,
+    one JSON object per line (compressed if the path ends in .gz). The
+    OAuth signature isn't part of the recorded request, headers that
+    carry credentials aren't recorded, and any OAuth parameters in the
+    URI are redacted, so cassettes can be shared.
+
+    Usage:
+
+        >>> from xero.cassette import RecordingTransport
+        >>> with RecordingTransport('invoices.ndjson.gz') as transport:
+        ...     xero = Xero(credentials, transport=transport)
+        ...     invoices = list(xero.invoices.iter())
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = _open(path, 'wb')
+        self.interactions = 0
+
+    def request(self, method, uri, data=None, headers=None, auth=None, cert=None, stream=False):
+        "Send a request, and record it"
+        started = time.time()
+        response = getattr(requests, method)(uri, data=data, headers=headers, auth=auth,
+                cert=cert, stream=stream)
+        # Reading the text consumes a streamed response, so a copy of
+        # it is returned in its place.
+        text = response.text
+        elapsed = time.time() - started
+        interaction = {
+            'method': method,
+            'uri': redact_uri(uri),
+            'body': encode_body(data),
+            'headers': redact_headers(headers),
+            'status_code': response.status_code,
+            'content_type': response.headers.get('content-type'),
+            'encoding': response.encoding,
+            'text': text,
+            'elapsed': round(elapsed, 4),
+        }
+        line = json.dumps(interaction, separators=(',', ':')) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            self.interactions += 1
+
+        if stream:
+            return ReplayedResponse(response.status_code,
+                    {'content-type': interaction['content_type']}, response.encoding, text)
+        return response
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayTransport(object):
+    """Serve the responses recorded in a cassette, without contacting Xero.
+
+    Requests are matched by method, URI and body. Repeated requests are
+    answered in the order they were recorded; once those responses have
+    been used, the last one is repeated. A request that wasn't recorded
+    raises KeyError.
+
+    `latency` adds an artificial delay to every response: either a
+    number of seconds, or a function that is given the recorded
+    interaction (which includes the original `elapsed` time) and
+    returns one.
+
+    Usage:
+
+        >>> from xero.cassette import ReplayTransport
+        >>> transport = ReplayTransport('invoices.ndjson.gz', latency=0.2)
+        >>> xero = Xero(credentials, transport=transport, limiter=AdaptiveLimiter())
+        >>> invoices = list(xero.invoices.iter())
+    """
+    def __init__(self, path, latency=0):
+        self.path = path
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.interactions = {}
+        self.requests = 0
+        with _open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    key = _match_key(interaction['method'], interaction['uri'], interaction['body'])
+                    self.interactions.setdefault(key, deque()).append(interaction)
+
+    def request(self, method, uri, data=None, headers=None, auth=None, cert=None, stream=False):
+        "Find the recorded response to a request"
+        key = _match_key(method, uri, data)
+        with self.lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                raise KeyError('No recorded response for %s %s' % (method.upper(), key[1]))
+            interaction = recorded.popleft() if len(recorded) > 1 else recorded[0]
+            self.requests += 1
+
+        latency = self.latency(interaction) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        return ReplayedResponse(interaction['status_code'],
+                {'content-type': interaction['content_type']},
+                interaction['encoding'], interaction['text'])
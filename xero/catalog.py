@@ -0,0 +1,206 @@
+from datetime import datetime
+import threading
+import time
+
+from .manager import as_list
+
+
+class Catalog(object):
+    """Reference data for an organisation, indexed for fast lookups.
+
+    Accounts, tax rates, currencies and tracking categories are loaded
+    the first time anything is looked up, and indexed by code, ID and
+    (case insensitive) name. Once the data is older than `max_age`
+    seconds, the next lookup starts a background refresh, which only
+    retrieves the objects modified since the last load; lookups keep
+    using the existing data until the refresh is complete.
+
+    Usage:
+
+        >>> xero.catalog.account('200')
+        {u'Code': u'200', u'Name': u'Sales', ...}
+        >>> xero.catalog.tax_rate('OUTPUT')
+        {u'TaxType': u'OUTPUT', ...}
+        >>> xero.catalog.tracking_option('Region', 'North')
+        {u'TrackingOptionID': ..., u'Name': u'North'}
+    """
+    # (manager, field that identifies each object,
+    #  fields indexed exactly, fields indexed by lowercase name)
+    SOURCES = (
+        (u'accounts', u'AccountID', (u'Code', u'AccountID'), (u'Name',)),
+        (u'taxrates', u'TaxType', (u'TaxType',), (u'Name',)),
+        (u'currencies', u'Code', (u'Code',), (u'Description',)),
+        (u'trackingcategories', u'TrackingCategoryID', (u'TrackingCategoryID',), (u'Name',)),
+    )
+
+    def __init__(self, xero, max_age=3600):
+        self.xero = xero
+        self.max_age = max_age
+        self.records = {}
+        self.indexes = {}
+        self.options = {}
+        self.since = None
+        self.loaded_at = None
+        self.error = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self.loaded_at is None:
+            with self.lock:
+                if self.loaded_at is None:
+                    self._load(None)
+        elif time.time() - self.loaded_at > self.max_age:
+            self.refresh(background=True)
+
+    def refresh(self, background=False):
+        """Retrieve the objects modified since the last load.
+
+        With background=True, the refresh happens in a separate thread
+        (unless one is already running), which is returned.
+        """
+        if not background:
+            with self.lock:
+                self._load(self.since)
+            return
+
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._background_refresh)
+                self.thread.daemon = True
+                self.thread.start()
+        return self.thread
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep serving the existing data; the error is kept for
+            # inspection, and the refresh is retried on a later lookup.
+            self.error = e
+
+    def _load(self, since):
+        started = datetime.utcnow()
+        started_at = time.time()
+
+        records = {}
+        for name, key, exact, named in self.SOURCES:
+            objects = dict(self.records.get(name, {}))
+            for obj in self._fetch(name, since):
+                objects[obj[key]] = obj
+            records[name] = objects
+
+        indexes = {}
+        for name, key, exact, named in self.SOURCES:
+            index = indexes[name] = {}
+            for obj in records[name].values():
+                for field in named:
+                    if obj.get(field):
+                        index[obj[field].lower()] = obj
+                # Exact matches take precedence over names
+                for field in exact:
+                    if obj.get(field):
+                        index[obj[field]] = obj
+
+        options = {}
+        for category in records.get(u'trackingcategories', {}).values():
+            for option in as_list(category.get(u'Options'), u'Option'):
+                options[(category[u'Name'].lower(), option[u'Name'].lower())] = option
+                if option.get(u'TrackingOptionID'):
+                    options[option[u'TrackingOptionID']] = option
+
+        # Swap in the new data in one step, so concurrent lookups see
+        # either the old data or the new data.
+        self.records, self.indexes, self.options = records, indexes, options
+        self.since = started
+        self.loaded_at = started_at
+        self.error = None
+
+    def _fetch(self, name, since):
+        # The objects of a kind that have been modified since a time
+        manager = getattr(self.xero, name)
+        return as_list(manager.filter(since=since) if since else manager.all())
+
+    def lookup(self, name, key):
+        "Find an object of the given kind (e.g., 'accounts') by code, ID or name"
+        self._ensure_loaded()
+        index = self.indexes[name]
+        obj = index.get(key)
+        if obj is None and hasattr(key, 'lower'):
+            obj = index.get(key.lower())
+        return obj
+
+    def account(self, key):
+        "Find an account by code, ID or name"
+        return self.lookup(u'accounts', key)
+
+    def tax_rate(self, key):
+        "Find a tax rate by tax type or name"
+        return self.lookup(u'taxrates', key)
+
+    def currency(self, key):
+        "Find a currency by code or description"
+        return self.lookup(u'currencies', key)
+
+    def tracking_category(self, key):
+        "Find a tracking category by ID or name"
+        return self.lookup(u'trackingcategories', key)
+
+    def tracking_option(self, category, option=None):
+        """Find a tracking option by category and option name.
+
+        An option can also be found by ID alone.
+        """
+        self._ensure_loaded()
+        if option is None:
+            return self.options.get(category)
+        return self.options.get((category.lower(), option.lower()))
+
+
+def _find(results, field):
+    # Every object in a decoded result that has a field, however deeply
+    # it is nested (collections decode into lists or wrapping dicts).
+    found = []
+    if isinstance(results, dict):
+        if field in results:
+            found.append(results)
+        else:
+            for value in results.values():
+                found.extend(_find(value, field))
+    elif isinstance(results, (list, tuple)):
+        for value in results:
+            found.extend(_find(value, field))
+    return found
+
+
+class PayrollCatalog(Catalog):
+    """Payroll reference data: employees and earnings rates.
+
+    Loaded and refreshed in the same way as a Catalog. Pay items have
+    no modification filter, so the earnings rates are retrieved in full
+    on each refresh.
+
+    Usage:
+
+        >>> xero.payroll.catalog.employee(employee_id)
+        {u'EmployeeID': ..., u'Status': u'ACTIVE', ...}
+        >>> xero.payroll.catalog.earnings_rate('Ordinary Hours')
+        {u'EarningsRateID': ..., u'Name': u'Ordinary Hours', ...}
+    """
+    SOURCES = (
+        (u'employees', u'EmployeeID', (u'EmployeeID',), ()),
+        (u'earningsrates', u'EarningsRateID', (u'EarningsRateID',), (u'Name',)),
+    )
+
+    def _fetch(self, name, since):
+        if name == u'earningsrates':
+            return _find(self.xero.payitems.all(), u'EarningsRateID')
+        return super(PayrollCatalog, self)._fetch(name, since)
+
+    def employee(self, key):
+        "Find an employee by ID"
+        return self.lookup(u'employees', key)
+
+    def earnings_rate(self, key):
+        "Find an earnings rate by ID or name"
+        return self.lookup(u'earningsrates', key)
@@ -0,0 +1,176 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def numpy_column(column):
+    """Convert a column to a NumPy array.
+
+    Typed arrays are wrapped without copying; any other column becomes
+    an object array.
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required for as_numpy=True")
+    if isinstance(column, array):
+        return numpy.frombuffer(column, dtype=numpy.float64)
+    return numpy.array(column, dtype=object)
+
+
+class ColumnTable(object):
+    """A set of records stored column by column.
+
+    Scalar fields are stored as lists; fields named in `numeric` are
+    stored as `array('d')`, with missing values recorded as NaN. Typed
+    columns expose the buffer protocol, so they can be handed to NumPy
+    or Arrow without copying. A numeric field with a value that isn't a
+    number (e.g., u'N/A') is stored as a list of its original values.
+
+    Fields of nested dictionaries are flattened into dotted names (e.g.,
+    `Contact.ContactID`). Nested collections are flattened into separate
+    tables in `children`, keyed by the collection's path (e.g.,
+    `LineItems`); each child row carries the IDs of the records that
+    contain it.
+
+    The decoder returns a collection with a single item as a dictionary
+    wrapping that item (e.g., `{'LineItem': {...}}`); wrappers named in
+    `collections` are unrolled into a collection of one.
+    """
+    def __init__(self, numeric=(), collections=()):
+        self.numeric = frozenset(numeric)
+        self.collections = frozenset(collections)
+        self.names = []
+        self.columns = {}
+        # The original values of each numeric column, so a column that
+        # turns out not to be numeric keeps its values exactly.
+        self._values = {}
+        self.children = {}
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def _new_column(self, name):
+        if name.rsplit('.', 1)[-1] in self.numeric:
+            column = array('d', [float('nan')] * self.length)
+            self._values[name] = [None] * self.length
+        else:
+            column = [None] * self.length
+        self.names.append(name)
+        self.columns[name] = column
+        return column
+
+    def append(self, row):
+        "Add a row, provided as a dictionary of flattened field names"
+        for name in row:
+            if name not in self.columns:
+                self._new_column(name)
+
+        for name in self.names:
+            column = self.columns[name]
+            value = row.get(name)
+            if isinstance(column, array):
+                try:
+                    column.append(float('nan') if value in (None, u'') else float(value))
+                    self._values[name].append(value)
+                    continue
+                except (TypeError, ValueError):
+                    # The column turned out not to be numeric.
+                    column = self.columns[name] = self._values.pop(name)
+            column.append(value)
+        self.length += 1
+
+    def column(self, name, as_numpy=False):
+        "Retrieve a column by name, optionally as a NumPy array"
+        column = self.columns[name]
+        if as_numpy:
+            return numpy_column(column)
+        return column
+
+    def to_dict(self):
+        "Return the columns as a dictionary (suitable for a DataFrame)"
+        return dict((name, self.columns[name]) for name in self.names)
+
+    def to_numpy(self):
+        """Return the table as a NumPy structured array.
+
+        Numeric columns become float64 fields; every other column is
+        stored as an object field.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for to_numpy()")
+        dtype = [
+            (str(name), numpy.float64 if isinstance(self.columns[name], array) else object)
+            for name in self.names
+        ]
+        out = numpy.empty(self.length, dtype=dtype)
+        for name in self.names:
+            out[str(name)] = self.columns[name]
+        return out
+
+    def child(self, path):
+        "Retrieve (creating if necessary) the child table for a collection"
+        table = self.children.get(path)
+        if table is None:
+            table = self.children[path] = ColumnTable(self.numeric, self.collections)
+        return table
+
+    def add_record(self, record, key=None):
+        """Flatten a decoded record into this table.
+
+        `key` is the name of the field that identifies the record; its
+        value is copied onto every row of any nested collection.
+        """
+        row = {}
+        keys = {}
+        if key and key in record:
+            keys[key] = record[key]
+        self._flatten(record, u'', row, keys)
+        self.append(row)
+
+    def _flatten(self, record, prefix, row, keys, scope=u''):
+        for name, value in record.items():
+            if isinstance(value, dict) and len(value) == 1:
+                item = value.values()[0]
+                if value.keys()[0] in self.collections and isinstance(item, dict):
+                    value = [item]
+
+            if isinstance(value, dict):
+                self._flatten(value, prefix + name + u'.', row, keys, scope)
+
+            elif isinstance(value, (list, tuple)):
+                # Collections (at any depth) are stored on this table's
+                # children, under their full path.
+                path = scope + prefix + name
+                table = self.child(path)
+                # Items of a collection named "LineItems" are
+                # identified by a LineItemID.
+                item_key = (name[:-1] if name.endswith(u's') else name) + u'ID'
+                for item in value:
+                    child_row = dict(keys)
+                    if isinstance(item, dict):
+                        child_keys = dict(keys)
+                        if item_key in item:
+                            child_keys[item_key] = item[item_key]
+                        self._flatten(item, u'', child_row, child_keys, path + u'.')
+                    else:
+                        child_row[u'Value'] = item
+                    table.append(child_row)
+
+            else:
+                row[prefix + name] = value
+
+
+def to_columns(records, key=None, numeric=(), collections=()):
+    "Convert a list of decoded records into a ColumnTable"
+    table = ColumnTable(numeric, collections)
+    if isinstance(records, dict):
+        records = [records]
+    for record in records or []:
+        table.add_record(record, key)
+    return table
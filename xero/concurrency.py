@@ -0,0 +1,212 @@
+import heapq
+import threading
+import time
+
+from .exceptions import XeroDeadlineExceeded
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Collapse identical concurrent calls into one.
+
+    While a call for a key is in progress, other calls for the same key
+    wait for it to finish and share its result (or its exception),
+    rather than making the call again. Once the call has finished, the
+    next call for the key starts afresh; nothing is cached.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        "Call func, unless an identical call is already in progress"
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+# Shared by every Manager, so that identical requests are collapsed
+# even when they are made through different Xero instances.
+single_flight = SingleFlight()
+
+
+class AdaptiveLimiter(object):
+    """Limit the number of requests in flight, adapting to feedback.
+
+    The limit grows by `increase` each time a full limit's worth of
+    requests succeeds (so by roughly one request per round trip), up to
+    `max_limit`. When Xero reports that it is overloaded (a 503 for a
+    rate limit, or because it is unavailable), the limit is multiplied
+    by `decrease`, down to `min_limit`. Requests that were already in
+    flight when the limit was decreased don't decrease it again.
+
+    The current `limit` and the number of requests `in_flight` can be
+    read at any time, for monitoring.
+
+    Usage:
+
+        >>> from xero.concurrency import AdaptiveLimiter
+        >>> limiter = AdaptiveLimiter(initial=4, max_limit=32)
+        >>> xero = Xero(credentials, limiter=limiter)
+    """
+    def __init__(self, initial=4, min_limit=1, max_limit=64, increase=1.0, decrease=0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = float(initial)
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.backoffs = 0
+        self.epoch = 0
+        self.condition = threading.Condition()
+
+    @property
+    def limit(self):
+        "The number of requests that may currently be in flight"
+        return max(self.min_limit, int(self._limit))
+
+    def acquire(self):
+        """Wait until another request can be made.
+
+        Returns a token that must be passed to release().
+        """
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+            self.requests += 1
+            return self.epoch
+
+    def release(self, token, overloaded=False, succeeded=True):
+        """Record the outcome of a request.
+
+        Overloaded requests decrease the limit; other successful
+        requests increase it. Failures for any other reason (e.g., a
+        connection error) leave the limit unchanged.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if overloaded:
+                if token == self.epoch:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self.epoch += 1
+                    self.backoffs += 1
+            elif succeeded:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+                self.successes += 1
+            self.condition.notify_all()
+
+
+class PriorityDispatcher(object):
+    """Admit requests for each organisation in priority order.
+
+    At most `concurrency` requests for an organisation are in flight at
+    once; the rest wait in a queue, where high priority requests are
+    admitted before normal ones, and normal before low (and requests of
+    the same priority are admitted in the order they arrived). Requests
+    that can't be sent before their deadline (a number of seconds to
+    wait in the queue) are dropped, raising XeroDeadlineExceeded, so a
+    backlog of bulk requests doesn't hold up interactive ones.
+
+    `deadlines` sets the default deadline for each priority; a deadline
+    can also be given for an individual request. Requests are admitted
+    before the organisation's daily call budget is spent, so dropped
+    requests don't use any of it.
+
+    Usage:
+
+        >>> from xero.concurrency import PriorityDispatcher
+        >>> dispatcher = PriorityDispatcher(concurrency=4, deadlines={'low': 300})
+        >>> xero = Xero(credentials, dispatcher=dispatcher)
+        >>> xero.invoices.get(invoice_id, priority='high', deadline=5)
+    """
+    PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+    def __init__(self, concurrency=4, deadlines=None):
+        self.concurrency = concurrency
+        self.deadlines = deadlines or {}
+        self.condition = threading.Condition()
+        self.queues = {}
+        self.in_flight = {}
+        self.sequence = 0
+        self.admitted = 0
+        self.dropped = 0
+
+    def queued(self, key):
+        "The number of requests for an organisation waiting to be sent"
+        with self.condition:
+            return len(self.queues.get(key, ()))
+
+    def acquire(self, key, priority='normal', deadline=None):
+        """Wait until a request for an organisation can be sent.
+
+        Each request that is admitted must be followed by release().
+        """
+        if priority not in self.PRIORITIES:
+            raise ValueError('Unknown priority: %s (choose from %s)' % (
+                priority, ', '.join(sorted(self.PRIORITIES, key=self.PRIORITIES.get))))
+        if deadline is None:
+            deadline = self.deadlines.get(priority)
+        started = time.time()
+        expires = None if deadline is None else started + deadline
+
+        with self.condition:
+            queue = self.queues.setdefault(key, [])
+            self.sequence += 1
+            entry = (self.PRIORITIES[priority], self.sequence)
+            heapq.heappush(queue, entry)
+            while True:
+                if queue[0] == entry and self.in_flight.get(key, 0) < self.concurrency:
+                    heapq.heappop(queue)
+                    self.in_flight[key] = self.in_flight.get(key, 0) + 1
+                    self.admitted += 1
+                    # The next request in the queue may be admissible too
+                    self.condition.notify_all()
+                    return
+                now = time.time()
+                if expires is not None and now >= expires:
+                    queue.remove(entry)
+                    heapq.heapify(queue)
+                    self.dropped += 1
+                    self.condition.notify_all()
+                    raise XeroDeadlineExceeded(key, priority, now - started)
+                self.condition.wait(None if expires is None else expires - now)
+
+    def release(self, key):
+        "Record that a request for an organisation has finished"
+        with self.condition:
+            self.in_flight[key] -= 1
+            if not self.in_flight[key] and not self.queues.get(key):
+                del self.in_flight[key]
+                self.queues.pop(key, None)
+            self.condition.notify_all()
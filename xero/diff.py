@@ -0,0 +1,51 @@
+from datetime import date, datetime
+import hashlib
+
+
+def canonical(value, collections=()):
+    """Convert a value into a canonical form for comparison.
+
+    Dictionaries (and records) become sorted lists of items; dates,
+    booleans and amounts become the strings Xero would send. A
+    collection holding a single item (which is decoded as, e.g.,
+    {'LineItem': {...}}) is unwrapped into a list, so that it compares
+    equal to the list of items that would be saved.
+    """
+    if hasattr(value, 'to_dict'):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        if len(value) == 1:
+            key, item = list(value.items())[0]
+            if key in collections and not isinstance(item, (list, tuple)):
+                return [canonical(item, collections)]
+            if key in collections:
+                return [canonical(i, collections) for i in item]
+        return sorted((key, canonical(item, collections)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [canonical(item, collections) for item in value]
+    if isinstance(value, bool):
+        return u'true' if value else u'false'
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if value is None:
+        return None
+    return unicode(value)
+
+
+def content_hash(record, fields=None, collections=()):
+    "A hash of the content of a record (or of some of its fields)"
+    if hasattr(record, 'to_dict'):
+        record = record.to_dict()
+    if fields is not None:
+        record = dict((field, record.get(field)) for field in fields)
+    return hashlib.sha1(repr(canonical(record, collections))).hexdigest()
+
+
+def changed_fields(record, remote, collections=()):
+    "The names of the fields of a record whose values differ from the remote copy"
+    if hasattr(remote, 'to_dict'):
+        remote = remote.to_dict()
+    return [
+        field for field in record
+        if canonical(record[field], collections) != canonical(remote.get(field), collections)
+    ]
@@ -1,5 +1,54 @@
+from io import BytesIO
 from urlparse import parse_qs
 from xml.dom.minidom import parseString
+from xml.etree.cElementTree import iterparse
+
+
+def parse_validation_errors(content):
+    """Extract the messages from a validation error response.
+
+    Returns (message, errors, problems): the summary message, every
+    other message in the response, and an (index, record, messages)
+    tuple for each element of the request that failed validation. The
+    index is the position of the element in the request; the record is
+    a dictionary of the simple fields Xero echoed back for it.
+
+    The response is parsed incrementally, and each element is discarded
+    once it has been read, so large bulk responses are cheap to decode.
+    """
+    message = None
+    errors = []
+    problems = []
+    path = []
+    index = -1
+    messages = None
+    for event, elem in iterparse(BytesIO(content), events=('start', 'end')):
+        if event == 'start':
+            if path and path[-1] == 'Elements':
+                index += 1
+                messages = []
+            path.append(elem.tag)
+            continue
+
+        path.pop()
+        if elem.tag == 'Message':
+            text = elem.text or ''
+            if message is None:
+                message = text
+            else:
+                errors.append(text)
+                if messages is not None and 'ValidationError' in path:
+                    messages.append(text)
+        elif path and path[-1] == 'Elements':
+            if messages:
+                record = dict(
+                    (child.tag, child.text) for child in elem
+                    if len(child) == 0 and child.text and child.text.strip()
+                )
+                problems.append((index, record, messages))
+            messages = None
+            elem.clear()
+    return message, errors, problems
 
 
 class XeroException(Exception):
@@ -17,18 +66,17 @@ class XeroBadRequest(XeroException):
     # HTTP 400: Bad Request
     def __init__(self, response):
         # Extract the messages from the text.
-        # parseString takes byte content, not unicode.
+        # iterparse takes byte content, not unicode.
+        self.errors = []
+        self.problems = []
         try:
-            dom = parseString(response.text.encode(response.encoding))
-            messages = dom.getElementsByTagName('Message')
-    
-            msg = messages[0].childNodes[0].data
-            self.errors = [
-                m.childNodes[0].data for m in messages[1:]
-            ]
+            msg, self.errors, self.problems = parse_validation_errors(
+                response.text.encode(response.encoding))
+            if msg is None:
+                msg = response.text
         except Exception: # Couldn't parse XML for some reason
             msg = response.text
-            
+
         super(XeroBadRequest, self).__init__(response, msg)
 
 
@@ -86,3 +134,33 @@ class XeroNotAvailable(XeroException):
 class XeroExceptionUnknown(XeroException):
     # Any other exception.
     pass
+
+
+class XeroCircuitOpen(XeroException):
+    # Not sent: recent requests to the endpoint have been failing
+    def __init__(self, key, retry_after):
+        self.key = key
+        self.retry_after = retry_after
+        super(XeroCircuitOpen, self).__init__(None,
+            'Requests to %s are failing; retry after %.0f seconds' % (key, retry_after))
+
+
+class XeroBudgetExceeded(XeroException):
+    # Not sent: the organisation's daily call budget has been used
+    def __init__(self, key, priority, remaining, retry_after):
+        self.key = key
+        self.priority = priority
+        self.remaining = remaining
+        self.retry_after = retry_after
+        super(XeroBudgetExceeded, self).__init__(None,
+            'The daily call budget for %s calls has been used (%d calls remaining)' % (priority, remaining))
+
+
+class XeroDeadlineExceeded(XeroException):
+    # Not sent: the request waited in the queue past its deadline
+    def __init__(self, key, priority, waited):
+        self.key = key
+        self.priority = priority
+        self.waited = waited
+        super(XeroDeadlineExceeded, self).__init__(None,
+            'The %s priority request for %s was dropped after waiting %.1f seconds' % (priority, key, waited))
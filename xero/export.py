@@ -0,0 +1,230 @@
+import csv
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import os
+from Queue import Empty, Queue
+import threading
+import time
+
+from .manager import Manager
+from .streams import Checkpoint
+
+
+def _default(value):
+    # Encode the values json doesn't know about
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return unicode(value)
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(repr(value))
+
+
+def _unwrap(value, collections):
+    # A collection with a single item is decoded as a dictionary
+    # wrapping it (e.g., {'Phone': {...}}); unwrap it into a list, so it
+    # is written in the same way as a collection of several items.
+    if hasattr(value, 'to_dict'):
+        value = value.to_dict()
+    if isinstance(value, dict) and len(value) == 1:
+        key, item = list(value.items())[0]
+        if key in collections:
+            return list(item) if isinstance(item, (list, tuple)) else [item]
+    return value
+
+
+def _collections(value, collections):
+    # Unwrap the collections in a value, at any depth
+    value = _unwrap(value, collections)
+    if isinstance(value, dict):
+        return dict((key, _collections(item, collections)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_collections(item, collections) for item in value]
+    return value
+
+
+def _flatten(record, prefix=u'', out=None, collections=Manager.MULTI_LINES):
+    # Nested objects become dotted columns; collections are kept as JSON
+    out = {} if out is None else out
+    if hasattr(record, 'to_dict'):
+        record = record.to_dict()
+    for key, value in record.items():
+        name = prefix + key
+        value = _unwrap(value, collections)
+        if isinstance(value, dict):
+            _flatten(value, name + u'.', out, collections)
+        elif isinstance(value, (list, tuple)):
+            out[name] = json.dumps(_collections(value, collections), default=_default)
+        elif isinstance(value, (date, datetime)):
+            out[name] = value.isoformat()
+        elif value is None:
+            out[name] = u''
+        else:
+            out[name] = unicode(value)
+    return out
+
+
+class NDJSONWriter(object):
+    "Write one JSON object per line"
+    extension = 'ndjson'
+
+    def __init__(self, f, columns=None):
+        self.f = f
+        self.columns = None
+
+    def write(self, records):
+        for record in records:
+            self.f.write(json.dumps(record, default=_default))
+            self.f.write('\n')
+
+
+class CSVWriter(object):
+    """Write records as CSV rows.
+
+    The columns are taken from the first page of records (and saved
+    with the checkpoint, so a resumed export uses the same columns).
+    Fields that only appear later are written as JSON, in an `_extra`
+    column. Collections are written as JSON lists, including those
+    with a single item.
+    """
+    extension = 'csv'
+
+    def __init__(self, f, columns=None):
+        self.f = f
+        self.writer = csv.writer(f)
+        self.columns = columns
+
+    def write(self, records):
+        rows = [_flatten(record) for record in records]
+        if self.columns is None:
+            columns = set()
+            for row in rows:
+                columns.update(row)
+            self.columns = sorted(columns) + [u'_extra']
+            self.writer.writerow([column.encode('utf-8') for column in self.columns])
+
+        known = self.columns[:-1]
+        known_set = set(known)
+        for row in rows:
+            extra = dict((key, value) for key, value in row.items() if key not in known_set)
+            values = [row.get(column, u'') for column in known]
+            values.append(json.dumps(extra) if extra else u'')
+            self.writer.writerow([value.encode('utf-8') for value in values])
+
+
+WRITERS = {
+    'ndjson': NDJSONWriter,
+    'csv': CSVWriter,
+}
+
+
+class ExportResult(object):
+    "The outcome of exporting a single entity"
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.records = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.resumed = False
+        self.error = None
+
+
+def export_entity(name, manager, directory, format='ndjson', since=None):
+    """Export every object of an entity to a file, a page at a time.
+
+    Only one page of objects is held in memory at a time. After each
+    page has been written, the file is flushed, and the paging position
+    and file size are saved in a checkpoint next to the file; an
+    interrupted export resumes from the last completed page (discarding
+    anything written after it). Completed exports aren't repeated.
+    """
+    writer_class = WRITERS[format]
+    path = os.path.join(directory, '%s.%s' % (name, writer_class.extension))
+    checkpoint = Checkpoint(path + '.checkpoint')
+    result = ExportResult(name, path)
+    started = time.time()
+
+    state = checkpoint.load()
+    if state and state.get('done'):
+        result.resumed = True
+        result.records = state['records']
+        result.bytes = state['bytes']
+        return result
+
+    kwargs = {}
+    if since is not None:
+        kwargs['since'] = since
+    if state and os.path.exists(path):
+        result.resumed = True
+        result.records = state['records']
+        if manager.name in manager.OFFSET_ENTITIES:
+            kwargs['offset'] = state['position']
+        else:
+            kwargs['page'] = state['position']
+        f = open(path, 'r+b')
+        f.truncate(state['bytes'])
+        f.seek(state['bytes'])
+    else:
+        state = None
+        f = open(path, 'wb')
+
+    with f:
+        writer = writer_class(f, state and state.get('columns'))
+        for position, records in manager.pages(**kwargs):
+            writer.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+            result.records += len(records)
+            checkpoint.save({
+                'position': position,
+                'records': result.records,
+                'bytes': f.tell(),
+                'columns': writer.columns,
+                'done': position is None,
+            })
+        result.bytes = f.tell()
+
+    checkpoint.save({'records': result.records, 'bytes': result.bytes, 'done': True})
+    result.seconds = time.time() - started
+    return result
+
+
+def export(managers, directory, format='ndjson', since=None, workers=4):
+    """Export several entities concurrently.
+
+    `managers` is a list of (name, manager) pairs; up to `workers`
+    entities are exported at the same time. Returns an ExportResult for
+    each entity. A failed entity doesn't stop the others; its error is
+    recorded on its result, and it resumes from its checkpoint when the
+    export is run again.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tasks = Queue()
+    for index, (name, manager) in enumerate(managers):
+        tasks.put((index, name, manager))
+    results = [None] * tasks.qsize()
+
+    def work():
+        while True:
+            try:
+                index, name, manager = tasks.get_nowait()
+            except Empty:
+                return
+            try:
+                results[index] = export_entity(name, manager, directory, format, since)
+            except Exception as e:
+                result = results[index] = ExportResult(name, None)
+                result.error = e
+
+    threads = [threading.Thread(target=work) for i in range(max(1, min(workers, tasks.qsize())))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
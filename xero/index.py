@@ -0,0 +1,187 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+import re
+import unicodedata
+
+
+_PUNCTUATION = re.compile(r'[^\w\s]', re.UNICODE)
+_WHITESPACE = re.compile(r'\s+', re.UNICODE)
+
+
+def normalize_name(name):
+    """Normalize a name for matching.
+
+    Accents and punctuation are removed, the name is lowercased, and
+    runs of whitespace are collapsed; "Smith & Sons, Ltd." becomes
+    "smith sons ltd".
+    """
+    if not isinstance(name, unicode):
+        name = name.decode('utf-8')
+    name = unicodedata.normalize('NFKD', name)
+    name = u''.join(c for c in name if not unicodedata.combining(c))
+    name = _PUNCTUATION.sub(u' ', name.lower())
+    return _WHITESPACE.sub(u' ', name).strip()
+
+
+def _trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class ContactIndex(object):
+    """A local index of contacts, for lookups without API calls.
+
+    Contacts can be found by ContactID, ContactNumber, email address or
+    normalized name, and searched by name prefix (using a sorted list
+    of names) or by any part of the name (using an index of the
+    three-letter sequences in each name).
+
+    The first call to `update()` retrieves every contact; later calls
+    only retrieve the contacts modified since the previous update.
+
+    Usage:
+
+        >>> index = ContactIndex()
+        >>> index.update(xero.contacts)
+        >>> index.by_email('rayong@yarratransport.co')
+        {u'ContactID': ..., u'Name': u'Yarra Transport', ...}
+        >>> index.startswith('yarra')
+        [{u'ContactID': ..., u'Name': u'Yarra Transport', ...}]
+    """
+    def __init__(self, contacts=()):
+        self.contacts = {}
+        self.numbers = {}
+        self.emails = {}
+        self.names = {}
+        # The normalized name of each contact
+        self.normalized = {}
+        self.sorted_names = []
+        self.trigrams = {}
+        self.since = None
+
+        for contact in contacts:
+            self.add(contact)
+
+    def __len__(self):
+        return len(self.contacts)
+
+    def __contains__(self, contact_id):
+        return contact_id in self.contacts
+
+    def add(self, contact):
+        "Add a contact to the index, replacing any earlier version of it"
+        contact_id = contact['ContactID']
+        if contact_id in self.contacts:
+            self.remove(contact_id)
+        self.contacts[contact_id] = contact
+
+        if contact.get('ContactNumber'):
+            self.numbers[contact['ContactNumber']] = contact_id
+        if contact.get('EmailAddress'):
+            self.emails[contact['EmailAddress'].lower()] = contact_id
+
+        name = normalize_name(contact.get('Name') or u'')
+        if name:
+            self.normalized[contact_id] = name
+            self.names.setdefault(name, set()).add(contact_id)
+            insort(self.sorted_names, (name, contact_id))
+            for trigram in _trigrams(name):
+                self.trigrams.setdefault(trigram, set()).add(contact_id)
+
+    def remove(self, contact_id):
+        "Remove a contact from the index"
+        contact = self.contacts.pop(contact_id)
+
+        if self.numbers.get(contact.get('ContactNumber')) == contact_id:
+            del self.numbers[contact['ContactNumber']]
+        email = (contact.get('EmailAddress') or u'').lower()
+        if self.emails.get(email) == contact_id:
+            del self.emails[email]
+
+        name = self.normalized.pop(contact_id, None)
+        if name:
+            self.names[name].discard(contact_id)
+            if not self.names[name]:
+                del self.names[name]
+            position = bisect_left(self.sorted_names, (name, contact_id))
+            del self.sorted_names[position]
+            for trigram in _trigrams(name):
+                ids = self.trigrams[trigram]
+                ids.discard(contact_id)
+                if not ids:
+                    del self.trigrams[trigram]
+
+    def update(self, manager):
+        """Retrieve the contacts modified since the last update.
+
+        Returns the number of contacts that were added or replaced.
+        """
+        started = datetime.utcnow()
+        if self.since is None:
+            contacts = manager.iter()
+        else:
+            contacts = manager.iter(since=self.since)
+
+        count = 0
+        for contact in contacts:
+            self.add(contact)
+            count += 1
+        self.since = started
+        return count
+
+    def get(self, contact_id):
+        "Find a contact by ContactID"
+        return self.contacts.get(contact_id)
+
+    def by_number(self, number):
+        "Find a contact by ContactNumber"
+        return self.contacts.get(self.numbers.get(number))
+
+    def by_email(self, email):
+        "Find a contact by email address (ignoring case)"
+        return self.contacts.get(self.emails.get(email.lower()))
+
+    def by_name(self, name):
+        "Find the contacts whose normalized name matches exactly"
+        return [self.contacts[i] for i in sorted(self.names.get(normalize_name(name), ()))]
+
+    def startswith(self, prefix, limit=None):
+        "Find the contacts whose normalized name starts with a prefix"
+        prefix = normalize_name(prefix)
+        results = []
+        position = bisect_left(self.sorted_names, (prefix,))
+        for name, contact_id in self.sorted_names[position:]:
+            if not name.startswith(prefix) or len(results) == limit:
+                break
+            results.append(self.contacts[contact_id])
+        return results
+
+    def contains(self, text, limit=None):
+        "Find the contacts whose normalized name contains some text"
+        text = normalize_name(text)
+        trigrams = _trigrams(text)
+        if not trigrams:
+            # Too short to narrow down; scan the names in order.
+            results = []
+            for name, contact_id in self.sorted_names:
+                if len(results) == limit:
+                    break
+                if text in name:
+                    results.append(self.contacts[contact_id])
+            return results
+
+        # Only names that contain every trigram of the text can contain
+        # the text; start from the rarest trigram.
+        candidates = None
+        for trigram in sorted(trigrams, key=lambda t: len(self.trigrams.get(t, ()))):
+            ids = self.trigrams.get(trigram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        matches = sorted(
+            (self.normalized[contact_id], contact_id) for contact_id in candidates
+            if text in self.normalized[contact_id]
+        )
+        return [self.contacts[contact_id] for name, contact_id in matches[:limit]]
@@ -0,0 +1,157 @@
+from array import array
+from datetime import date, datetime
+
+from .manager import as_list
+from .streams import Checkpoint
+
+
+class Ledger(object):
+    """Account balances maintained incrementally from the journal stream.
+
+    Each JournalLine is folded into a balance array for its account
+    (and for each tracking option it is tagged with), with one entry
+    per period. The ledger remembers the offset of the last journal it
+    has seen; calling `update()` only retrieves the journals that have
+    been posted since.
+
+    If a path is provided, the balances and the offset are saved
+    together after every batch of journals, and reloaded when the
+    ledger is next constructed.
+
+    Usage:
+
+        >>> ledger = Ledger('ledger.json')
+        >>> ledger.update(xero.journals)
+        >>> ledger.trial_balance(through='2013-06')
+        {u'200': -20150.0, u'469': 4500.0, ...}
+    """
+    def __init__(self, path=None, period_format='%Y-%m'):
+        self.checkpoint = Checkpoint(path) if path else None
+        self.offset = 0
+        self.period_format = period_format
+        self.periods = []
+        self.period_index = {}
+        # The date each period starts, for comparing periods in order
+        self.period_starts = []
+        self.accounts = {}
+        self.account_names = {}
+        self.tracking = {}
+
+        state = self.checkpoint.load() if self.checkpoint else None
+        if state:
+            self.offset = state['offset']
+            self.period_format = state['period_format']
+            for period in state['periods']:
+                self._period(period)
+            self.account_names = state['account_names']
+            for code, balances in state['accounts'].items():
+                self.accounts[code] = array('d', balances)
+            for code, category, option, balances in state['tracking']:
+                self.tracking[(code, category, option)] = array('d', balances)
+
+    def _period(self, period):
+        index = self.period_index.get(period)
+        if index is None:
+            start = self._parse_period(period)
+            index = self.period_index[period] = len(self.periods)
+            self.periods.append(period)
+            self.period_starts.append(start)
+        return index
+
+    def _parse_period(self, period):
+        # Periods are compared as dates, not as strings (which would
+        # only sort correctly for formats like %Y-%m).
+        if isinstance(period, datetime):
+            return period
+        if isinstance(period, date):
+            return datetime(period.year, period.month, period.day)
+        try:
+            return datetime.strptime(period, self.period_format)
+        except (TypeError, ValueError):
+            raise ValueError("%r isn't a period in the format %r" % (period, self.period_format))
+
+    def _add(self, balances, key, index, amount):
+        row = balances.get(key)
+        if row is None:
+            row = balances[key] = array('d')
+        if len(row) <= index:
+            row.extend([0.0] * (index + 1 - len(row)))
+        row[index] += amount
+
+    def add_journal(self, journal):
+        "Fold the lines of a single journal into the balances"
+        index = self._period(journal['JournalDate'].strftime(self.period_format))
+        for line in as_list(journal.get('JournalLines'), 'JournalLine'):
+            code = line.get('AccountCode') or line.get('AccountID')
+            amount = float(line.get('NetAmount') or 0)
+            if 'AccountName' in line:
+                self.account_names[code] = line['AccountName']
+            self._add(self.accounts, code, index, amount)
+            for tracking in as_list(line.get('TrackingCategories'), 'TrackingCategory'):
+                key = (code, tracking.get('Name'), tracking.get('Option'))
+                self._add(self.tracking, key, index, amount)
+
+    def update(self, manager):
+        """Retrieve and fold in every journal posted since the last update.
+
+        Returns the number of journals that were added.
+        """
+        count = 0
+        for offset, journals in manager.pages(offset=self.offset):
+            for journal in journals:
+                self.add_journal(journal)
+            count += len(journals)
+            self.offset = offset
+            self.save()
+        return count
+
+    def save(self):
+        "Save the balances and offset to the ledger's path"
+        if self.checkpoint is None:
+            return
+        self.checkpoint.save({
+            'offset': self.offset,
+            'period_format': self.period_format,
+            'periods': self.periods,
+            'account_names': self.account_names,
+            'accounts': dict((code, row.tolist()) for code, row in self.accounts.items()),
+            'tracking': [list(key) + [row.tolist()] for key, row in self.tracking.items()],
+        })
+
+    def _total(self, row, period, through):
+        if period is not None:
+            index = self.period_index.get(period)
+            return row[index] if index is not None and index < len(row) else 0.0
+        if through is not None:
+            through = self._parse_period(through)
+        return sum(
+            amount for amount, start in zip(row, self.period_starts)
+            if through is None or start <= through
+        )
+
+    def balance(self, code, period=None, through=None):
+        """The balance of an account.
+
+        If period is provided, returns the movement in that period.
+        Otherwise, returns the closing balance as at the end of the
+        `through` period (or of all periods, if not provided). `through`
+        is a period in the ledger's format, or a date in that period.
+        """
+        row = self.accounts.get(code)
+        if row is None:
+            return 0.0
+        return self._total(row, period, through)
+
+    def tracking_balance(self, code, category, option, period=None, through=None):
+        "The balance of an account for a single tracking option"
+        row = self.tracking.get((code, category, option))
+        if row is None:
+            return 0.0
+        return self._total(row, period, through)
+
+    def trial_balance(self, period=None, through=None):
+        "The balance of every account, keyed by account code"
+        return dict(
+            (code, self._total(row, period, through))
+            for code, row in self.accounts.items()
+        )
@@ -1,13 +1,99 @@
 from xml.dom.minidom import parseString
-from xml.etree.ElementTree import tostring, SubElement, Element
+from xml.etree.ElementTree import SubElement
 from datetime import datetime
+from decimal import Decimal
 from dateutil.parser import parse
-import urllib
+import hashlib
 import requests
+import threading
 from urlparse import parse_qs
 
 from .constants import XERO_API_URL
 from .exceptions import *
+from .columnar import to_columns
+from .concurrency import single_flight as shared_single_flight
+from .diff import changed_fields, content_hash
+from .query import P, Q
+from .records import make_record, record_class
+from .reports import ReportReader, decode_report
+
+
+# Xero returns amounts as fixed precision strings, and the same handful
+# of values ('0.00', '1.0000', ...) appear over and over. Decimals are
+# immutable, so each distinct string only needs to be converted once.
+_DECIMAL_CACHE = {}
+_DECIMAL_CACHE_SIZE = 10000
+
+
+def parse_decimal(val):
+    "Convert a Xero amount string into a Decimal"
+    try:
+        return _DECIMAL_CACHE[val]
+    except KeyError:
+        if len(_DECIMAL_CACHE) >= _DECIMAL_CACHE_SIZE:
+            _DECIMAL_CACHE.clear()
+        result = _DECIMAL_CACHE[val] = Decimal(val)
+        return result
+
+
+# How values are written when objects are saved. Anything else is
+# converted with unicode().
+_FORMATTERS = {
+    unicode: lambda val: val,
+    str: lambda val: val.decode('utf-8'),
+}
+
+
+def _escape(text):
+    "Escape text for an XML element"
+    if u'&' in text:
+        text = text.replace(u'&', u'&amp;')
+    if u'<' in text:
+        text = text.replace(u'<', u'&lt;')
+    if u'>' in text:
+        text = text.replace(u'>', u'&gt;')
+    return text
+
+
+def daily_limit_exceeded(response):
+    """Whether a response reports that the organisation's daily call
+    limit (rather than the per-minute limit) has been reached."""
+    if response.status_code not in (429, 503):
+        return False
+    problem = response.headers.get('X-Rate-Limit-Problem')
+    if isinstance(problem, basestring):
+        return problem.lower() == 'day'
+    advice = parse_qs(response.text).get('oauth_problem_advice', [u''])[0]
+    return u'daily' in advice.lower()
+
+
+# Server errors that mean an endpoint is unavailable. Others (e.g.,
+# 501 Not Implemented) are a problem with the request, not the server.
+UNAVAILABLE_STATUS_CODES = (500, 502, 503, 504)
+
+
+def unavailable(response):
+    "Whether a response means the endpoint is unavailable (not rate limited)"
+    if response.status_code not in UNAVAILABLE_STATUS_CODES:
+        return False
+    # Rate limit errors return encoded content; offline errors don't.
+    return not (response.status_code == 503 and parse_qs(response.text))
+
+
+def as_list(results, item=None):
+    """Normalize a result (None, a single object, or a list) into a list.
+
+    A collection with a single item is decoded as a dictionary wrapping
+    that item (e.g., {'LineItem': {...}}); if the name of the item is
+    provided, the wrapper is removed.
+    """
+    if item is not None and isinstance(results, dict) and item in results:
+        results = results[item]
+    if results is None:
+        return []
+    if isinstance(results, (list, tuple)):
+        return list(results)
+    return [results]
 
 
 class Manager(object):
@@ -21,21 +107,69 @@ class Manager(object):
             u'EndDate')
     DATE_FIELDS = (u'DueDate', u'Date', u'JournalDate')
     BOOLEAN_FIELDS = (u'IsSupplier', u'IsCustomer')
+    DECIMAL_FIELDS = (u'Total', u'SubTotal', u'TotalTax', u'TotalDiscount',
+            u'UnitAmount', u'Quantity', u'LineAmount', u'TaxAmount', u'DiscountRate',
+            u'AmountDue', u'AmountPaid', u'AmountCredited', u'Amount', u'BankAmount',
+            u'CurrencyRate', u'RemainingCredit', u'AppliedAmount', u'NetAmount',
+            u'GrossAmount', u'EffectiveRate', u'DisplayTaxRate', u'Rate',
+            u'RatePerUnit', u'NumberOfUnits')
 
     MULTI_LINES = (u'LineItem', u'Phone', u'Address', u'TaxRate', 
             u'JournalLine', u'TrackingCategory', u'Payment',
             u'TimesheetLine', u'NumberOfUnit', u'EarningsRate', u'DeductionType',
             u'ReimbursementType', u'LeaveType', u'EarningsRates', u'DeductionTypes',
             u'ReimbursementTypes', u'LeaveTypes', u'Option', u'Allocation',
-            u'EarningsLine')
+            u'EarningsLine', u'ValidationError')
 
     PLURAL_EXCEPTIONS = {
             'Addresse': 'Address',
             'TrackingCategories': 'TrackingCategory'}
 
-    def __init__(self, name, oauth, api_name):
+    # Endpoints that return results a page at a time. Most are paged
+    # by page number; some are paged by an offset taken from a field
+    # of the last object returned.
+    PAGE_SIZE = 100
+    PAGED_ENTITIES = (u'Contacts', u'CreditNotes', u'Invoices')
+    OFFSET_ENTITIES = {u'Journals': u'JournalNumber'}
+
+    def __init__(self, name, oauth, api_name, numeric=None, numeric_fields=None,
+            records=False, cache=None, single_flight=False, limiter=None,
+            breaker=None, budget=None, dispatcher=None, transport=None):
         self.oauth = oauth
         self.name = name
+        self.cache = cache
+        self.limiter = limiter
+        self.breaker = breaker
+        self.budget = budget
+        self.dispatcher = dispatcher
+        # Sends requests in place of the requests library (e.g., to
+        # record or replay them; see xero.cassette).
+        self.transport = transport
+
+        # Identical GET requests made at the same time (from different
+        # threads) can share a single HTTP call, and its decoded result.
+        if single_flight is True:
+            single_flight = shared_single_flight
+        self.single_flight = single_flight or None
+
+        # Amount fields are left as strings unless a numeric type
+        # (Decimal or float) has been requested.
+        if numeric is Decimal:
+            numeric = parse_decimal
+        self.numeric = numeric
+        self.numeric_fields = frozenset(numeric_fields or self.DECIMAL_FIELDS)
+
+        # In record mode, results are returned as compact Record objects
+        # whose typed and nested fields are only decoded when read.
+        self.records = records
+        self.record_class = None
+        self._record_lock = threading.Lock()
+
+        # Element names and tags used when saving, built as needed
+        self._save_plan = {}
+
+        # Compiled filter() conditions, keyed by field names
+        self._filter_queries = {}
         
         self.api_url = oauth.api_url
         if (api_name == "payroll"):
@@ -51,22 +185,75 @@ class Manager(object):
         else:
             self.singular = name
 
+        # A fingerprint of the credentials (and so, of the organisation)
+        # that requests are made with, and of the API they are made to.
+        client = getattr(oauth, 'client', None)
+        owner = [
+            unicode(getattr(client, 'client_key', None)),
+            unicode(getattr(client, 'resource_owner_key', None)),
+        ]
+        self.organisation_key = hashlib.sha1(u'\0'.join(owner).encode('utf-8')).hexdigest()
+        self.credential_key = hashlib.sha1(u'\0'.join(
+            owner + [unicode(self.api_url)]
+        ).encode('utf-8')).hexdigest()
+
         for method_name in self.DECORATED_METHODS:
             method = getattr(self, method_name)
             setattr(self, method_name, self._get_data(method))
 
-    def walk_dom(self, dom):
+    def walk_dom(self, dom, fields=None):
+        # If provided, fields is a projection tree (see get_projection);
+        # elements that aren't part of the projection aren't walked.
         tree_list = tuple()
         for node in dom.childNodes:
             tagName = getattr(node, 'tagName', None)
             if tagName:
-                tree_list += (tagName, self.walk_dom(node),)
+                if fields is None:
+                    tree_list += (tagName, self.walk_dom(node),)
+                elif tagName in fields:
+                    tree_list += (tagName, self.walk_dom(node, fields[tagName]),)
+                elif tagName in self.MULTI_LINES:
+                    # The items of a collection are projected
+                    # in the same way as the collection itself.
+                    tree_list += (tagName, self.walk_dom(node, fields),)
             else:
                 data = node.data.strip()
                 if data:
                     tree_list += (node.data.strip(),)
         return tree_list
 
+    def get_projection(self, fields):
+        """Convert a list of field paths into a projection tree.
+
+        Paths use dots to select fields of nested objects and
+        collections (e.g., 'Contact.Name' or 'LineItems.AccountCode').
+        Each level of the tree maps an element name to the tree for its
+        children, or to None if the whole element should be kept.
+        """
+        tree = {}
+        for field in fields:
+            level = tree
+            parts = field.split('.')
+            for part in parts[:-1]:
+                if part in level and level[part] is None:
+                    break
+                level = level.setdefault(part, {})
+            else:
+                level[parts[-1]] = None
+        return tree
+
+    def convert_value(self, key, val):
+        "Apply any special formatting required by the field to a value"
+        if key in self.BOOLEAN_FIELDS:
+            val = True if val.lower() == 'true' else False
+        if key in self.DATETIME_FIELDS:
+            val = parse(val)
+        if key in self.DATE_FIELDS:
+            val = parse(val).date()
+        if self.numeric and key in self.numeric_fields:
+            val = self.numeric(val)
+        return val
+
     def convert_to_dict(self, deep_list):
         out = {}
         if len(deep_list) > 2:
@@ -90,14 +277,8 @@ class Manager(object):
                     # we're setting a value
                     # check to see if we need to apply any special
                     # formatting to the value
-                    val = data[0]
-                    if key in self.BOOLEAN_FIELDS:
-                        val = True if val.lower() == 'true' else False
-                    if key in self.DATETIME_FIELDS:
-                        val = parse(val)
-                    if key in self.DATE_FIELDS:
-                        val = parse(val).date()
-                    
+                    val = self.convert_value(key, data[0])
+
                     if isinstance(out, dict):
                         out[key] = val
                     else:
@@ -112,11 +293,76 @@ class Manager(object):
         elif len(deep_list) == 2:
             key = deep_list[0]
             data = deep_list[1]
-            out[key] = self.convert_to_dict(data)
+            if len(data) == 1 and not isinstance(data[0], tuple):
+                # A lone value (e.g., the only field kept by a projection)
+                out[key] = self.convert_value(key, data[0])
+            else:
+                out[key] = self.convert_to_dict(data)
         elif len(deep_list) == 1:
             out = deep_list[0]
         return out
 
+    def _convert_field(self, key, value):
+        # Decode a field of a Record on first access
+        if isinstance(value, tuple):
+            return self.convert_to_dict(value)
+        return self.convert_value(key, value)
+
+    def _make_record(self, values):
+        cls = self.record_class
+        fields = [key for key, value in values]
+        if cls is None or not set(fields).issubset(cls._slots):
+            with self._record_lock:
+                # Another thread may have extended the class already.
+                cls = self.record_class
+                if cls is None or not set(fields).issubset(cls._slots):
+                    cls = self.record_class = self._extend_record_class(cls, values)
+
+        slots = cls._slots
+        values = [
+            (key, self.convert_to_dict(value))
+            if isinstance(value, tuple) and slots[key] == key else (key, value)
+            for key, value in values
+        ]
+        return make_record(cls, values)
+
+    def _extend_record_class(self, cls, values):
+        # The record has a field we haven't seen before; extend the
+        # record class to cover it.
+        known = list(cls._fields) if cls else []
+        fields = known + [key for key, value in values if key not in known]
+        lazy = set(self.BOOLEAN_FIELDS + self.DATETIME_FIELDS + self.DATE_FIELDS)
+        if self.numeric:
+            lazy.update(self.numeric_fields)
+        lazy.update(key for key, value in values if isinstance(value, tuple))
+        if cls:
+            lazy.update(key for key in cls._fields if cls._slots[key] != key)
+        return record_class(self.singular, fields, lazy, self._convert_field)
+
+    def _get_records(self, dom, fields=None):
+        # Results have the same shape as in dict mode: a single record
+        # on its own, and None when there are none.
+        records = []
+        for container in dom.documentElement.childNodes:
+            if getattr(container, 'tagName', None) != self.name:
+                continue
+            for node in container.childNodes:
+                if getattr(node, 'tagName', None) != self.singular:
+                    continue
+                tree = self.walk_dom(node, fields)
+                values = []
+                for key, data in zip(tree[::2], tree[1::2]):
+                    if len(data) == 1:
+                        values.append((key, data[0]))
+                    elif len(data) > 1:
+                        values.append((key, data))
+                records.append(self._make_record(values))
+        if not records:
+            return None
+        if len(records) == 1:
+            return records[0]
+        return records
+
     def dict_to_xml(self, root_elm, data):
         for key in data.keys():
             sub_data = data[key]
@@ -139,7 +385,10 @@ class Manager(object):
                 if is_plural:
                     for d in sub_data:
                         plural_name = self.PLURAL_EXCEPTIONS.get(plural_name, plural_name)
-                        self.dict_to_xml(SubElement(elm, plural_name), d)
+                        if isinstance(d, dict):
+                            self.dict_to_xml(SubElement(elm, plural_name), d)
+                        else:
+                            SubElement(elm, plural_name).text = str(d)
 
                 # key name isn't a plural. Just insert the content
                 # as an XML node with subnodes
@@ -153,16 +402,81 @@ class Manager(object):
 
         return root_elm
 
+    def _tags(self, key):
+        # The serialization plan for an element name: its start, end
+        # and empty tags, and the tags that wrap each item if the name
+        # is a plural. Plans are built once per name, and reused.
+        tags = self._save_plan.get(key)
+        if tags is None:
+            item_tags = None
+            if key[-1] == 's':
+                item = key[:-1]
+                item = self.PLURAL_EXCEPTIONS.get(item, item)
+                item_tags = (u'<%s>' % item, u'</%s>' % item, u'<%s />' % item)
+            tags = self._save_plan[key] = (u'<%s>' % key, u'</%s>' % key, u'<%s />' % key, item_tags)
+        return tags
+
+    def _write_xml(self, out, data):
+        # Serialize a dictionary in the same way as dict_to_xml (and
+        # ElementTree), appending to a list of strings.
+        for key in data.keys():
+            value = data[key]
+            start, end, empty, item_tags = self._tags(key)
+            position = len(out)
+            out.append(start)
+
+            if isinstance(value, dict):
+                self._write_xml(out, value)
+            elif isinstance(value, (list, tuple)):
+                if item_tags is not None:
+                    for d in value:
+                        self._write_element(out, item_tags, d)
+                else:
+                    for d in value:
+                        self._write_xml(out, d)
+            else:
+                text = _FORMATTERS.get(type(value), unicode)(value)
+                if text:
+                    out.append(_escape(text))
+
+            if len(out) == position + 1:
+                out[position] = empty
+            else:
+                out.append(end)
+
+    def _write_element(self, out, tags, data):
+        position = len(out)
+        out.append(tags[0])
+        if hasattr(data, 'keys'):
+            # A mapping: a dict, or a Record
+            self._write_xml(out, data)
+        else:
+            # An item in a list of values (e.g., a NumberOfUnit)
+            text = _FORMATTERS.get(type(data), unicode)(data)
+            if text:
+                out.append(_escape(text))
+        if len(out) == position + 1:
+            out[position] = tags[2]
+        else:
+            out.append(tags[1])
+
     def _prepare_data_for_save(self, data):
+        singular = self.singular
+        item_tags = (u'<%s>' % singular, u'</%s>' % singular, u'<%s />' % singular)
+        out = []
         if isinstance(data, list) or isinstance(data, tuple):
-            root_elm = Element(self.name)
+            out.append(u'<%s>' % self.name)
             for d in data:
-                sub_elm = SubElement(root_elm, self.singular)
-                self.dict_to_xml(sub_elm, d)
+                self._write_element(out, item_tags, d)
+            if len(out) == 1:
+                out[0] = u'<%s />' % self.name
+            else:
+                out.append(u'</%s>' % self.name)
         else:
-            root_elm = self.dict_to_xml(Element(self.singular), data)
+            self._write_element(out, item_tags, data)
 
-        return tostring(root_elm)
+        # Match ElementTree's output: ASCII, with character references
+        return u''.join(out).encode('ascii', 'xmlcharrefreplace')
 
     def _get_results(self, data):
         response = data[u'Response']
@@ -174,70 +488,277 @@ class Manager(object):
         if isinstance(result, dict) and self.singular in result:
             return result[self.singular]
 
-    def _get_data(self, func):
-        def wrapper(*args, **kwargs):
-            uri, method, body, headers = func(*args, **kwargs)
-            cert = getattr(self.oauth, 'client_cert', None)
-            response = getattr(requests, method)(uri, data=body, headers=headers, auth=self.oauth, cert=cert)
-
-            if response.status_code == 200:
-                if response.headers['content-type'] == 'application/pdf':
-                    return response.text
-                # parseString takes byte content, not unicode.
-                dom = parseString(response.text.encode(response.encoding))
-                if self.name in self.RAW_RESPONSE_ENTITIES:
-                  return dom
+    def to_columns(self, records):
+        """Convert a list of records into a ColumnTable.
+
+        Amount fields are stored as typed arrays. Nested collections
+        (e.g., the LineItems of an Invoice) are flattened into child
+        tables, keyed by the ID of the parent record.
+        """
+        return to_columns(records, key=self.singular + u'ID',
+                numeric=self.numeric_fields, collections=self.MULTI_LINES)
+
+    def _request(self, uri, method, body, headers, stream=False, priority='normal', deadline=None):
+        "Send a request to Xero, using the response cache if there is one"
+        cache = self.cache
+        cacheable = cache is not None and method == 'get' and not stream
+        scope = u' '.join([self.credential_key, self.name])
+        if cacheable:
+            key = cache.make_key(self.credential_key, uri, headers)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+        dispatcher = self.dispatcher
+        if dispatcher is not None:
+            dispatcher.acquire(self.organisation_key, priority, deadline)
+        try:
+            response = self._send(uri, method, body, headers, stream, priority, scope)
+        finally:
+            if dispatcher is not None:
+                dispatcher.release(self.organisation_key)
+
+        if cache is not None and response.status_code == 200:
+            if cacheable:
+                cache.set(key, response, scope=scope)
+            elif method != 'get':
+                # The objects at this endpoint have changed
+                cache.invalidate(scope)
+        return response
+
+    def _send(self, uri, method, body, headers, stream, priority, scope):
+        "Send a request that has been admitted, recording its outcome"
+        breaker = self.breaker
+        if breaker is not None:
+            # Checked once the request has been admitted, so a request
+            # that is dropped from the queue doesn't hold a probe.
+            breaker.before(scope)
+        if self.budget is not None:
+            # The daily limit applies to the organisation, across APIs
+            try:
+                self.budget.spend(self.organisation_key, priority)
+            except Exception:
+                # The request won't be sent; give back any probe
+                if breaker is not None:
+                    breaker.cancel(scope)
+                raise
+
+        cert = getattr(self.oauth, 'client_cert', None)
+        limiter = self.limiter
+        token = limiter.acquire() if limiter is not None else None
+        try:
+            if self.transport is not None:
+                response = self.transport.request(method, uri, data=body, headers=headers,
+                        auth=self.oauth, cert=cert, stream=stream)
+            else:
+                response = getattr(requests, method)(uri, data=body, headers=headers, auth=self.oauth, cert=cert, stream=stream)
+        except Exception as e:
+            if limiter is not None:
+                limiter.release(token, succeeded=False)
+            if breaker is not None:
+                if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                    breaker.record(scope, failed=True)
                 else:
-                  data = self.convert_to_dict(self.walk_dom(dom))
-                  return self._get_results(data)
-
-            elif response.status_code == 400:
-                raise XeroBadRequest(response)
-
-            elif response.status_code == 401:
-                raise XeroUnauthorized(response)
-
-            elif response.status_code == 403:
-                raise XeroForbidden(response)
+                    breaker.cancel(scope)
+            raise
+        if breaker is not None:
+            # Only availability errors count as failures. Rate limiting
+            # and other server errors say nothing about whether the
+            # endpoint is working, so they aren't counted either way.
+            if unavailable(response):
+                breaker.record(scope, failed=True)
+            elif response.status_code >= 500:
+                breaker.cancel(scope)
+            else:
+                breaker.record(scope, failed=False)
+        if limiter is not None:
+            # 503 responses are rate limit and availability errors
+            limiter.release(token, overloaded=response.status_code == 503,
+                    succeeded=response.status_code < 500)
+        if self.budget is not None and daily_limit_exceeded(response):
+            # Xero has cut the organisation off for the day; stop every
+            # process sharing the budget from spending calls on it.
+            self.budget.exhaust(self.organisation_key)
+        return response
 
-            elif response.status_code == 404:
-                raise XeroNotFound(response)
+    def _get_data(self, func):
+        def wrapper(*args, **kwargs):
+            # Options that control how the response is decoded,
+            # rather than what is requested.
+            columnar = kwargs.pop('columnar', False)
+            stream = kwargs.pop('stream', False)
+            fields = kwargs.pop('fields', None)
+            priority = kwargs.pop('priority', 'normal')
+            deadline = kwargs.pop('deadline', None)
+            projection = self.get_projection(fields) if fields else None
 
-            elif response.status_code == 500:
-                raise XeroInternalError(response)
+            uri, method, body, headers = func(*args, **kwargs)
+            if self.single_flight is not None and method == 'get' and not stream:
+                # Calls with a different priority or deadline don't wait
+                # on each other's place in the queue.
+                key = (self.credential_key, uri, tuple(sorted((headers or {}).items())),
+                       columnar, repr(projection), self.records, self.numeric,
+                       self.numeric_fields, priority, deadline)
+                return self.single_flight.do(key, self._fetch, uri, method,
+                        body, headers, stream, columnar, projection, priority, deadline)
+            return self._fetch(uri, method, body, headers, stream, columnar, projection,
+                    priority, deadline)
 
-            elif response.status_code == 501:
-                raise XeroNotImplemented(response)
+        return wrapper
 
-            elif response.status_code == 503:
-                # Two 503 responses are possible. Rate limit errors
-                # return encoded content; offline errors don't.
-                # If you parse the response text and there's nothing
-                # encoded, it must be a not-available error.
-                payload = parse_qs(response.text)
-                if payload:
-                    raise XeroRateLimitExceeded(response, payload)
-                else:
-                    raise XeroNotAvailable(response)
+    def _fetch(self, uri, method, body, headers, stream, columnar, projection,
+            priority='normal', deadline=None):
+        "Make a request, and decode the response (or raise an exception)"
+        response = self._request(uri, method, body, headers, stream, priority, deadline)
+
+        if response.status_code == 200:
+            if response.headers['content-type'] == 'application/pdf':
+                return response.text
+            if columnar and self.name in self.RAW_RESPONSE_ENTITIES:
+                # Decode reports straight into columns, without
+                # building a DOM for the whole response.
+                if stream:
+                    response.raw.decode_content = True
+                    return ReportReader(response.raw)
+                return decode_report(response.text.encode(response.encoding))
+            # parseString takes byte content, not unicode.
+            dom = parseString(response.text.encode(response.encoding))
+            if self.name in self.RAW_RESPONSE_ENTITIES:
+              return dom
             else:
-                raise XeroExceptionUnknown(response)
-
-        return wrapper
+              if self.records and not columnar:
+                  return self._get_records(dom, projection)
+              if projection is not None:
+                  projection = {u'Response': {self.name: {self.singular: projection}}}
+              data = self.convert_to_dict(self.walk_dom(dom, projection))
+              if columnar:
+                  return self.to_columns(self._get_results(data))
+              return self._get_results(data)
+
+        elif response.status_code == 400:
+            raise XeroBadRequest(response)
+
+        elif response.status_code == 401:
+            raise XeroUnauthorized(response)
+
+        elif response.status_code == 403:
+            raise XeroForbidden(response)
+
+        elif response.status_code == 404:
+            raise XeroNotFound(response)
+
+        elif response.status_code == 500:
+            raise XeroInternalError(response)
+
+        elif response.status_code == 501:
+            raise XeroNotImplemented(response)
+
+        elif response.status_code == 503:
+            # Two 503 responses are possible. Rate limit errors
+            # return encoded content; offline errors don't.
+            # If you parse the response text and there's nothing
+            # encoded, it must be a not-available error.
+            payload = parse_qs(response.text)
+            if payload:
+                raise XeroRateLimitExceeded(response, payload)
+            else:
+                raise XeroNotAvailable(response)
+        else:
+            raise XeroExceptionUnknown(response)
 
     def get(self, id, headers=None):
         uri = '/'.join([self.api_url, self.name, id])
         return uri, 'get', None, headers
 
-    def save_or_put(self, data, method='post', headers=None):
+    def save_or_put(self, data, method='post', headers=None, summarize_errors=True):
         uri = '/'.join([self.api_url, self.name])
+        if not summarize_errors:
+            # Save the valid objects, and report the validation errors
+            # of each invalid object alongside them.
+            uri += '?summarizeErrors=false'
         body = {'xml': self._prepare_data_for_save(data)}
         return uri, method, body, headers
 
-    def save(self, data):
-        return self.save_or_put(data, method='post')
-
-    def put(self, data):
-        return self.save_or_put(data, method='put')
+    def save(self, data, summarize_errors=True):
+        """Update (or create) one or more objects.
+
+        By default, if any object is invalid nothing is saved, and
+        XeroBadRequest is raised; its `problems` list the index of each
+        invalid object, with its validation messages. With
+        summarize_errors=False the valid objects are saved, and every
+        object is returned; invalid objects have `ValidationErrors`.
+        """
+        return self.save_or_put(data, method='post', summarize_errors=summarize_errors)
+
+    def put(self, data, summarize_errors=True):
+        "Create one or more objects; see save()"
+        return self.save_or_put(data, method='put', summarize_errors=summarize_errors)
+
+    def upsert_changed(self, records, baseline, batch_size=50, summarize_errors=True, hashes=None):
+        """Save only the records that differ from a last known remote state.
+
+        The baseline is a dictionary of remote objects keyed by ID, or
+        any iterable of remote objects (e.g., a snapshot). Each record
+        is compared with the remote object that has the same ID, using
+        a content hash of the fields the record provides; records that
+        match aren't sent, and changed records are trimmed to their ID
+        and the fields that changed. Records without a remote copy are
+        sent in full. Records are saved `batch_size` at a time.
+
+        `hashes` is a dictionary of content hashes for the baseline,
+        keyed by ID (see `content_hashes()`). Hashes that are missing
+        are computed and added to it, so a caller that keeps it only
+        hashes each remote object once. A hash taken over different
+        fields than a record provides doesn't match, and the record is
+        compared field by field instead.
+
+        Returns the saved objects.
+        """
+        key = self.singular + u'ID'
+        if not isinstance(baseline, dict):
+            baseline = dict((remote[key], remote) for remote in baseline)
+        if hashes is None:
+            hashes = {}
+
+        changes = []
+        for record in records:
+            record_id = record.get(key)
+            remote = baseline.get(record_id)
+            if remote is None:
+                changes.append(record)
+                continue
+            fields = list(record)
+            digest = content_hash(record, fields, self.MULTI_LINES)
+            if record_id not in hashes:
+                hashes[record_id] = content_hash(remote, fields, self.MULTI_LINES)
+            if digest == hashes[record_id]:
+                continue
+            changed = changed_fields(record, remote, self.MULTI_LINES)
+            if not changed:
+                hashes[record_id] = digest
+                continue
+            trimmed = dict((field, record[field]) for field in changed)
+            trimmed[key] = record[key]
+            changes.append(trimmed)
+
+        saved = []
+        for start in range(0, len(changes), batch_size):
+            saved.extend(as_list(self.save(changes[start:start + batch_size],
+                    summarize_errors=summarize_errors)))
+        return saved
+
+    def content_hashes(self, baseline, fields):
+        """Content hashes of a baseline, keyed by ID, for `upsert_changed()`.
+
+        `fields` are the fields the records being saved will provide.
+        """
+        key = self.singular + u'ID'
+        if isinstance(baseline, dict):
+            baseline = baseline.values()
+        return dict(
+            (remote[key], content_hash(remote, fields, self.MULTI_LINES))
+            for remote in baseline
+        )
 
     def prepare_filtering_date(self, val):
         if isinstance(val, datetime):
@@ -246,72 +767,71 @@ class Manager(object):
             val = '"%s"' % val
         return {'If-Modified-Since': val}
 
-    def filter(self, **kwargs):
+    def filter(self, *queries, **kwargs):
+        """Retrieve the objects that match a set of conditions.
+
+        Conditions can be keyword arguments (Name__contains='John'), or
+        Q objects (see xero.query). Keyword conditions are compiled
+        once for each set of field names, and reused.
+        """
         headers = None
-        offset = None        
+        offset = None
         page = None
         order = None
         uri = '/'.join([self.api_url, self.name])
-        if kwargs:
-            if 'since' in kwargs:
-                val = kwargs['since']
-                headers = self.prepare_filtering_date(val)
-                del kwargs['since']
-                
-            if 'offset' in kwargs:
-                offset = kwargs.pop('offset')
-            
-            if 'page' in kwargs:
-                page = kwargs.pop('page')
+        if 'since' in kwargs:
+            val = kwargs['since']
+            headers = self.prepare_filtering_date(val)
+            del kwargs['since']
 
-            if 'order' in kwargs:
-                order = kwargs.pop('order')
+        if 'offset' in kwargs:
+            offset = kwargs.pop('offset')
 
-            def get_filter_params():
-                if key in self.BOOLEAN_FIELDS:
-                    return 'true' if kwargs[key] else 'false'
-                elif key in self.DATETIME_FIELDS:
-                    return kwargs[key].isoformat()
-                else:
-                    return '"%s"' % str(kwargs[key])
+        if 'page' in kwargs:
+            page = kwargs.pop('page')
 
-            def generate_param(key):
-                parts = key.split("__")
-                field = key.replace('_', '.')
-                fmt = '%s==%s'
-                if len(parts) == 2:
-                    # support filters:
-                    # Name__Contains=John becomes Name.Contains("John")
-                    if parts[1] in ["contains", "startswith", "endswith"]:
-                        field = parts[0]
-                        fmt = ''.join(['%s.', parts[1], '(%s)'])
+        if 'order' in kwargs:
+            order = kwargs.pop('order')
 
-                return fmt % (
-                    field,
-                    get_filter_params()
-                )
+        clauses = []
+        for query in queries:
+            clauses.append(query.compile(self).render(getattr(query, 'values', None)))
+        if kwargs:
+            names = tuple(sorted(kwargs))
+            query = self._filter_queries.get(names)
+            if query is None:
+                query = self._filter_queries[names] = Q(**dict((name, P(name)) for name in names))
+            clauses.append(query.compile(self).render(kwargs))
 
-            query_string_items = []
+        query_string_items = []
 
-            params = [generate_param(key) for key in kwargs.keys()]
-            if params:
-                query_string_items.append('where=' + urllib.quote('&&'.join(params)))
-                
-            if offset:
-                query_string_items.append('offset={0}'.format(offset))
+        if clauses:
+            if len(clauses) > 1:
+                clauses = [u'%28' + clause + u'%29' for clause in clauses]
+            query_string_items.append('where=' + u'%26%26'.join(clauses))
 
-            if page:
-                query_string_items.append('page={0}'.format(page))
+        if offset:
+            query_string_items.append('offset={0}'.format(offset))
 
-            if order:
-                query_string_items.append('order={0}'.format(order))
+        if page:
+            query_string_items.append('page={0}'.format(page))
 
-            if len(query_string_items) > 0:
-                uri += "?" + '&'.join(query_string_items)
+        if order:
+            query_string_items.append('order={0}'.format(order))
+
+        if len(query_string_items) > 0:
+            uri += "?" + '&'.join(query_string_items)
 
         return uri, 'get', None, headers
-        
+
     def report_filter(self, id, headers=None, **kwargs):
+        """Retrieve a report.
+
+        By default the raw DOM of the response is returned. Pass
+        columnar=True to get a ReportTable instead; adding stream=True
+        returns a ReportReader that yields the rows as they are
+        downloaded.
+        """
         uri = '/'.join([self.api_url, self.name, id])
         if kwargs:
             if 'since' in kwargs:
@@ -344,3 +864,52 @@ class Manager(object):
     def all(self):
         uri = '/'.join([self.api_url, self.name])
         return uri, 'get', None, None
+
+    def pages(self, *queries, **kwargs):
+        """Retrieve every matching object, a page at a time.
+
+        Yields (position, results) for each page, where position is the
+        `page` or `offset` argument that will retrieve the next page.
+        Passing that position back in resumes iteration from the
+        following page. Endpoints that aren't paged produce a single
+        page, with a position of None.
+
+        Objects from endpoints paged by offset always include the field
+        the offset is taken from, even if `fields` leaves it out.
+        """
+        if self.name in self.OFFSET_ENTITIES:
+            field = self.OFFSET_ENTITIES[self.name]
+            key, position = 'offset', kwargs.pop('offset', 0)
+            fields = kwargs.get('fields')
+            if fields is not None and field not in fields:
+                # The offset of the next page is read from each object
+                kwargs['fields'] = list(fields) + [field]
+        elif self.name in self.PAGED_ENTITIES:
+            key, position = 'page', kwargs.pop('page', 1)
+        else:
+            yield None, as_list(self.filter(*queries, **kwargs))
+            return
+
+        while True:
+            kwargs[key] = position
+            results = as_list(self.filter(*queries, **kwargs))
+            if not results:
+                return
+
+            if key == 'offset':
+                position = max(int(result[field]) for result in results)
+            else:
+                position += 1
+            yield position, results
+
+            if len(results) < self.PAGE_SIZE:
+                return
+
+    def iter(self, *queries, **kwargs):
+        """Iterate over every matching object, retrieving pages as needed.
+
+        Accepts the same arguments as filter().
+        """
+        for position, results in self.pages(*queries, **kwargs):
+            for result in results:
+                yield result
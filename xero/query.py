@@ -0,0 +1,196 @@
+from datetime import date, datetime
+from decimal import Decimal
+import urllib
+
+
+class P(object):
+    """A named parameter in a query, provided when the query is used.
+
+        >>> by_contact = Q(Contact_ContactID=P('contact'), Status='AUTHORISED')
+        >>> xero.invoices.filter(by_contact.bind(contact=contact_id))
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'P(%r)' % self.name
+
+
+def _quote(text):
+    return urllib.quote(text.encode('utf-8')).decode('ascii')
+
+
+def _string(value):
+    value = value if isinstance(value, unicode) else str(value).decode('utf-8')
+    return u'"%s"' % value.replace(u'\\', u'\\\\').replace(u'"', u'\\"')
+
+
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+
+
+def format_value(manager, field, value, lookup=None):
+    """Format a value for comparison with a field in a where clause.
+
+    Equality and string lookups format values exactly as filter()
+    always has: booleans for boolean fields, ISO dates for timestamp
+    fields, and everything else as a string. The other lookups compare
+    dates using DateTime(), and range lookups compare numbers as
+    numbers.
+    """
+    if lookup not in RANGE_LOOKUPS and lookup != 'ne':
+        if field in manager.BOOLEAN_FIELDS:
+            return u'true' if value else u'false'
+        if field in manager.DATETIME_FIELDS and isinstance(value, date):
+            return value.isoformat()
+        return _string(value)
+
+    if field in manager.BOOLEAN_FIELDS or isinstance(value, bool):
+        return u'true' if value else u'false'
+    if isinstance(value, datetime):
+        return u'DateTime(%d,%02d,%02d,%02d,%02d,%02d)' % (
+            value.year, value.month, value.day, value.hour, value.minute, value.second)
+    if isinstance(value, date):
+        return u'DateTime(%d,%02d,%02d)' % (value.year, value.month, value.day)
+    if lookup in RANGE_LOOKUPS and isinstance(value, (int, long, float, Decimal)):
+        return unicode(value)
+    return _string(value)
+
+
+class CompiledQuery(object):
+    """A where clause, URL encoded, with slots for its parameters.
+
+    Rendering a compiled query only formats and encodes the parameter
+    values; everything else was encoded when the query was compiled.
+    """
+    def __init__(self, manager, parts):
+        # The Manager class, which determines how fields are formatted
+        self.manager = manager
+        self.parts = parts
+        self.params = [part[0] for part in parts if not isinstance(part, unicode)]
+
+    def render(self, values=None):
+        "The URL encoded where clause, with the parameters filled in"
+        if not self.params:
+            return u''.join(self.parts)
+        missing = [name for name in self.params if name not in (values or {})]
+        if missing:
+            raise KeyError('No value provided for query parameters: %s' % ', '.join(missing))
+        return u''.join(
+            part if isinstance(part, unicode)
+            else _quote(format_value(self.manager, part[1], values[part[0]], part[2]))
+            for part in self.parts
+        )
+
+
+class Q(object):
+    """A condition for filter(), which can be combined with & and |.
+
+    Keyword arguments use the same names as filter(): an underscore
+    separates the fields of nested objects (Contact_Name), and a double
+    underscore adds a lookup (Name__contains, Date__gte). Values can
+    be P() parameters, provided when the query is used.
+
+        >>> overdue = Q(Status='AUTHORISED') & Q(DueDate__lt=P('today'))
+        >>> xero.invoices.filter(overdue.bind(today=date.today()))
+        >>> xero.contacts.filter(Q(Name__startswith='John') | Q(Name__startswith='Jon'))
+
+    The query is compiled once per kind of Manager, and reused.
+    """
+    LOOKUPS = {
+        None: u'%s==%s',
+        'ne': u'%s!=%s',
+        'gt': u'%s>%s',
+        'gte': u'%s>=%s',
+        'lt': u'%s<%s',
+        'lte': u'%s<=%s',
+        'contains': u'%s.contains(%s)',
+        'startswith': u'%s.startswith(%s)',
+        'endswith': u'%s.endswith(%s)',
+    }
+
+    def __init__(self, *children, **conditions):
+        self.connector = u'&&'
+        self.negated = False
+        self.children = list(children) + [
+            (key, conditions[key]) for key in sorted(conditions)
+        ]
+        self._compiled = {}
+
+    def _combine(self, other, connector):
+        if not isinstance(other, Q):
+            raise TypeError(other)
+        q = Q(self, other)
+        q.connector = connector
+        return q
+
+    def __and__(self, other):
+        return self._combine(other, u'&&')
+
+    def __or__(self, other):
+        return self._combine(other, u'||')
+
+    def __invert__(self):
+        q = Q(self)
+        q.negated = True
+        return q
+
+    def _parts(self, manager, parts, nested=False):
+        compound = (nested and len(self.children) > 1) or self.negated
+        if self.negated:
+            parts.append(_quote(u'!'))
+        if compound:
+            parts.append(_quote(u'('))
+        for i, child in enumerate(self.children):
+            if i:
+                parts.append(_quote(self.connector))
+            if isinstance(child, Q):
+                child._parts(manager, parts, nested=True)
+                continue
+
+            key, value = child
+            field, _, lookup = key.partition('__')
+            lookup = lookup or None
+            if lookup not in self.LOOKUPS:
+                raise ValueError('Unknown lookup: %s' % key)
+            field = field.replace('_', '.')
+            template = self.LOOKUPS[lookup]
+            before, between, after = template.split(u'%s')
+            parts.append(_quote(before + field + between))
+            if isinstance(value, P):
+                parts.append((value.name, field, lookup))
+            else:
+                parts.append(_quote(format_value(manager, field, value, lookup)))
+            if after:
+                parts.append(_quote(after))
+        if compound:
+            parts.append(_quote(u')'))
+        return parts
+
+    def compile(self, manager):
+        "Compile the query for use with a Manager"
+        kind = type(manager)
+        compiled = self._compiled.get(kind)
+        if compiled is None:
+            parts = []
+            # Join adjacent literal parts, leaving only the slots
+            for part in self._parts(kind, []):
+                if isinstance(part, unicode) and parts and isinstance(parts[-1], unicode):
+                    parts[-1] += part
+                else:
+                    parts.append(part)
+            compiled = self._compiled[kind] = CompiledQuery(kind, parts)
+        return compiled
+
+    def bind(self, **values):
+        "Provide values for the query's parameters"
+        return BoundQuery(self, values)
+
+
+class BoundQuery(object):
+    "A query with values for its parameters"
+    def __init__(self, query, values):
+        self.query = query
+        self.values = values
+
+    def compile(self, manager):
+        return self.query.compile(manager)
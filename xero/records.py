@@ -0,0 +1,125 @@
+class LazyField(object):
+    """A record attribute that is converted the first time it is read.
+
+    The raw value (the text of a field, or the walked DOM of a nested
+    element) is stored in a slot; on first access it is converted, and
+    the converted value replaces the raw value in the slot.
+    """
+    def __init__(self, name, slot, bit, convert):
+        self.name = name
+        self.slot = slot
+        self.bit = bit
+        self.convert = convert
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj, cls)
+        if not obj._decoded & self.bit:
+            value = self.convert(self.name, value)
+            self.slot.__set__(obj, value)
+            obj._decoded |= self.bit
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+        obj._decoded |= self.bit
+
+    def __delete__(self, obj):
+        self.slot.__delete__(obj)
+
+
+class Record(object):
+    """A compact, read-mostly representation of a Xero object.
+
+    Subclasses are generated for each entity by `record_class`. Fields
+    are available as attributes (`invoice.Total`) or by key
+    (`invoice['Total']`); `to_dict()` returns the same dictionary that
+    would have been returned without record mode.
+    """
+    __slots__ = ('_decoded',)
+
+    # The fields of the record, and the slot that stores each field.
+    _fields = ()
+    _slots = {}
+
+    def __init__(self, **kwargs):
+        self._decoded = 0
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def _has(self, key):
+        slot = self._slots.get(key)
+        return slot is not None and hasattr(self, slot)
+
+    def __getitem__(self, key):
+        if not self._has(key):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._slots:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return self._has(key)
+
+    def get(self, key, default=None):
+        if self._has(key):
+            return getattr(self, key)
+        return default
+
+    def keys(self):
+        return [key for key in self._fields if self._has(key)]
+
+    def to_dict(self):
+        "Convert the record (decoding every field) into a dictionary"
+        return dict((key, getattr(self, key)) for key in self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.to_dict())
+
+
+def record_class(name, fields, lazy, convert):
+    """Generate a Record subclass with a slot for each field.
+
+    Fields named in `lazy` are stored raw and decoded on first access
+    by calling `convert(field, raw value)`; all other fields are plain
+    slots.
+    """
+    slots = {}
+    for field in fields:
+        slots[field] = '_' + field if field in lazy else field
+
+    cls = type(str(name), (Record,), {
+        '__slots__': tuple(str(slot) for slot in slots.values()),
+        '_fields': tuple(fields),
+        '_slots': slots,
+    })
+
+    for bit, field in enumerate(field for field in fields if field in lazy):
+        slot = getattr(cls, slots[field])
+        setattr(cls, field, LazyField(field, slot, 1 << bit, convert))
+    return cls
+
+
+def make_record(cls, values):
+    """Construct a record from raw field values, bypassing __init__.
+
+    Lazy fields are left undecoded until they are read.
+    """
+    record = cls.__new__(cls)
+    record._decoded = 0
+    slots = cls._slots
+    for key, value in values:
+        object.__setattr__(record, slots[key], value)
+    return record
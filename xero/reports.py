@@ -0,0 +1,186 @@
+from array import array
+from collections import namedtuple
+from io import BytesIO
+from xml.etree.cElementTree import iterparse
+
+from .columnar import numpy_column
+
+
+ReportRow = namedtuple('ReportRow', ['section', 'row_type', 'cells', 'attributes'])
+
+REPORT_FIELDS = (u'ReportID', u'ReportName', u'ReportType', u'ReportDate',
+        u'UpdatedDateUTC')
+
+
+class ReportReader(object):
+    """Incrementally decodes a Xero report into rows.
+
+    The source is either the raw XML content, or a file-like object
+    (such as the raw stream of a response). Each row's elements are
+    removed from the tree as soon as it has been read, so memory use
+    doesn't grow with the size of the report.
+
+    Iterating over the reader yields a ReportRow for every Row and
+    SummaryRow. The column names from the Header row are stored on
+    `header`, and the report details (ReportID, ReportName, titles etc)
+    are stored on `report` as they are encountered.
+    """
+    def __init__(self, source):
+        if isinstance(source, basestring):
+            source = BytesIO(source)
+        self.source = source
+        self.header = None
+        self.report = {u'ReportTitles': []}
+        # The root element of the tree built so far
+        self.root = None
+
+    def __iter__(self):
+        # The open elements, from the root down
+        path = []
+        rows = []
+        section = None
+
+        for event, elem in iterparse(self.source, events=('start', 'end')):
+            if event == 'start':
+                if self.root is None:
+                    self.root = elem
+                path.append(elem)
+                if elem.tag == 'Row':
+                    rows.append({'type': None, 'cells': [], 'attributes': {}})
+                continue
+
+            path.pop()
+            tag = elem.tag
+            parent = path[-1].tag if path else None
+
+            if tag == 'RowType' and parent == 'Row':
+                rows[-1]['type'] = elem.text
+
+            elif tag == 'Title' and parent == 'Row':
+                section = elem.text or u''
+
+            elif tag == 'Cell':
+                row = rows[-1]
+                row['cells'].append(elem.findtext('Value') or u'')
+                for attribute in elem.findall('Attributes/Attribute'):
+                    row['attributes'][attribute.findtext('Id')] = attribute.findtext('Value')
+                elem.clear()
+
+            elif tag == 'Row':
+                row = rows.pop()
+                if row['type'] == 'Section':
+                    section = None
+                elif row['type'] == 'Header':
+                    self.header = row['cells']
+                else:
+                    yield ReportRow(section, row['type'], row['cells'], row['attributes'])
+                # Detach the row, so the tree doesn't keep an (empty)
+                # element for every row that has been read.
+                elem.clear()
+                path[-1].remove(elem)
+
+            elif tag == 'ReportTitle':
+                self.report[u'ReportTitles'].append(elem.text)
+
+            elif tag in REPORT_FIELDS and parent == 'Report':
+                self.report[tag] = elem.text
+
+
+class ReportTable(object):
+    """A columnar representation of a Xero report.
+
+    Each column is stored separately. Columns where every value is
+    numeric are stored as `array('d')` (blank cells become NaN); any
+    other column is kept as a list of strings.
+
+    Alongside the columns, the table records the type of every row
+    (Row or SummaryRow), the cell attributes of every row (such as the
+    account ID), and the range of rows that belongs to each section.
+    """
+    def __init__(self, header=None, report=None):
+        self.header = list(header or [])
+        self.report = report or {}
+        self.columns = [array('d') for name in self.header]
+        # The original text of each numeric column's cells, so a column
+        # that turns out not to be numeric keeps its values exactly.
+        self._texts = [[] for name in self.header]
+        self.row_types = []
+        self.attributes = []
+        self.sections = []
+
+    def __len__(self):
+        return len(self.row_types)
+
+    @classmethod
+    def from_reader(cls, reader):
+        "Build a table by consuming all the rows of a ReportReader"
+        table = None
+        for row in reader:
+            if table is None:
+                table = cls(reader.header, reader.report)
+            table.append(row)
+        if table is None:
+            table = cls(reader.header, reader.report)
+        return table
+
+    def append(self, row):
+        "Add a single ReportRow to the end of the table"
+        index = len(self.row_types)
+        # Rows without a header (or with more cells than the header)
+        # grow the table with unnamed, blank-filled columns.
+        while len(self.columns) < len(row.cells):
+            self.header.append(u'')
+            self.columns.append(array('d', [float('nan')] * index))
+            self._texts.append([u''] * index)
+
+        for position, column in enumerate(self.columns):
+            value = row.cells[position] if position < len(row.cells) else u''
+            if isinstance(column, array):
+                try:
+                    column.append(float(value) if value else float('nan'))
+                    self._texts[position].append(value)
+                    continue
+                except ValueError:
+                    # The column turned out not to be numeric.
+                    column = self.columns[position] = self._texts[position]
+                    self._texts[position] = None
+            column.append(value)
+
+        self.row_types.append(row.row_type)
+        self.attributes.append(row.attributes)
+
+        if self.sections and self.sections[-1][0] == row.section and self.sections[-1][2] == index:
+            title, start, stop = self.sections[-1]
+            self.sections[-1] = (title, start, index + 1)
+        else:
+            self.sections.append((row.section, index, index + 1))
+
+    def column(self, key, as_numpy=False):
+        """Retrieve a column by name or position.
+
+        Numeric columns can be returned as a NumPy array (sharing memory
+        with the underlying array) by passing as_numpy=True.
+        """
+        if not isinstance(key, int):
+            key = self.header.index(key)
+        column = self.columns[key]
+        if as_numpy:
+            return numpy_column(column)
+        return column
+
+    def section(self, title):
+        "Return the (start, stop) row range of the first section with the given title"
+        for name, start, stop in self.sections:
+            if name == title:
+                return start, stop
+        raise KeyError(title)
+
+    def rows(self):
+        "Iterate over the table row by row, as tuples of cell values"
+        for index in range(len(self.row_types)):
+            yield tuple(column[index] for column in self.columns)
+
+
+def decode_report(source):
+    "Decode a Xero report response into a ReportTable"
+    return ReportTable.from_reader(ReportReader(source))
@@ -0,0 +1,364 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import izip
+import marshal
+import mmap
+import os
+import struct
+
+from dateutil.tz import tzoffset
+
+MAGIC = b'XSNP'
+VERSION = 1
+FOOTER = struct.Struct('<Q4s')
+
+
+def _microseconds(value):
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+def _datetime(ordinal, microseconds):
+    return datetime.fromordinal(ordinal) + timedelta(microseconds=microseconds)
+
+
+class _Encoder(object):
+    def __init__(self):
+        self.strings = []
+        self.string_index = {}
+
+    def intern(self, value):
+        index = self.string_index.get(value)
+        if index is None:
+            index = self.string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def value(self, value):
+        "Encode a single value of any type"
+        kind = type(value)
+        if value is None or kind in (bool, int, long, float):
+            return value
+        if kind is unicode:
+            return ('s', self.intern(value))
+        if kind is str:
+            return ('b', value)
+        if kind is Decimal:
+            return ('c', self.intern(unicode(value)))
+        if kind is date:
+            return ('d', value.toordinal())
+        if kind is datetime:
+            offset = value.utcoffset()
+            if offset is not None:
+                offset = offset.days * 86400 + offset.seconds
+            return ('m', value.toordinal(), _microseconds(value), offset)
+        if kind in (list, tuple):
+            return ('l' if kind is list else 't', [self.value(item) for item in value])
+        if isinstance(value, dict) or hasattr(value, 'to_dict'):
+            if not isinstance(value, dict):
+                value = value.to_dict()
+            keys = list(value)
+            return ('o', [self.intern(key) for key in keys], [self.value(value[key]) for key in keys])
+        raise TypeError("Can't store %r in a snapshot" % value)
+
+    def column(self, values):
+        "Encode a list of values as the most compact column type"
+        kinds = set(type(value) for value in values)
+        if len(kinds) == 1:
+            kind = kinds.pop()
+            if kind is unicode:
+                return ('S', [self.intern(value) for value in values])
+            if kind is Decimal:
+                return ('C', [self.intern(unicode(value)) for value in values])
+            if kind is date:
+                return ('D', [value.toordinal() for value in values])
+            if kind is datetime and all(value.tzinfo is None for value in values):
+                return ('M', [value.toordinal() for value in values], [_microseconds(value) for value in values])
+            if kind in (bool, int, long, float):
+                return ('N', values)
+            if kind is dict or hasattr(kind, 'to_dict'):
+                return ('R', self.table(values))
+            if kind is list and all(type(item) is dict for value in values for item in value):
+                items = [item for value in values for item in value]
+                return ('T', [len(value) for value in values], self.table(items))
+        return ('X', [self.value(value) for value in values])
+
+    def table(self, records):
+        "Encode a list of records, grouping them by shape"
+        shape_index = {}
+        shapes = []
+        shape_of = []
+        for record in records:
+            if not isinstance(record, dict):
+                record = record.to_dict()
+            keys = tuple(record)
+            index = shape_index.get(keys)
+            if index is None:
+                index = shape_index[keys] = len(shapes)
+                shapes.append((keys, []))
+            shapes[index][1].append(record)
+            shape_of.append(index)
+
+        encoded = []
+        for keys, rows in shapes:
+            encoded.append((
+                [self.intern(key) for key in keys],
+                [self.column([row[key] for row in rows]) for key in keys],
+            ))
+        return (shape_of, encoded)
+
+
+class _Decoder(object):
+    def __init__(self, strings):
+        self.strings = strings
+        self.decimals = {}
+
+    def decimal(self, index):
+        # Each distinct amount is only converted once per snapshot
+        try:
+            return self.decimals[index]
+        except KeyError:
+            result = self.decimals[index] = Decimal(self.strings[index])
+            return result
+
+    def value(self, value):
+        if type(value) is not tuple:
+            return value
+        tag = value[0]
+        strings = self.strings
+        if tag == 's':
+            return strings[value[1]]
+        if tag == 'b':
+            return value[1]
+        if tag == 'c':
+            return self.decimal(value[1])
+        if tag == 'd':
+            return date.fromordinal(value[1])
+        if tag == 'm':
+            result = _datetime(value[1], value[2])
+            if value[3] is not None:
+                result = result.replace(tzinfo=tzoffset(None, value[3]))
+            return result
+        if tag == 'l':
+            return [self.value(item) for item in value[1]]
+        if tag == 't':
+            return tuple(self.value(item) for item in value[1])
+        if tag == 'o':
+            return dict(zip([strings[key] for key in value[1]], [self.value(item) for item in value[2]]))
+        raise ValueError("Unknown snapshot value: %r" % (value,))
+
+    def column(self, column):
+        kind = column[0]
+        strings = self.strings
+        if kind == 'S':
+            return [strings[index] for index in column[1]]
+        if kind == 'C':
+            decimals = self.decimals
+            return [
+                decimals[index] if index in decimals else self.decimal(index)
+                for index in column[1]
+            ]
+        if kind == 'D':
+            return map(date.fromordinal, column[1])
+        if kind == 'M':
+            return map(_datetime, column[1], column[2])
+        if kind == 'N':
+            return column[1]
+        if kind == 'R':
+            return self.table(column[1])
+        if kind == 'T':
+            items = self.table(column[2])
+            values = []
+            start = 0
+            for length in column[1]:
+                values.append(items[start:start + length])
+                start += length
+            return values
+        return [self.value(value) for value in column[1]]
+
+    def table(self, table):
+        return _Chunk(self, table).records()
+
+
+class _Chunk(object):
+    """The encoded records of one chunk (or child table).
+
+    Each column is decoded the first time it is needed, so reading one
+    field of every record doesn't decode the others.
+    """
+    def __init__(self, decoder, table):
+        self.decoder = decoder
+        self.shape_of, shapes = table
+        self.shapes = [
+            ([decoder.strings[key] for key in keys], columns)
+            for keys, columns in shapes
+        ]
+        self.decoded = {}
+
+    def _column(self, shape, position):
+        try:
+            return self.decoded[shape, position]
+        except KeyError:
+            values = self.decoded[shape, position] = self.decoder.column(self.shapes[shape][1][position])
+            return values
+
+    def column(self, key, default=None):
+        "The values of a key, for every record (`default` where it's missing)"
+        shape_values = []
+        for shape, (keys, columns) in enumerate(self.shapes):
+            if key in keys:
+                shape_values.append(iter(self._column(shape, keys.index(key))))
+            else:
+                shape_values.append(None)
+        return [
+            default if shape_values[shape] is None else next(shape_values[shape])
+            for shape in self.shape_of
+        ]
+
+    def records(self):
+        rows = []
+        for shape, (keys, columns) in enumerate(self.shapes):
+            values = [self._column(shape, position) for position in range(len(keys))]
+            rows.append(iter([
+                dict(izip(keys, row)) for row in izip(*values)
+            ] if keys else [{} for index in self.shape_of]))
+        return [next(rows[shape]) for shape in self.shape_of]
+
+
+def dump(records, path, chunk_size=10000):
+    """Write a list (or any iterable) of records to a snapshot file.
+
+    Every string (keys and values) is stored once, in a string table
+    shared by the whole file. Records are encoded `chunk_size` at a
+    time; within a chunk, records with the same keys share a "shape",
+    and the values of each key are stored together as a column. Dates,
+    datetimes, booleans and amounts are stored as numbers, and nested
+    objects and collections as child tables. Each chunk is encoded with
+    marshal, so most of the work of decoding a chunk is done in C.
+    """
+    encoder = _Encoder()
+    chunks = []
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<B', VERSION))
+
+        def write_chunk(chunk):
+            data = marshal.dumps(encoder.table(chunk))
+            chunks.append((f.tell(), len(data), len(chunk)))
+            f.write(data)
+
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                write_chunk(chunk)
+                chunk = []
+        if chunk:
+            write_chunk(chunk)
+
+        trailer_offset = f.tell()
+        f.write(marshal.dumps((encoder.strings, chunks)))
+        f.write(FOOTER.pack(trailer_offset, MAGIC))
+
+
+class Snapshot(object):
+    """A memory mapped snapshot file.
+
+    The string table and chunk index are read when the snapshot is
+    opened; records are decoded a chunk at a time, as they are needed,
+    so large snapshots can be iterated without loading every record.
+    Within a chunk, each column is decoded when it's first read, so
+    `column()` only decodes the key it's asked for.
+
+    Usage:
+
+        >>> from xero import snapshot
+        >>> snapshot.dump(xero.invoices.all(), 'invoices.snap')
+
+        >>> with snapshot.Snapshot('invoices.snap') as invoices:
+        ...     for invoice in invoices:
+        ...         process(invoice)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size < len(MAGIC) + 1 + FOOTER.size:
+                raise ValueError("%s is not a snapshot file (only %d bytes)" % (path, size))
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+
+        magic, version = self.map[:len(MAGIC)], struct.unpack('<B', self.map[len(MAGIC)])[0]
+        trailer_offset, footer_magic = FOOTER.unpack(self.map[-FOOTER.size:])
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("%s is not a snapshot file" % path)
+        if version != VERSION:
+            self.close()
+            raise ValueError("%s is a version %d snapshot; only version %d can be read" % (path, version, VERSION))
+        if footer_magic != MAGIC or not len(MAGIC) < trailer_offset < size - FOOTER.size:
+            self.close()
+            raise ValueError("%s is truncated or damaged (its footer is missing)" % path)
+
+        strings, self.chunks = marshal.loads(self.map[trailer_offset:-FOOTER.size])
+        self.decoder = _Decoder(strings)
+        self.length = sum(count for offset, size, count in self.chunks)
+        self._cached = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.length
+
+    def _chunk(self, index):
+        # The chunk is unmarshalled when it's first used, and its
+        # columns as they are read.
+        if self._cached[0] != index:
+            offset, size, count = self.chunks[index]
+            self._cached = (index, _Chunk(self.decoder, marshal.loads(self.map[offset:offset + size])))
+        return self._cached[1]
+
+    def chunk(self, index):
+        "Decode all the records in a single chunk"
+        return self._chunk(index).records()
+
+    def column(self, key, default=None):
+        """The values of a single key, for every record.
+
+        Only that key's columns are decoded. Records that don't have
+        the key give `default`.
+        """
+        values = []
+        for index in range(len(self.chunks)):
+            values.extend(self._chunk(index).column(key, default))
+        return values
+
+    def __iter__(self):
+        for index in range(len(self.chunks)):
+            for record in self.chunk(index):
+                yield record
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError(position)
+        for index, (offset, size, count) in enumerate(self.chunks):
+            if position < count:
+                return self.chunk(index)[position]
+            position -= count
+
+
+def load(path):
+    "Read every record from a snapshot file"
+    with Snapshot(path) as snapshot:
+        return list(snapshot)
@@ -0,0 +1,138 @@
+import heapq
+import json
+import os
+from Queue import Empty, Queue
+import tempfile
+import threading
+
+
+class Checkpoint(object):
+    """A position that is saved to a file, so it survives restarts.
+
+    The value can be anything that can be encoded as JSON. Saves are
+    atomic: the new value is written to a temporary file in the same
+    directory, flushed to disk, and then renamed over the old file, so
+    an interrupted save leaves the previous value intact.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, default=None):
+        "Return the saved value, or default if nothing has been saved"
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return default
+
+    def save(self, value):
+        "Atomically replace the saved value"
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.name == 'nt' and os.path.exists(self.path):
+                # Windows won't rename over an existing file.
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        "Forget the saved value"
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class JournalStream(object):
+    """Iterate over the journals of an organisation, one at a time.
+
+    Journals are retrieved in batches, walking the `offset` by
+    JournalNumber. After each batch has been consumed, the offset is
+    saved to the checkpoint (if one has been provided), so an
+    interrupted sync resumes from the last completed batch, rather
+    than from the start of the ledger.
+
+    Usage:
+
+        >>> stream = JournalStream(xero.journals, checkpoint='journals.offset')
+        >>> for journal in stream:
+        ...     process(journal)
+    """
+    def __init__(self, manager, checkpoint=None, offset=0):
+        if isinstance(checkpoint, basestring):
+            checkpoint = Checkpoint(checkpoint)
+        self.manager = manager
+        self.checkpoint = checkpoint
+        self.offset = offset
+        if checkpoint is not None:
+            self.offset = checkpoint.load(offset)
+
+    def __iter__(self):
+        for offset, journals in self.manager.pages(offset=self.offset):
+            for journal in journals:
+                yield journal
+
+            # The whole batch has been consumed; record our progress.
+            self.offset = offset
+            if self.checkpoint is not None:
+                self.checkpoint.save(offset)
+
+
+def _updated(record):
+    # Sort objects without a modification time before those with one
+    updated = record.get('UpdatedDateUTC')
+    return (0, None) if updated is None else (1, updated)
+
+
+def changes(managers, since, workers=4):
+    """Retrieve the objects modified since a time from several endpoints.
+
+    `managers` is a list of (name, manager) pairs. The endpoints are
+    queried concurrently, by up to `workers` threads; each endpoint's
+    results are sorted by UpdatedDateUTC, and the results are then
+    merged, yielding (name, object) pairs in modification order.
+
+    If any endpoint fails, the first error is raised once every request
+    has finished.
+    """
+    tasks = Queue()
+    for index, (name, manager) in enumerate(managers):
+        tasks.put((index, name, manager))
+
+    results = {}
+    errors = []
+
+    def work():
+        while True:
+            try:
+                index, name, manager = tasks.get_nowait()
+            except Empty:
+                return
+            try:
+                records = list(manager.iter(since=since))
+                records.sort(key=_updated)
+                results[index] = [
+                    (_updated(record), index, position, name, record)
+                    for position, record in enumerate(records)
+                ]
+            except Exception as e:
+                errors.append((index, e))
+
+    threads = [threading.Thread(target=work) for i in range(max(1, min(workers, tasks.qsize())))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise min(errors)[1]
+
+    for updated, index, position, name, record in heapq.merge(*[results[index] for index in sorted(results)]):
+        yield name, record
@@ -0,0 +1,267 @@
+from bisect import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+from .api import Xero
+from .budget import DailyBudget
+from .concurrency import AdaptiveLimiter
+from .exceptions import XeroBudgetExceeded
+
+
+def tenant_key(tenant):
+    "The key that identifies a tenant: its 'id', or the tenant itself"
+    if isinstance(tenant, dict):
+        return unicode(tenant['id'])
+    return unicode(tenant)
+
+
+class HashRing(object):
+    """Assign keys to nodes by consistent hashing.
+
+    Each node is placed on the ring `replicas` times. A key belongs to
+    the first node at or after the key's position, so adding or removing
+    a node only moves the keys next to that node's positions.
+    """
+    def __init__(self, nodes, replicas=100):
+        self.ring = sorted(
+            (self._hash(u'%s:%d' % (node, replica)), node)
+            for node in nodes for replica in range(replicas)
+        )
+        self.positions = [position for position, node in self.ring]
+
+    @staticmethod
+    def _hash(value):
+        return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:16], 16)
+
+    def node(self, key):
+        "The node a key is assigned to"
+        index = bisect(self.positions, self._hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+class StoreCheckpoint(object):
+    "A Checkpoint (see xero.streams) saved in a SyncStore"
+    def __init__(self, store, tenant, name):
+        self.store = store
+        self.tenant = tenant
+        self.name = name
+
+    def load(self, default=None):
+        return self.store.load_checkpoint(self.tenant, self.name, default)
+
+    def save(self, value):
+        self.store.save_checkpoint(self.tenant, self.name, value)
+
+    def clear(self):
+        self.store.clear_checkpoint(self.tenant, self.name)
+
+
+class SyncStore(object):
+    """Sync state shared by every worker process, in an SQLite database.
+
+    Holds each tenant's checkpoints, and the failures of each tenant's
+    last syncs, so that failing tenants can be backed off.
+    """
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self.connection as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS checkpoints ('
+                ' tenant TEXT, name TEXT, value TEXT, PRIMARY KEY (tenant, name))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS failures ('
+                ' tenant TEXT PRIMARY KEY, count INTEGER, error TEXT, retry_after REAL)'
+            )
+
+    @property
+    def connection(self):
+        # SQLite connections can't be shared between threads, or
+        # across a fork; open one per thread, per process.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def checkpoint(self, tenant, name):
+        "A checkpoint for one of a tenant's streams"
+        return StoreCheckpoint(self, tenant, name)
+
+    def load_checkpoint(self, tenant, name, default=None):
+        row = self.connection.execute(
+            'SELECT value FROM checkpoints WHERE tenant = ? AND name = ?', (tenant, name)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def save_checkpoint(self, tenant, name, value):
+        with self.connection as conn:
+            conn.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)',
+                    (tenant, name, json.dumps(value)))
+
+    def clear_checkpoint(self, tenant, name):
+        with self.connection as conn:
+            conn.execute('DELETE FROM checkpoints WHERE tenant = ? AND name = ?', (tenant, name))
+
+    def record_failure(self, tenant, error, backoff=60, max_backoff=3600):
+        """Record a failed sync; the tenant is skipped until its backoff expires.
+
+        The backoff doubles with each consecutive failure.
+        """
+        with self.connection as conn:
+            row = conn.execute('SELECT count FROM failures WHERE tenant = ?', (tenant,)).fetchone()
+            count = 1 if row is None else row[0] + 1
+            delay = min(max_backoff, backoff * 2 ** (count - 1))
+            conn.execute('INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?)',
+                    (tenant, count, error, time.time() + delay))
+
+    def record_success(self, tenant):
+        "Forget a tenant's failures"
+        with self.connection as conn:
+            conn.execute('DELETE FROM failures WHERE tenant = ?', (tenant,))
+
+    def failure(self, tenant):
+        "The (count, error, retry_after) of a tenant's failures, or None"
+        return self.connection.execute(
+            'SELECT count, error, retry_after FROM failures WHERE tenant = ?', (tenant,)
+        ).fetchone()
+
+
+class SyncResult(object):
+    "The outcome of syncing a single tenant"
+    def __init__(self, tenant, status, worker, calls=0, error=None):
+        self.tenant = tenant
+        self.status = status
+        self.worker = worker
+        self.calls = calls
+        self.error = error
+
+    def __repr__(self):
+        return '<SyncResult %s: %s>' % (self.tenant, self.status)
+
+
+class SyncRunner(object):
+    """Sync many organisations, sharded across worker processes.
+
+    Each tenant is assigned to one of `processes` shards by consistent
+    hashing of its key, so a tenant is always synced with the same
+    group of tenants (and moves as little as possible when the number
+    of shards changes). Each shard is synced, one tenant after another,
+    within a single process of a pool; which process runs a shard can
+    change from one run to the next. For each tenant, the shard
+    connects with its own Xero client and adaptive limiter, and calls:
+
+        job(xero, tenant, checkpoint)
+
+    where checkpoint(name) returns a checkpoint for one of the tenant's
+    streams, saved in the shared store (e.g., for a JournalStream).
+
+    `connect(tenant)` returns the credentials for a tenant. Both `job`
+    and `connect` are called in the worker processes, so they must be
+    module level functions.
+
+    With a `daily_budget`, each tenant's requests are counted against
+    a DailyBudget (see xero.budget) kept in the store's database, and
+    checked as each request is made; a job that uses up its tenant's
+    budget stops with the status 'over budget', and tenants with no
+    budget left are skipped. Tenants that are backing off after a
+    failure are also skipped. Failures are recorded in the store, with
+    an exponential backoff.
+
+    Usage:
+
+        >>> runner = SyncRunner(connect, job, 'sync.db', processes=8, daily_budget=4000)
+        >>> results = runner.run(tenants)
+    """
+    def __init__(self, connect, job, store_path, processes=None, daily_budget=None,
+            replicas=100, options=None):
+        self.connect = connect
+        self.job = job
+        self.store_path = store_path
+        self.processes = processes or multiprocessing.cpu_count()
+        self.daily_budget = daily_budget
+        self.ring = HashRing(range(self.processes), replicas)
+        self.options = options or {}
+        # Create the store's tables before any worker starts
+        SyncStore(store_path)
+
+    def shards(self, tenants):
+        "The tenants assigned to each worker"
+        shards = [[] for i in range(self.processes)]
+        for tenant in tenants:
+            shards[self.ring.node(tenant_key(tenant))].append(tenant)
+        return shards
+
+    def run(self, tenants):
+        "Sync every tenant once; returns a SyncResult for each tenant"
+        shards = [
+            (self, worker, shard) for worker, shard in enumerate(self.shards(tenants)) if shard
+        ]
+        if not shards:
+            return []
+        if self.processes == 1:
+            results = map(_run_shard, shards)
+        else:
+            pool = multiprocessing.Pool(min(self.processes, len(shards)))
+            try:
+                results = pool.map(_run_shard, shards)
+            finally:
+                pool.close()
+                pool.join()
+        return [result for shard in results for result in shard]
+
+    def sync_shard(self, worker, tenants):
+        "Sync a shard's tenants, one after another"
+        store = SyncStore(self.store_path)
+        options = dict(self.options)
+        budget = None
+        if self.daily_budget is not None:
+            # Sync jobs can use the whole budget
+            budget = options['budget'] = DailyBudget(self.store_path, limit=self.daily_budget,
+                    reserve=0, low_reserve=0)
+
+        results = []
+        for tenant in tenants:
+            key = tenant_key(tenant)
+
+            failure = store.failure(key)
+            if failure is not None and failure[2] > time.time():
+                results.append(SyncResult(key, 'backoff', worker, error=failure[1]))
+                continue
+
+            limiter = AdaptiveLimiter()
+            try:
+                xero = Xero(self.connect(tenant), limiter=limiter, **options)
+                if budget is not None and not budget.remaining(xero.contacts.organisation_key):
+                    results.append(SyncResult(key, 'over budget', worker))
+                    continue
+                self.job(xero, tenant, lambda name: store.checkpoint(key, name))
+            except XeroBudgetExceeded:
+                # Stopped part way; the job resumes from its checkpoints
+                # once there is budget again.
+                results.append(SyncResult(key, 'over budget', worker, limiter.requests))
+            except Exception as e:
+                store.record_failure(key, u'%s: %s' % (type(e).__name__, e))
+                results.append(SyncResult(key, 'failed', worker, limiter.requests,
+                        traceback.format_exc()))
+            else:
+                store.record_success(key)
+                results.append(SyncResult(key, 'ok', worker, limiter.requests))
+        return results
+
+
+def _run_shard(args):
+    # Runs in a worker process
+    runner, worker, tenants = args
+    return runner.sync_shard(worker, tenants)
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from Queue import Empty, Queue
+import threading
+
+from .exceptions import XeroBadRequest
+from .manager import as_list
+
+
+class TimesheetResult(object):
+    """The outcome of submitting one employee's timesheet for one period.
+
+    `status` is 'saved', 'invalid' (it failed validation, and wasn't
+    sent) or 'failed' (Xero rejected it, or the request failed); any
+    messages are in `errors`. Once saved, `timesheet` is the object
+    returned by Xero.
+    """
+    def __init__(self, employee_id, start_date, end_date):
+        self.employee_id = employee_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.status = None
+        self.errors = []
+        self.timesheet = None
+
+    def __repr__(self):
+        return '<TimesheetResult %s %s: %s>' % (self.employee_id, self.start_date, self.status)
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def _datetime(value):
+    return datetime.combine(value, time()).isoformat()
+
+
+class TimesheetPipeline(object):
+    """Submit timesheets for many employees in bulk.
+
+    Takes a stream of timesheet lines: dictionaries with an EmployeeID,
+    a Date, an earnings rate (EarningsRateID, or EarningsRate by name),
+    the NumberOfUnits worked that day, and optionally a TrackingItemID.
+    Lines are grouped into a timesheet for each employee and pay period
+    (periods are `period_days` long, counting from `period_start`), with
+    the units for each earnings rate summed by day.
+
+    Each timesheet is validated against the payroll catalog before it
+    is sent: the employee must exist (and not be terminated), the
+    earnings rates must exist, and units can't be negative, or exceed
+    `max_units` in a day. Valid timesheets are saved `chunk_size` at a
+    time, with up to `workers` chunks in flight at once. When Xero
+    rejects some of the timesheets in a chunk, the rest of the chunk is
+    sent again without them.
+
+    Usage:
+
+        >>> from xero.timesheets import TimesheetPipeline
+        >>> pipeline = TimesheetPipeline(xero.payroll, period_start=date(2014, 1, 6), period_days=14)
+        >>> for result in pipeline.submit(lines):
+        ...     if result.status != 'saved':
+        ...         print result.employee_id, result.start_date, result.errors
+    """
+    def __init__(self, payroll, period_start, period_days=7, chunk_size=50, workers=4,
+            status=u'DRAFT', max_units=24, priority='normal'):
+        self.payroll = payroll
+        self.catalog = payroll.catalog
+        self.period_start = _date(period_start)
+        self.period_days = period_days
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.status = status
+        self.max_units = Decimal(max_units)
+        self.priority = priority
+
+    def period(self, day):
+        "The first day of the pay period containing a day"
+        offset = (_date(day) - self.period_start).days // self.period_days
+        return self.period_start + timedelta(days=offset * self.period_days)
+
+    def group(self, lines):
+        "Group timesheet lines by (EmployeeID, period start), in order of appearance"
+        groups = OrderedDict()
+        for line in lines:
+            key = (line[u'EmployeeID'], self.period(line[u'Date']))
+            groups.setdefault(key, []).append(line)
+        return groups
+
+    def build(self, employee_id, start, lines):
+        """Build and validate the timesheet for an employee and period.
+
+        Returns the timesheet, and a list of validation errors.
+        """
+        errors = []
+        employee = self.catalog.employee(employee_id)
+        if employee is None:
+            errors.append(u'Unknown employee: %s' % employee_id)
+        elif employee.get(u'Status') == u'TERMINATED':
+            errors.append(u'Employee %s has been terminated' % employee_id)
+
+        rows = OrderedDict()
+        for line in lines:
+            name = line.get(u'EarningsRateID') or line.get(u'EarningsRate')
+            rate = self.catalog.earnings_rate(name)
+            if rate is None:
+                errors.append(u'Unknown earnings rate: %s' % name)
+                continue
+            units = Decimal(unicode(line[u'NumberOfUnits']))
+            day = _date(line[u'Date'])
+            if units < 0:
+                errors.append(u'Negative units on %s' % day.isoformat())
+                continue
+            key = (rate[u'EarningsRateID'], line.get(u'TrackingItemID'))
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = [Decimal(0)] * self.period_days
+            row[(day - start).days] += units
+
+        for offset in range(self.period_days):
+            total = sum(row[offset] for row in rows.values())
+            if total > self.max_units:
+                day = start + timedelta(days=offset)
+                errors.append(u'%s units on %s (more than %s)' % (total, day.isoformat(), self.max_units))
+
+        timesheet_lines = []
+        for (rate_id, tracking_item_id), units in rows.items():
+            timesheet_line = OrderedDict([(u'EarningsRateID', rate_id)])
+            if tracking_item_id is not None:
+                timesheet_line[u'TrackingItemID'] = tracking_item_id
+            timesheet_line[u'NumberOfUnits'] = units
+            timesheet_lines.append(timesheet_line)
+
+        timesheet = OrderedDict([
+            (u'EmployeeID', employee_id),
+            (u'StartDate', _datetime(start)),
+            (u'EndDate', _datetime(start + timedelta(days=self.period_days - 1))),
+            (u'Status', self.status),
+            (u'TimesheetLines', timesheet_lines),
+        ])
+        return timesheet, errors
+
+    def submit(self, lines):
+        "Validate and save the timesheets for a stream of lines; returns a TimesheetResult for each"
+        results = []
+        pending = []
+        for (employee_id, start), group in self.group(lines).items():
+            result = TimesheetResult(employee_id, start,
+                    start + timedelta(days=self.period_days - 1))
+            timesheet, result.errors = self.build(employee_id, start, group)
+            if result.errors:
+                result.status = 'invalid'
+            else:
+                pending.append((result, timesheet))
+            results.append(result)
+
+        tasks = Queue()
+        for index in range(0, len(pending), self.chunk_size):
+            tasks.put(pending[index:index + self.chunk_size])
+
+        def work():
+            while True:
+                try:
+                    chunk = tasks.get_nowait()
+                except Empty:
+                    return
+                self._save(chunk)
+
+        threads = [threading.Thread(target=work) for i in range(max(1, min(self.workers, tasks.qsize())))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _save(self, chunk, retry=True):
+        # Save a chunk of (result, timesheet) pairs, recording the outcomes
+        try:
+            saved = as_list(self.payroll.timesheets.save(
+                    [timesheet for result, timesheet in chunk], priority=self.priority))
+        except XeroBadRequest as e:
+            rejected = dict((index, messages) for index, record, messages in e.problems)
+            if not rejected or not retry:
+                self._fail(chunk, [unicode(e)])
+                return
+            remaining = []
+            for index, (result, timesheet) in enumerate(chunk):
+                if index in rejected:
+                    self._fail([(result, timesheet)], rejected[index])
+                else:
+                    remaining.append((result, timesheet))
+            if remaining:
+                self._save(remaining, retry=False)
+        except Exception as e:
+            self._fail(chunk, [u'%s: %s' % (type(e).__name__, e)])
+        else:
+            for (result, timesheet), obj in zip(chunk, saved):
+                result.status = 'saved'
+                result.timesheet = obj
+
+    @staticmethod
+    def _fail(chunk, errors):
+        for result, timesheet in chunk:
+            result.status = 'failed'
+            result.errors = list(errors)